@@ -0,0 +1,267 @@
+''' Benchmarks of GhostEngine commands as the number of games grows.
+
+    python benchmarks/bench_engine.py run --out results.json
+    python benchmarks/bench_engine.py compare before.json after.json
+
+Every run plays complete games of PLAYERS_PER_GAME players on one engine,
+one phase at a time across all games, so each command sees the given number
+of live games. Results are flat metrics, named command/games/measure, and
+compare flags those that got worse by more than a threshold. '''
+
+from typing import Dict, List, Sequence
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import ghost    # noqa: E402
+
+COMMANDS = ('register_player', 'set_clue', 'set_vote', 'make_guess')
+DEFAULT_SCALES = (1, 10, 100, 1000, 10000)
+PLAYERS_PER_GAME = 5
+TOWN_WORD = 'egg'
+FOOL_WORD = 'fry'
+
+# games are replayed until every command has this many latency samples
+DEFAULT_MIN_SAMPLES = 20000
+STARTUP_RUNS = 7
+
+# metrics where a larger value is better, all others are costs
+HIGHER_IS_BETTER = ('ops_per_sec',)
+
+''' COMMANDS '''
+
+def _new_engine() -> ghost.GhostEngine:
+    return ghost.GhostEngine(validator=ghost.WordSetValidator([TOWN_WORD, FOOL_WORD]))
+
+def _play_round(num_games: int, samples: Dict[str, List[int]]) -> ghost.GhostEngine:
+    ''' Plays num_games games to the end on a new engine, adding the
+    nanoseconds of every benchmarked command to samples '''
+    engine = _new_engine()
+    clock = time.perf_counter_ns
+    gids = range(num_games)
+    players = {gid: ['g%dp%d' % (gid, i) for i in range(PLAYERS_PER_GAME)]
+               for gid in gids}
+
+    for gid in gids:
+        engine.add_game(gid, 'host%d' % gid)
+
+    timings = samples['register_player']
+    for i in range(PLAYERS_PER_GAME):
+        for gid in gids:
+            start = clock()
+            engine.register_player(gid, players[gid][i])
+            timings.append(clock() - start)
+
+    for gid in gids:
+        engine.start_game(gid)
+        engine.set_param_town_word('host%d' % gid, TOWN_WORD)
+        engine.set_param_fool_word('host%d' % gid, FOOL_WORD)
+
+    orders = {gid: engine.get_player_order(gid) for gid in gids}
+    timings = samples['set_clue']
+    for i in range(PLAYERS_PER_GAME):
+        for gid in gids:
+            start = clock()
+            engine.set_clue(gid, orders[gid][i], 'clue')
+            timings.append(clock() - start)
+
+    # everyone votes out the ghost, who then guesses wrong
+    ghosts = dict()
+    for gid in gids:
+        roles = engine.get_player_roles(gid)
+        ghosts[gid] = next(p for p in players[gid] if roles[p] == ghost.Roles.GHOST)
+
+    timings = samples['set_vote']
+    for i in range(PLAYERS_PER_GAME):
+        for gid in gids:
+            start = clock()
+            engine.set_vote(gid, players[gid][i], ghosts[gid])
+            timings.append(clock() - start)
+
+    timings = samples['make_guess']
+    for gid in gids:
+        start = clock()
+        engine.make_guess(gid, ghosts[gid], FOOL_WORD)
+        timings.append(clock() - start)
+
+    return engine
+
+def _percentile(ordered: Sequence[int], q: float) -> int:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def bench_commands(num_games: int, min_samples: int) -> Dict[str, float]:
+    samples = {command: list() for command in COMMANDS}
+    while len(samples['make_guess']) < min_samples:
+        _play_round(num_games, samples)
+
+    metrics = dict()
+    for command, timings in samples.items():
+        timings.sort()
+        name = '%s/%d/' % (command, num_games)
+        metrics[name + 'ops_per_sec'] = len(timings) * 1e9 / sum(timings)
+        metrics[name + 'p50_us'] = _percentile(timings, 0.50) / 1000
+        metrics[name + 'p99_us'] = _percentile(timings, 0.99) / 1000
+
+    return metrics
+
+''' MEMORY AND STARTUP
+
+Both are measured in fresh interpreters, so earlier benchmarks and the
+allocator state they leave behind do not count. '''
+
+def _rss_bytes() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def _measure_memory(num_games: int) -> None:
+    ''' Child process: prints the resident memory of num_games finished games '''
+    gc.collect()
+    before = _rss_bytes()
+    samples = {command: list() for command in COMMANDS}
+    engine = _play_round(num_games, samples)
+    del samples
+    gc.collect()
+    after = _rss_bytes()
+
+    assert engine.has_game(num_games - 1)
+    print(json.dumps({'rss_per_game_bytes': (after - before) / num_games}))
+
+# run with -c, so ghost is not imported yet
+_MEASURE_STARTUP = '''
+import json, time
+start = time.perf_counter()
+import ghost
+imported = time.perf_counter()
+engine = ghost.GhostEngine(validator=ghost.WordSetValidator(['egg']))
+engine.add_game(0, 'host')
+engine.register_player(0, 'player')
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000,
+                  'cold_start_ms': (served - start) * 1000}))
+'''
+
+def _run_child(*args) -> dict:
+    ''' Runs python with args and returns the JSON it printed '''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (REPO, env.get('PYTHONPATH'))))
+    out = subprocess.run([sys.executable] + list(args),
+                         stdout=subprocess.PIPE, env=env, check=True)
+    return json.loads(out.stdout.decode())
+
+def bench_memory(num_games: int) -> Dict[str, float]:
+    measured = _run_child(os.path.abspath(__file__), '_memory', str(num_games))
+    return {'memory/%d/%s' % (num_games, k): v for k, v in measured.items()}
+
+def bench_startup(runs: int = STARTUP_RUNS) -> Dict[str, float]:
+    measured = [_run_child('-c', _MEASURE_STARTUP) for _ in range(runs)]
+    return {'startup/' + k: statistics.median(m[k] for m in measured)
+            for k in measured[0]}
+
+''' RUNNING AND COMPARING '''
+
+def run(scales: Sequence[int] = DEFAULT_SCALES,
+        min_samples: int = DEFAULT_MIN_SAMPLES, seed: int = 0) -> dict:
+    ''' Runs every benchmark and returns the results as a JSON-ready dict '''
+    random.seed(seed)
+
+    metrics = dict()
+    for num_games in scales:
+        metrics.update(bench_commands(num_games, min_samples))
+    if os.path.exists('/proc/self/statm'):
+        metrics.update(bench_memory(max(scales)))
+    metrics.update(bench_startup())
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'scales': list(scales),
+            'min_samples': min_samples,
+            'players_per_game': PLAYERS_PER_GAME,
+            'seed': seed
+        },
+        'metrics': metrics
+    }
+
+def compare(base: dict, head: dict, threshold: float) -> (List[str], List[str]):
+    ''' Returns a report line for every metric in both runs, and the names
+    of those that got worse by more than threshold, a fraction '''
+    lines, regressions = list(), list()
+    for name in sorted(base['metrics'].keys() & head['metrics'].keys()):
+        old, new = base['metrics'][name], head['metrics'][name]
+        change = (new - old) / old if old else 0.0
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        lines.append('%-36s %14.2f %14.2f %+8.1f%%%s' % (name, old, new, 100 * change, flag))
+
+    return lines, regressions
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Benchmark GhostEngine command throughput, latency and memory')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--out', help='write the results to this JSON file')
+    run_parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                            help='comma-separated numbers of concurrent games')
+    run_parser.add_argument('--min-samples', type=int, default=DEFAULT_MIN_SAMPLES)
+    run_parser.add_argument('--seed', type=int, default=0)
+
+    compare_parser = commands.add_parser(
+        'compare', help='compare two result files, exit 1 on regressions')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='allowed slowdown, as a fraction (default: 0.10)')
+
+    commands.add_parser('_memory').add_argument('num_games', type=int)
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    if args.command == '_memory':
+        _measure_memory(args.num_games)
+    elif args.command == 'run':
+        scales = [int(s) for s in args.scales.split(',')]
+        results = run(scales, args.min_samples, args.seed)
+        for name, value in sorted(results['metrics'].items()):
+            print('%-36s %14.2f' % (name, value))
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.head) as f:
+            head = json.load(f)
+
+        lines, regressions = compare(base, head, args.threshold)
+        print('%-36s %14s %14s %9s' % ('metric', 'base', 'head', 'change'))
+        print('\n'.join(lines))
+        if regressions:
+            print('%d regression(s) over %.0f%%' % (len(regressions), 100 * args.threshold))
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
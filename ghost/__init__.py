@@ -1,5 +1,33 @@
 from ghost.engine import GhostEngine
-from ghost.ghost import Ghost
+from ghost.admission import AdmissionGate
+from ghost.broadcast import Broadcaster
+from ghost.dictionary import WordValidator, EnchantValidator, WordSetValidator, \
+    MmapValidator, compile_word_list
+from ghost.ghost import Ghost, GameView
+from ghost.journal import Journal
+
+import importlib
 
 Roles = Ghost.Roles
 States = Ghost.States
+
+# imported on first use, as asyncio, http.server and multiprocessing are
+# slow to load and most users need none of them
+_LAZY = {
+    'AsyncGhostEngine': 'ghost.async_engine',
+    'EngineMetrics': 'ghost.metrics',
+    'GhostServer': 'ghost.server',
+    'GhostClient': 'ghost.server',
+}
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
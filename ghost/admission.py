@@ -0,0 +1,187 @@
+from ghost.engine import GhostEngine
+from ghost.events import GameDeleted, GameExpired, Rejected
+from ghost.ghost import Ghost
+
+from typing import Any, NamedTuple, Optional
+
+import itertools
+import threading
+import time
+
+class _Turn(NamedTuple):
+    ''' Who may act in a game now, as of its epoch '''
+    epoch: int
+    state: Ghost.States
+    clues: Any              # living player to clue, None if not given
+    actor: str              # next clue giver or lynched ghost, '' if none
+
+class AdmissionGate:
+    ''' Cheap checks in front of a GhostEngine for the commands that chat
+    groups flood: set_clue, set_vote and make_guess.
+
+    Each game has a precomputed entry of who may act now, refreshed from
+    its view after the game publishes any event. Every player also has a
+    token bucket of burst commands, refilled at rate per second.
+    Commands failing either check are refused in O(1) with the code of the
+    ERR_ constant the engine would have refused them with, or
+    ERR_RATE_LIMITED, without logging or locking the game.
+    Admitted commands go to the engine, which still has the final word.
+
+    The gate subscribes to the engine's events, so it must see every
+    change to its games. Games rebuilt in place without events, such as
+    by GhostEngine.recover, must be restored before the gate is built. '''
+
+    ERR_RATE_LIMITED = 'User @%s is sending commands too fast'
+
+    # reason codes, the names of the ERR_ constants
+    GID_DOES_NOT_EXIST = 'ERR_GID_DOES_NOT_EXIST'
+    INVALID_GAME_STATE = 'ERR_INVALID_GAME_STATE'
+    USER_NOT_IN_GAME = 'ERR_USER_NOT_IN_GAME'
+    CLUE_ALREADY_GIVEN = 'ERR_CLUE_ALREADY_GIVEN'
+    PLAYER_NOT_IN_ORDER = 'ERR_PLAYER_NOT_IN_ORDER'
+    PLAYER_CANNOT_GUESS = 'ERR_PLAYER_CANNOT_GUESS'
+    RATE_LIMITED = 'ERR_RATE_LIMITED'
+
+    __COMMAND_STATES = {
+        'set_clue': Ghost.States.CLUE_ROUND,
+        'set_vote': Ghost.States.VOTE_ROUND,
+        'make_guess': Ghost.States.GUESS_ROUND
+    }
+
+    def __init__(self, engine: GhostEngine, rate: float = None,
+                 burst: int = 5, clock=time.monotonic):
+        ''' Without rate, players are not rate-limited '''
+        self.__engine = engine
+        self.__rate = rate
+        self.__burst = burst
+        self.__clock = clock
+
+        # gid to the epoch of its last event. Epochs are drawn from one
+        # counter, so a new game under the gid of a deleted one never
+        # matches an old entry, and both entries go with the game.
+        self.__epochs = dict()
+        self.__turns = dict()       # gid to _Turn
+        self.__next_epoch = itertools.count(1)
+
+        self.__buckets = dict()     # player to [tokens, clock() of refill]
+        self.__buckets_lock = threading.Lock()
+        self.__prune_at = 1024      # number of buckets that triggers a prune
+
+        engine.events.subscribe(self.__on_event)
+
+    @property
+    def engine(self) -> GhostEngine:
+        return self.__engine
+
+    def __on_event(self, event: Any) -> None:
+        ''' Events are published with the game locked, so this never races
+        with other commands on the same game '''
+        kind = type(event)
+        if kind is GameDeleted or kind is GameExpired:
+            self.__epochs.pop(event.gid, None)
+            self.__turns.pop(event.gid, None)
+        elif kind is not Rejected:
+            self.__epochs[event.gid] = next(self.__next_epoch)
+
+    def __get_turn(self, gid: int) -> Optional[_Turn]:
+        turn = self.__turns.get(gid)
+        epoch = self.__epochs.get(gid, 0)
+        if turn is not None and turn.epoch == epoch:
+            return turn
+
+        # the epoch is read first, so an event during the refresh leaves
+        # the entry stale rather than wrong
+        _, view = self.__engine.get_if_changed(gid, -2)
+        if view is None:
+            return None
+
+        actor = ''
+        if view.state == Ghost.States.CLUE_ROUND:
+            actor = view.next_player
+        elif view.state == Ghost.States.GUESS_ROUND:
+            actor = view.last_lynched
+        turn = _Turn(epoch, view.state, view.clues, actor)
+        self.__turns[gid] = turn
+        return turn
+
+    def __take_token(self, player: str) -> bool:
+        now = self.__clock()
+        with self.__buckets_lock:
+            bucket = self.__buckets.get(player)
+            if bucket is None:
+                if len(self.__buckets) >= self.__prune_at:
+                    self.__prune(now)
+                self.__buckets[player] = [self.__burst - 1, now]
+                return True
+
+            tokens = min(self.__burst, bucket[0] + (now - bucket[1]) * self.__rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                return False
+
+            bucket[0] = tokens - 1
+            return True
+
+    def __prune(self, now: float) -> None:
+        ''' Drops the buckets that refilled, which behave like new ones.
+        Called with the lock held, when the number of buckets doubles. '''
+        full_after = self.__burst / self.__rate
+        self.__buckets = {player: bucket for player, bucket in self.__buckets.items()
+                          if now - bucket[1] < full_after}
+        self.__prune_at = max(1024, 2 * len(self.__buckets))
+
+    def admit(self, gid: int, command: str, player: str, vote: str = '') -> str:
+        ''' Returns '' if the engine may accept command from player, or the
+        reason code it is refused with. vote is the target of set_vote. '''
+        expected_state = AdmissionGate.__COMMAND_STATES[command]
+        if self.__rate is not None and not self.__take_token(player):
+            return self.__refuse(command, AdmissionGate.RATE_LIMITED)
+
+        turn = self.__get_turn(gid)
+        if turn is None:
+            return self.__refuse(command, AdmissionGate.GID_DOES_NOT_EXIST)
+        elif turn.state != expected_state:
+            return self.__refuse(command, AdmissionGate.INVALID_GAME_STATE)
+        elif command == 'make_guess':
+            # the lynched ghost is still among the living players
+            if player != turn.actor:
+                return self.__refuse(command, AdmissionGate.PLAYER_CANNOT_GUESS)
+            return ''
+        elif player not in turn.clues:
+            return self.__refuse(command, AdmissionGate.USER_NOT_IN_GAME)
+        elif command == 'set_clue':
+            if turn.clues.get(player) is not None:
+                return self.__refuse(command, AdmissionGate.CLUE_ALREADY_GIVEN)
+            elif player != turn.actor:
+                return self.__refuse(command, AdmissionGate.PLAYER_NOT_IN_ORDER)
+        elif vote and vote not in turn.clues:
+            return self.__refuse(command, AdmissionGate.USER_NOT_IN_GAME)
+
+        return ''
+
+    def __refuse(self, command: str, code: str) -> str:
+        metrics = self.__engine.metrics
+        if metrics is not None:
+            metrics.rejections.inc(command, code)
+        return code
+
+    ''' COMMANDS
+
+    Same results as the GhostEngine methods, which are only called for
+    admitted commands. '''
+
+    def set_clue(self, gid: int, player: str, clue: str) -> (bool, bool):
+        if self.admit(gid, 'set_clue', player):
+            return False, False
+        return self.__engine.set_clue(gid, player, clue)
+
+    def set_vote(self, gid: int, player: str, vote: str) -> (bool, bool, str):
+        if self.admit(gid, 'set_vote', player, vote):
+            return False, False, ''
+        return self.__engine.set_vote(gid, player, vote)
+
+    def make_guess(self, gid: int, player: str, guess: str) -> (bool, bool):
+        if self.admit(gid, 'make_guess', player):
+            return False, False
+        return self.__engine.make_guess(gid, player, guess)
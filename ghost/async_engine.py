@@ -0,0 +1,338 @@
+from ghost import events
+from ghost.engine import GhostEngine
+from ghost.ghost import GameView, Ghost
+
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence, \
+    Tuple, Union
+
+import asyncio
+
+class AsyncGhostEngine:
+    ''' asyncio front-end for GhostEngine.
+    Every game gets its own command queue drained by one worker coroutine,
+    so commands for one game apply in the order they were submitted while
+    many games progress concurrently on the same event loop. '''
+
+    __STOP = None   # sentinel that shuts down a game's worker
+
+    # events that can settle a wait: a new state, the next clue giver, or
+    # a player or the whole game gone
+    __WAKING_EVENTS = frozenset((events.StateChanged, events.ClueSet,
+                                 events.PlayerUnregistered, events.Lynched,
+                                 events.PlayerKilled, events.GameDeleted))
+
+    def __init__(self, engine: GhostEngine = None, **kwargs):
+        ''' Wraps engine, or a new GhostEngine built from kwargs '''
+        self.__engine = engine if engine is not None else GhostEngine(**kwargs)
+        self.__queues = dict()      # gid to command queue
+        self.__workers = dict()     # gid to worker task
+        self.__waiters = defaultdict(list)  # gid to [(check, future)]
+        self.__loop = None          # loop of the waiters, while there are any
+
+    @property
+    def engine(self) -> GhostEngine:
+        return self.__engine
+
+    def __get_queue(self, gid: int) -> asyncio.Queue:
+        queue = self.__queues.get(gid)
+        if queue is None:
+            queue = asyncio.Queue()
+            self.__queues[gid] = queue
+            self.__workers[gid] = asyncio.ensure_future(
+                self.__worker(gid, queue))
+
+        return queue
+
+    async def __worker(self, gid: int, queue: asyncio.Queue) -> None:
+        while True:
+            command = await queue.get()
+            if command is AsyncGhostEngine.__STOP:
+                return
+
+            method, args, future = command
+            if not future.cancelled():
+                try:
+                    future.set_result(method(*args))
+                except Exception as e:
+                    future.set_exception(e)
+
+            # give the other games a turn between commands
+            await asyncio.sleep(0)
+
+    async def __submit(self, gid: int, method: Callable, *args) -> Any:
+        if gid not in self.__queues and not self.__engine.has_game(gid):
+            # unknown games only produce the engine's default reply,
+            # so there is nothing to order and no worker to spawn
+            return method(*args)
+
+        future = asyncio.get_running_loop().create_future()
+        self.__get_queue(gid).put_nowait((method, args, future))
+        return await future
+
+    def __stop_worker(self, gid: int) -> None:
+        queue = self.__queues.pop(gid, None)
+        if queue is not None:
+            queue.put_nowait(AsyncGhostEngine.__STOP)
+            del self.__workers[gid]
+
+    async def close(self) -> None:
+        ''' Lets every worker finish its queued commands, then stops it '''
+        workers = list(self.__workers.values())
+        for gid in list(self.__queues):
+            self.__stop_worker(gid)
+
+        if workers:
+            await asyncio.gather(*workers)
+
+    async def add_game(self, gid: int, host: str) -> bool:
+        future = asyncio.get_running_loop().create_future()
+        self.__get_queue(gid).put_nowait(
+            (self.__engine.add_game, (gid, host), future))
+        is_success = await future
+        if not is_success and not self.__engine.has_game(gid):
+            self.__stop_worker(gid)
+
+        return is_success
+
+    async def delete_game(self, gid: int) -> bool:
+        is_success = await self.__submit(gid, self.__engine.delete_game, gid)
+        self.__stop_worker(gid)
+        return is_success
+
+    def expire_idle_games(self) -> List[int]:
+        ''' Same as GhostEngine.expire_idle_games, also stopping the
+        workers of the deleted games '''
+        expired = self.__engine.expire_idle_games()
+        for gid in expired:
+            self.__stop_worker(gid)
+
+        return expired
+
+    def get_gid_from_host(self, host: str) -> int:
+        return self.__engine.get_gid_from_host(host)
+
+    def get_gid_from_player(self, player: str) -> int:
+        return self.__engine.get_gid_from_player(player)
+
+    ''' GET GAME INFORMATION '''
+
+    async def get_game_state(self, gid: int) -> Ghost.States:
+        return await self.__submit(gid, self.__engine.get_game_state, gid)
+
+    async def get_existing_players(self, gid: int) -> Tuple[str, ...]:
+        return await self.__submit(gid, self.__engine.get_existing_players, gid)
+
+    async def get_player_order(self, gid: int) -> Tuple[str, ...]:
+        return await self.__submit(gid, self.__engine.get_player_order, gid)
+
+    async def get_player_roles(self, gid: int) -> Mapping[str, Ghost.Roles]:
+        return await self.__submit(gid, self.__engine.get_player_roles, gid)
+
+    async def get_role_census(self, gid: int) -> Dict[Ghost.Roles, int]:
+        return await self.__submit(gid, self.__engine.get_role_census, gid)
+
+    async def get_words(self, gid: int) -> (str, str):
+        return await self.__submit(gid, self.__engine.get_words, gid)
+
+    async def get_view(self, gid: int) -> GameView:
+        return await self.__submit(gid, self.__engine.get_view, gid)
+
+    async def get_if_changed(self, gid: int, since_version: int) -> (int, GameView):
+        return await self.__submit(gid, self.__engine.get_if_changed,
+                                   gid, since_version)
+
+    ''' WAITS
+
+    Waits are woken by the engine's events, so commands sent to the engine
+    directly, from any thread, settle them too. '''
+
+    def __on_event(self, event) -> None:
+        ''' Called on the thread of the command, with the game locked, so the
+        checks run later on the loop '''
+        loop = self.__loop
+        if loop is not None and event.gid in self.__waiters and \
+                type(event) in AsyncGhostEngine.__WAKING_EVENTS:
+            loop.call_soon_threadsafe(self.__wake, event.gid)
+
+    def __wake(self, gid: int) -> None:
+        waiters = self.__waiters.get(gid)
+        if not waiters:
+            return
+
+        pending = list()
+        for check, future in waiters:
+            if future.done():
+                continue
+            is_settled, result = check()
+            if is_settled:
+                future.set_result(result)
+            else:
+                pending.append((check, future))
+
+        self.__set_waiters(gid, pending)
+
+    def __set_waiters(self, gid: int, waiters: list) -> None:
+        ''' Stops listening to the engine once no game has waiters '''
+        if waiters:
+            self.__waiters[gid] = waiters
+            return
+
+        self.__waiters.pop(gid, None)
+        if not self.__waiters and self.__loop is not None:
+            self.__engine.events.unsubscribe(self.__on_event)
+            self.__loop = None
+
+    async def __wait(self, gid: int, check: Callable[[], Tuple[bool, Any]],
+                     timeout: float, default: Any) -> Any:
+        if self.__loop is None:
+            self.__loop = asyncio.get_running_loop()
+            self.__engine.events.subscribe(self.__on_event)
+
+        # listen before the first check, so no change slips in between
+        future = self.__loop.create_future()
+        self.__waiters[gid].append((check, future))
+        is_settled, result = check()
+        if is_settled:
+            future.set_result(result)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return default
+        finally:
+            # settled at once, or timed out, so still listed
+            waiters = self.__waiters.get(gid, ())
+            if any(f is future for _, f in waiters):
+                self.__set_waiters(gid, [w for w in waiters if w[1] is not future])
+
+    async def wait_for_state(self, gid: int,
+                             states: Union[Ghost.States, Iterable[Ghost.States]],
+                             timeout: float = None) -> Ghost.States:
+        ''' Same as GhostEngine.wait_for_state, without blocking the loop '''
+        if isinstance(states, Ghost.States):
+            states = (states,)
+        states = frozenset(states)
+
+        def check() -> (bool, Ghost.States):
+            if not self.__engine.has_game(gid):
+                return True, None
+            state = self.__engine.get_game_state(gid)
+            return state in states, state
+
+        return await self.__wait(gid, check, timeout, None)
+
+    async def wait_for_turn(self, gid: int, player: str,
+                            timeout: float = None) -> bool:
+        ''' Same as GhostEngine.wait_for_turn, without blocking the loop '''
+        def check() -> (bool, bool):
+            if not self.__engine.has_game(gid):
+                return True, False
+            view = self.__engine.get_view(gid)
+            if view.next_player == player:
+                return True, True
+            return player not in view.players or \
+                view.state in (Ghost.States.WINNER_GHOST, Ghost.States.WINNER_TOWN), False
+
+        return await self.__wait(gid, check, timeout, False)
+
+    ''' PHASE: REGISTER PLAYERS '''
+
+    async def register_player(self, gid: int, player: str) -> (bool, int):
+        return await self.__submit(gid, self.__engine.register_player,
+                                   gid, player)
+
+    async def unregister_player(self, gid: int, player: str) -> bool:
+        return await self.__submit(gid, self.__engine.unregister_player,
+                                   gid, player)
+
+    async def start_game(self, gid: int) -> bool:
+        return await self.__submit(gid, self.__engine.start_game, gid)
+
+    ''' PHASE: SET PARAM '''
+
+    async def set_param_town_word(self, host: str, value: str) -> bool:
+        gid = self.__engine.get_gid_from_host(host)
+        return await self.__submit(gid, self.__engine.set_param_town_word,
+                                   host, value)
+
+    async def set_param_fool_word(self, host: str, value: str) -> bool:
+        gid = self.__engine.get_gid_from_host(host)
+        return await self.__submit(gid, self.__engine.set_param_fool_word,
+                                   host, value)
+
+    async def suggest_fool_words(self, host: str, k: int = 5) -> List[str]:
+        gid = self.__engine.get_gid_from_host(host)
+        return await self.__submit(gid, self.__engine.suggest_fool_words,
+                                   host, k)
+
+    ''' PHASE: CLUES '''
+
+    async def get_next_in_player_order(self, gid: int) -> str:
+        return await self.__submit(gid, self.__engine.get_next_in_player_order,
+                                   gid)
+
+    async def set_clue(self, gid: int, player: str, clue: str) -> (bool, bool):
+        return await self.__submit(gid, self.__engine.set_clue,
+                                   gid, player, clue)
+
+    async def set_clue_by_player(self, player: str, clue: str) -> (bool, bool):
+        gid = self.__engine.get_gid_from_player(player)
+        return await self.__submit(gid, self.__engine.set_clue,
+                                   gid, player, clue)
+
+    async def get_all_clues(self, gid: int) -> Mapping[str, str]:
+        return await self.__submit(gid, self.__engine.get_all_clues, gid)
+
+    ''' PHASE: VOTE '''
+
+    async def set_vote(self, gid: int, player: str,
+                       vote: str) -> (bool, bool, str):
+        return await self.__submit(gid, self.__engine.set_vote,
+                                   gid, player, vote)
+
+    async def set_vote_by_player(self, player: str,
+                                 vote: str) -> (bool, bool, str):
+        gid = self.__engine.get_gid_from_player(player)
+        return await self.__submit(gid, self.__engine.set_vote,
+                                   gid, player, vote)
+
+    ''' PHASE: GUESS '''
+
+    async def make_guess(self, gid: int, player: str,
+                         guess: str) -> (bool, bool):
+        return await self.__submit(gid, self.__engine.make_guess,
+                                   gid, player, guess)
+
+    async def make_guess_by_player(self, player: str,
+                                   guess: str) -> (bool, bool):
+        gid = self.__engine.get_gid_from_player(player)
+        return await self.__submit(gid, self.__engine.make_guess,
+                                   gid, player, guess)
+
+    ''' BATCHES '''
+
+    async def apply_batch(self,
+                          commands: Sequence[Tuple[int, str, str, str]]) -> List[tuple]:
+        ''' Queues each game's share of the batch as one command, so a batch
+        stays ordered with the other commands sent to the same game.
+        Like GhostEngine.apply_batch, raises ValueError for an unknown
+        command before any command is applied. '''
+        by_gid = defaultdict(list)      # gid to indices of its commands
+        for i, (gid, command, _, _) in enumerate(commands):
+            if command not in GhostEngine.BATCH_COMMANDS:
+                raise ValueError(GhostEngine.ERR_UNKNOWN_COMMAND % command)
+            by_gid[gid].append(i)
+
+        groups = list(by_gid.values())
+        group_results = await asyncio.gather(
+            *[self.__submit(commands[indices[0]][0], self.__engine.apply_batch,
+                            [commands[i] for i in indices])
+              for indices in groups])
+
+        results = [None] * len(commands)
+        for indices, group_result in zip(groups, group_results):
+            for i, result in zip(indices, group_result):
+                results[i] = result
+
+        return results
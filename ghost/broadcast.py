@@ -0,0 +1,262 @@
+from ghost import events
+from ghost.engine import GhostEngine
+
+from typing import Any, Callable, List, Optional
+
+import json
+import logging
+import threading
+
+''' DELTAS
+
+One JSON object per change of a game, with its seq in the game's stream
+and its type. Deltas say what a value is now rather than how it moved,
+so applying one twice changes nothing. A state delta to CLUE_ROUND or
+VOTE_ROUND starts a round, which clears the clues or votes. Roles are
+never sent. '''
+
+def _to_delta(event: Any) -> Optional[dict]:
+    kind = type(event)
+    if kind is events.ClueSet:
+        return {'type': 'clue', 'player': event.username, 'clue': event.clue}
+    elif kind is events.VoteCast:
+        return {'type': 'vote', 'player': event.username, 'vote': event.vote}
+    elif kind is events.StateChanged:
+        return {'type': 'state', 'state': event.new.name}
+    elif kind is events.Lynched:
+        return {'type': 'lynched', 'player': event.username}
+    elif kind is events.PlayerKilled:
+        return {'type': 'killed', 'player': event.username}
+    elif kind is events.GuessMade:
+        return {'type': 'guess', 'player': event.username, 'guess': event.guess,
+                'correct': event.is_correct}
+    elif kind is events.PlayerRegistered:
+        return {'type': 'join', 'player': event.username}
+    elif kind is events.PlayerUnregistered:
+        return {'type': 'leave', 'player': event.username}
+    elif kind is events.RolesAllocated:
+        return {'type': 'order', 'order': list(event.order)}
+    elif kind is events.GameDeleted:
+        return {'type': 'deleted'}
+    return None
+
+def _encode(delta: dict) -> bytes:
+    return json.dumps(delta, separators=(',', ':')).encode()
+
+''' STREAMS '''
+
+class _Channel:
+    ''' The last capacity deltas of one game, in a ring shared by all its
+    subscribers. Publishing is O(1) whatever the number of subscribers. '''
+
+    def __init__(self, engine: GhostEngine, gid: int, capacity: int):
+        self.engine = engine
+        self.gid = gid
+        self.capacity = capacity
+        self.ring = [None] * capacity   # encoded delta of seq at seq % capacity
+        self.next_seq = 0
+        self.is_closed = False          # the game was deleted
+        self.num_subscribers = 0
+        self.condition = threading.Condition(threading.Lock())
+        self.__board = (-1, None)       # version and board of the last view
+
+    def publish(self, delta: dict) -> None:
+        ''' Called with the game locked, so deltas keep the game's order '''
+        with self.condition:
+            delta['seq'] = self.next_seq
+            self.ring[self.next_seq % self.capacity] = _encode(delta)
+            self.next_seq += 1
+            self.condition.notify_all()
+
+    def close(self) -> None:
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+
+    def board(self, seq: int) -> Optional[bytes]:
+        ''' Returns the whole board, which the deltas from seq on bring up
+        to date, or None if the game is gone. Votes cast so far are not on
+        it. Called without the channel lock, as it locks the game. '''
+        version, view = self.engine.get_if_changed(self.gid, self.__board[0])
+        if version == -1 or self.is_closed:
+            return None
+        elif view is not None:
+            self.__board = (version, {
+                'type': 'board',
+                'state': view.state.name,
+                'players': list(view.players),
+                'order': list(view.order),
+                'clues': {p: c for p, c in view.clues.items() if c is not None},
+                'next_player': view.next_player,
+                'last_lynched': view.last_lynched
+            })
+
+        return _encode(dict(self.__board[1], seq=seq))
+
+class Subscription:
+    ''' One spectator's read position in a game's stream.
+    The first delta is a board of the whole game, and every later one is
+    a change to it. A subscriber that falls more than capacity deltas
+    behind loses them: with Broadcaster.RESYNC it is sent a new board and
+    carries on, with Broadcaster.DISCONNECT it is closed. Lost deltas are
+    counted in dropped. '''
+
+    def __init__(self, channel: _Channel, policy: str,
+                 on_close: Callable[[_Channel], None]):
+        self.__channel = channel
+        self.__policy = policy
+        self.__on_close = on_close
+        self.__seq = None           # next seq to read, None to send a board
+        self.__dropped = 0
+        self.__is_closed = False
+
+    @property
+    def gid(self) -> int:
+        return self.__channel.gid
+
+    @property
+    def dropped(self) -> int:
+        return self.__dropped
+
+    @property
+    def closed(self) -> bool:
+        ''' True once closed, once the game's last delta was read, or if
+        disconnected for falling behind '''
+        return self.__is_closed
+
+    def get(self, timeout: float = None) -> Optional[bytes]:
+        ''' Blocks for the next delta, JSON encoded. Returns None on
+        timeout, or once closed. '''
+        channel = self.__channel
+        with channel.condition:
+            if self.__is_closed:
+                return None
+            elif self.__seq is not None:
+                channel.condition.wait_for(
+                    lambda: self.__seq < channel.next_seq or channel.is_closed,
+                    timeout)
+                delta = self.__take()
+                if self.__seq is not None:
+                    return delta
+
+            # new, or fell behind and resyncs
+            seq = self.__seq = channel.next_seq
+
+        board = channel.board(seq)
+        if board is None:
+            self.close()
+        return board
+
+    def drain(self) -> List[bytes]:
+        ''' Returns every delta ready now, without blocking '''
+        result = list()
+        delta = self.get(0)
+        while delta is not None:
+            result.append(delta)
+            delta = self.get(0)
+
+        return result
+
+    def __take(self) -> Optional[bytes]:
+        ''' Reads the delta at the read position, with the lock held.
+        Returns None if there is none yet, or none left. '''
+        channel = self.__channel
+        oldest = channel.next_seq - channel.capacity
+        if self.__seq < oldest:
+            self.__dropped += oldest - self.__seq
+            logging.warning(Broadcaster.ERR_SLOW_SUBSCRIBER, channel.gid,
+                            oldest - self.__seq)
+            if self.__policy == Broadcaster.DISCONNECT:
+                self.__close()
+            else:
+                self.__seq = None
+            return None
+        elif self.__seq == channel.next_seq:
+            if channel.is_closed:
+                self.__close()
+            return None
+
+        delta = channel.ring[self.__seq % channel.capacity]
+        self.__seq += 1
+        return delta
+
+    def close(self) -> None:
+        with self.__channel.condition:
+            self.__close()
+
+    def __close(self) -> None:
+        ''' Called with the lock held '''
+        if not self.__is_closed:
+            self.__is_closed = True
+            self.__on_close(self.__channel)
+
+class Broadcaster:
+    ''' Streams the changes of games to any number of spectators, see
+    Subscription.
+
+    Each event of a watched game becomes one delta, encoded once into a
+    ring of the game's last capacity deltas. Subscribers read the ring at
+    their own positions, so a delta costs the same for one subscriber as
+    for thousands, and a game's stream never holds more than capacity
+    deltas. Events of games without subscribers are dropped at once. '''
+
+    ERR_SLOW_SUBSCRIBER = 'Subscriber to game %d fell %d deltas behind'
+    ERR_BAD_POLICY = 'Unknown slow subscriber policy %s'
+
+    RESYNC = 'resync'
+    DISCONNECT = 'disconnect'
+
+    def __init__(self, engine: GhostEngine, capacity: int = 256,
+                 policy: str = RESYNC):
+        ''' policy is what happens to subscribers more than capacity
+        deltas behind, RESYNC or DISCONNECT '''
+        if policy not in (Broadcaster.RESYNC, Broadcaster.DISCONNECT):
+            raise ValueError(Broadcaster.ERR_BAD_POLICY % policy)
+
+        self.__engine = engine
+        self.__capacity = capacity
+        self.__policy = policy
+        self.__channels = dict()    # gid to _Channel, while it has subscribers
+        self.__lock = threading.Lock()
+        engine.events.subscribe(self.__on_event)
+
+    def subscribe(self, gid: int) -> Optional[Subscription]:
+        ''' Returns a new subscription to the game, None if it does not exist '''
+        if not self.__engine.has_game(gid):
+            logging.warning(GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
+            return None
+
+        with self.__lock:
+            channel = self.__channels.get(gid)
+            if channel is None:
+                channel = _Channel(self.__engine, gid, self.__capacity)
+                self.__channels[gid] = channel
+            channel.num_subscribers += 1
+
+        return Subscription(channel, self.__policy, self.__unsubscribe)
+
+    def get_num_subscribers(self, gid: int) -> int:
+        channel = self.__channels.get(gid)
+        return channel.num_subscribers if channel is not None else 0
+
+    def __unsubscribe(self, channel: _Channel) -> None:
+        with self.__lock:
+            channel.num_subscribers -= 1
+            if not channel.num_subscribers and \
+                    self.__channels.get(channel.gid) is channel:
+                del self.__channels[channel.gid]
+
+    def __on_event(self, event: Any) -> None:
+        channel = self.__channels.get(event.gid)
+        if channel is None:
+            return
+
+        delta = _to_delta(event)
+        if delta is not None:
+            channel.publish(delta)
+        if type(event) is events.GameDeleted:
+            # a new game under the gid gets a new channel
+            with self.__lock:
+                if self.__channels.get(event.gid) is channel:
+                    del self.__channels[event.gid]
+            channel.close()
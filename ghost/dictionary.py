@@ -0,0 +1,277 @@
+from collections import OrderedDict, defaultdict
+
+from typing import Iterable, List
+
+import argparse
+import mmap
+import os
+import struct
+import threading
+
+class WordValidator:
+    ''' Decides whether a word is a valid English word.
+    Subclasses implement _lookup. Verdicts are kept in a bounded LRU cache,
+    so repeated checks of popular words never reach the backend. '''
+
+    DEFAULT_CACHE_SIZE = 4096
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.__cache_size = cache_size
+        self.__cache = OrderedDict()    # word to verdict, oldest first
+        self.__lock = threading.Lock()
+
+    def check(self, word: str) -> bool:
+        if self.__cache_size <= 0:
+            return self._lookup(word)
+
+        with self.__lock:
+            verdict = self.__cache.get(word)
+            if verdict is not None:
+                self.__cache.move_to_end(word)
+                return verdict
+
+        verdict = self._lookup(word)
+
+        with self.__lock:
+            self.__cache[word] = verdict
+            if len(self.__cache) > self.__cache_size:
+                self.__cache.popitem(last=False)
+
+        return verdict
+
+    def _lookup(self, word: str) -> bool:
+        raise NotImplementedError
+
+    @property
+    def can_list_words(self) -> bool:
+        ''' True if words_of_length works, so fool words can be suggested '''
+        return False
+
+    def words_of_length(self, length: int) -> List[str]:
+        ''' Returns every known word with this many characters.
+        Only for validators that can_list_words. '''
+        raise NotImplementedError('%s cannot list its words' % type(self).__name__)
+
+class EnchantValidator(WordValidator):
+    ''' Checks words with an enchant dictionary.
+    enchant is only imported when the first word is checked, so processes
+    that never validate a word never load the spell-check backend.
+
+    enchant cannot list its words, so words_of_length reads them from
+    word_list, one word per line, and keeps those enchant accepts. Without
+    that file the validator cannot list words. '''
+
+    # the word list most unix systems ship
+    DEFAULT_WORD_LIST = '/usr/share/dict/words'
+
+    def __init__(self, tag: str = 'en-US',
+                 cache_size: int = WordValidator.DEFAULT_CACHE_SIZE,
+                 word_list: str = DEFAULT_WORD_LIST):
+        super().__init__(cache_size)
+        self.__tag = tag
+        self.__word_list = word_list
+        self.__dictionary = None
+        self.__by_length = None     # length to words of the word list
+        self.__load_lock = threading.Lock()
+
+    def __load(self):
+        with self.__load_lock:
+            if self.__dictionary is None:
+                import enchant
+                self.__dictionary = enchant.Dict(self.__tag)
+
+        return self.__dictionary
+
+    def _lookup(self, word: str) -> bool:
+        dictionary = self.__dictionary or self.__load()
+        return dictionary.check(word)
+
+    @property
+    def can_list_words(self) -> bool:
+        return self.__word_list is not None and os.path.isfile(self.__word_list)
+
+    def words_of_length(self, length: int) -> List[str]:
+        ''' Returns the words of the word list with this many letters that
+        enchant accepts, lowercased and sorted. Names and abbreviations in
+        the list are skipped. '''
+        if not self.can_list_words:
+            return super().words_of_length(length)
+
+        with self.__load_lock:
+            if self.__by_length is None:
+                by_length = defaultdict(set)
+                with open(self.__word_list) as f:
+                    for line in f:
+                        w = line.strip()
+                        if w.isalpha() and w.islower():
+                            by_length[len(w)].add(w)
+                self.__by_length = dict(by_length)
+
+        # checked directly, so a whole bucket never floods the cache
+        return [w for w in sorted(self.__by_length.get(length, ()))
+                if self._lookup(w)]
+
+class WordSetValidator(WordValidator):
+    ''' Checks words against a precompiled set of lowercase words.
+    A set lookup is as cheap as a cache hit, so there is no cache by default. '''
+
+    def __init__(self, words: Iterable[str], cache_size: int = 0):
+        super().__init__(cache_size)
+        self.__words = frozenset(w.strip().lower() for w in words)
+        self.__by_length = None     # length to sorted words, built on demand
+
+    @property
+    def can_list_words(self) -> bool:
+        return True
+
+    @classmethod
+    def from_file(cls, path: str, cache_size: int = 0) -> 'WordSetValidator':
+        ''' Loads a word list with one word per line '''
+        with open(path) as f:
+            return cls((line for line in f if line.strip()), cache_size)
+
+    def _lookup(self, word: str) -> bool:
+        return word.lower() in self.__words
+
+    def words_of_length(self, length: int) -> List[str]:
+        if self.__by_length is None:
+            by_length = defaultdict(list)
+            for w in sorted(self.__words):
+                by_length[len(w)].append(w)
+            self.__by_length = dict(by_length)
+
+        return list(self.__by_length.get(length, ()))
+
+''' PRECOMPILED DICTIONARY FILES
+
+A compiled dictionary is a header followed by one bucket per word length.
+Each bucket holds the words of that length (in UTF-8 bytes) as sorted,
+fixed-width records with no separators, so a word is found by binary
+search over the bucket straight out of the page cache.
+
+    magic      8 bytes    DICT_MAGIC
+    max_len    uint32     longest word length in bytes
+    table      (max_len + 1) x (offset uint32, count uint32)
+    buckets    count x length bytes for every length '''
+
+DICT_MAGIC = b'GHDICT1\x00'
+_HEADER = struct.Struct('<8sI')
+_BUCKET = struct.Struct('<II')
+
+def compile_word_list(words: Iterable[str], path: str) -> int:
+    ''' Writes words to path in the compiled dictionary format.
+    Returns the number of distinct words written '''
+    buckets = defaultdict(set)
+    for w in words:
+        w = w.strip().lower()
+        if w:
+            encoded = w.encode('utf-8')
+            buckets[len(encoded)].add(encoded)
+
+    max_len = max(buckets, default=0)
+    offset = _HEADER.size + _BUCKET.size * (max_len + 1)
+    table = list()
+    for length in range(max_len + 1):
+        count = len(buckets.get(length, ()))
+        table.append(_BUCKET.pack(offset, count))
+        offset += length * count
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(DICT_MAGIC, max_len))
+        f.write(b''.join(table))
+        for length in range(max_len + 1):
+            f.write(b''.join(sorted(buckets.get(length, ()))))
+
+    return sum(len(b) for b in buckets.values())
+
+class MmapValidator(WordValidator):
+    ''' Checks words against a file written by compile_word_list.
+    The file is memory-mapped read-only on the first check, so every process
+    using the same file shares one copy in the page cache. '''
+
+    ERR_BAD_DICT_FILE = 'File %s is not a compiled dictionary'
+
+    def __init__(self, path: str, cache_size: int = 0):
+        super().__init__(cache_size)
+        self.__path = path
+        self.__map = None
+        self.__buckets = None   # length to (offset, count)
+        self.__load_lock = threading.Lock()
+
+    def __load(self) -> mmap.mmap:
+        with self.__load_lock:
+            if self.__map is None:
+                with open(self.__path, 'rb') as f:
+                    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+                if len(m) < _HEADER.size or \
+                        _HEADER.unpack_from(m, 0)[0] != DICT_MAGIC:
+                    m.close()
+                    raise ValueError(MmapValidator.ERR_BAD_DICT_FILE % self.__path)
+
+                _, max_len = _HEADER.unpack_from(m, 0)
+                self.__buckets = [
+                    _BUCKET.unpack_from(m, _HEADER.size + _BUCKET.size * length)
+                    for length in range(max_len + 1)]
+                self.__map = m
+
+        return self.__map
+
+    def _lookup(self, word: str) -> bool:
+        m = self.__map or self.__load()
+        key = word.lower().encode('utf-8')
+        length = len(key)
+        if length >= len(self.__buckets):
+            return False
+
+        offset, count = self.__buckets[length]
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = offset + mid * length
+            record = m[start:start + length]
+            if record < key:
+                lo = mid + 1
+            elif record > key:
+                hi = mid
+            else:
+                return True
+
+        return False
+
+    @property
+    def can_list_words(self) -> bool:
+        return True
+
+    def words_of_length(self, length: int) -> List[str]:
+        ''' Returns every word of length bytes, in sorted order.
+        Bytes and characters only differ for non-ASCII words. '''
+        m = self.__map or self.__load()
+        if length <= 0 or length >= len(self.__buckets):
+            return list()
+
+        offset, count = self.__buckets[length]
+        return [m[i:i + length].decode('utf-8')
+                for i in range(offset, offset + length * count, length)]
+
+    def close(self) -> None:
+        with self.__load_lock:
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Compile a word list (one word per line) into a '
+                    'memory-mappable dictionary file')
+    parser.add_argument('word_list')
+    parser.add_argument('output')
+    args = parser.parse_args(argv)
+
+    with open(args.word_list) as f:
+        count = compile_word_list(f, args.output)
+
+    print('Compiled %d words into %s' % (count, args.output))
+
+if __name__ == '__main__':
+    main()
@@ -1,142 +1,531 @@
-from bidict import bidict
-from ghost.ghost import Ghost
+from ghost.dictionary import WordValidator
+from ghost.events import EventBus, GameDeleted, GameExpired, Rejected
+from ghost.ghost import GameView, Ghost
+from ghost.journal import Journal
+from ghost.registry import ShardedRegistry
+from ghost.timers import TimerWheel
 
-from typing import List, Dict
+from collections import defaultdict
+from typing import TYPE_CHECKING, Iterable, List, Dict, Mapping, Sequence, \
+    Tuple, Union
 
 import logging
+import struct
+import threading
+import time
+
+if TYPE_CHECKING:
+    # its HTTP exporter is slow to import and only needed with metrics
+    from ghost.metrics import EngineMetrics
+
+# bulk dump layout, see GhostEngine.dump_games
+_DUMP_HEADER = struct.Struct('<4sI')       # magic, number of games
+_DUMP_ENTRY = struct.Struct('<qHI')        # gid, host length, game length
+
+class _Waiters:
+    ''' The threads blocked on one game, see GhostEngine.wait_for_state.
+    Its condition is over the game's shard lock, and only notified when
+    the game's state, next clue giver or living players change. '''
+
+    def __init__(self, lock: threading.RLock, game: Ghost):
+        self.condition = threading.Condition(lock)
+        self.count = 0
+        self.key = _Waiters.key_of(game)
+
+    @staticmethod
+    def key_of(game: Ghost) -> tuple:
+        view = game.get_view()
+        return view.state, view.next_player, len(view.players)
 
 class GhostEngine:
 
     ERR_TOO_MANY_GAMES = 'Too many ongoing games... Please wait...'
     ERR_GID_ALREADY_EXISTS = 'There is already an ongoing game in this group'
     ERR_GID_DOES_NOT_EXIST = 'Game %d does not exist'
+    ERR_HOST_ALREADY_HOSTING = 'User @%s is already hosting a game'
 
     ERR_USER_IS_HOST = 'User @%s is the host of the game'
     ERR_USER_NOT_HOST = 'User @%s is not the host of any game'
     ERR_PLAYER_DOES_NOT_EXIST = 'User @%s has no ongoing game'
-
-    def __init__(self, max_games = 4):
-        self.__MAX_NUMBER_OF_GAMES = max_games
-        self.__games = dict()                   # gid to game
-        self.__host_to_gid = bidict()      # host to gid
+    ERR_PLAYER_IN_OTHER_GAME = 'User @%s is already playing in another game'
+    ERR_UNKNOWN_COMMAND = 'Unknown batch command %s'
+    ERR_NO_JOURNAL = 'The engine has no journal to snapshot to'
+    ERR_BAD_DUMP = 'Not a dump of games'
+
+    DUMP_MAGIC = b'GHD1'
+
+    # idle games are deleted at most 1/EXPIRY_TICKS_PER_TTL of idle_ttl late
+    EXPIRY_TICKS_PER_TTL = 64
+
+    def __init__(self, max_games: int = None,
+                 num_shards: int = ShardedRegistry.DEFAULT_NUM_SHARDS,
+                 validator: WordValidator = None, early_lynch: bool = False,
+                 idle_ttl: float = None, clock=time.monotonic,
+                 metrics: 'EngineMetrics' = None,
+                 max_players: int = Ghost.MAX_NUM_PLAYERS, seed: int = None):
+        ''' max_games caps the number of concurrent games, None for no cap.
+        Games are spread over num_shards lock-striped shards, so calls for
+        different games can run from many threads at once.
+        validator checks the words of every game, Ghost.VALIDATOR by default.
+        early_lynch resolves votes once the outcome is decided, see Ghost.
+        With idle_ttl, games that receive no command for idle_ttl seconds
+        of clock() are deleted by expire_idle_games.
+        metrics, built with the same clock, is kept up to date with the
+        engine's commands and games.
+        max_players caps the players of every game, see Ghost.
+        With seed, every game shuffles its order and roles with a generator
+        seeded from seed and its gid, so replaying the same commands on
+        another engine with the same seed gives the same games. '''
+        if not Ghost.MIN_NUM_PLAYERS <= max_players <= Ghost.PLAYER_LIMIT:
+            raise ValueError(Ghost.ERR_BAD_MAX_PLAYERS)
+
+        self.__validator = validator
+        self.__early_lynch = early_lynch
+        self.__max_players = max_players
+        self.__seed = seed
+        self.__bus = EventBus()
+        self.__games = ShardedRegistry(num_shards)          # gid to game
+        self.__gid_to_host = ShardedRegistry(num_shards)    # gid to host
+        self.__host_to_gid = ShardedRegistry(num_shards)    # host to gid
+        self.__username_to_gid = ShardedRegistry(num_shards)  # player to gid
+
+        self.__capacity = None
+        if max_games is not None:
+            self.__capacity = threading.BoundedSemaphore(max_games)
+
+        self.__journal = None
+
+        self.__idle_ttl = idle_ttl
+        self.__clock = clock
+        self.__last_active = dict()     # gid to clock() of its last command
+        self.__waiters = dict()         # gid to _Waiters, while threads wait
+        self.__expiry = None            # fires (gid, game) to check for idling
+        if idle_ttl is not None:
+            self.__expiry = TimerWheel(idle_ttl / GhostEngine.EXPIRY_TICKS_PER_TTL,
+                                       2 * GhostEngine.EXPIRY_TICKS_PER_TTL, clock())
+
+        self.__metrics = metrics
+        if metrics is not None:
+            metrics.attach(self)
 
     def add_game(self, gid: int, host: str) -> bool:
         ''' Creates a game in the engine.
         Returns True if the game was successfully created '''
         if gid in self.__games:
-            logging.warning(GhostEngine.ERR_GID_ALREADY_EXISTS)
+            self.__reject(gid, 'add_game', GhostEngine.ERR_GID_ALREADY_EXISTS)
             return False
-        elif len(self.__games) >= self.__MAX_NUMBER_OF_GAMES:
-            logging.warning(GhostEngine.ERR_TOO_MANY_GAMES)
+        elif self.__capacity is not None and \
+                not self.__capacity.acquire(blocking=False):
+            self.__reject(gid, 'add_game', GhostEngine.ERR_TOO_MANY_GAMES)
+            return False
+
+        is_new_host, _ = self.__host_to_gid.setdefault(host, gid)
+        if not is_new_host:
+            self.__release_capacity()
+            self.__reject(gid, 'add_game', GhostEngine.ERR_HOST_ALREADY_HOSTING,
+                          host)
             return False
 
-        new_game = Ghost()
-        self.__games[gid] = new_game
-        self.__host_to_gid[host] = gid
+        with self.__games.lock_for(gid):
+            is_new_game, _ = self.__games.setdefault(
+                gid, Ghost(self.__validator, self.__early_lynch, self.__bus,
+                           gid, self.__max_players, self.__game_seed(gid)))
+            if not is_new_game:
+                # lost the race against another thread creating this gid
+                self.__host_to_gid.pop_if(host, gid)
+                self.__release_capacity()
+                self.__reject(gid, 'add_game',
+                              GhostEngine.ERR_GID_ALREADY_EXISTS)
+                return False
+
+            self.__gid_to_host[gid] = host
+            if self.__expiry is not None:
+                now = self.__clock()
+                self.__last_active[gid] = now
+                self.__expiry.schedule((gid, self.__games[gid]),
+                                       now + self.__idle_ttl)
+            if self.__journal is not None:
+                self.__journal.append(gid, 'add_game', gid, host)
+            if self.__metrics is not None:
+                self.__metrics.game_added(gid, Ghost.States.REGISTER_PLAYERS)
+
         return True
 
     def delete_game(self, gid: int) -> bool:
         ''' Removes a game from the engine. 
         Returns True if the game was successfully deleted '''
-        self.__is_game_exists()
-        del self.__games[gid]
-
-        host = self.__get_host_from_gid(gid)
-        del self.__hosts_to_gid[host]
+        with self.__games.lock_for(gid):
+            if not self.__is_game_exists(gid, 'delete_game'):
+                return False
+
+            game = self.__games.pop(gid)
+            host = self.__gid_to_host.pop(gid)
+            self.__last_active.pop(gid, None)
+            waiters = self.__waiters.get(gid)
+            if waiters is not None:
+                waiters.condition.notify_all()
+            self.__release_players(gid, game.get_existing_players())
+            if self.__journal is not None:
+                self.__journal.append(gid, 'delete_game', gid)
+            if self.__metrics is not None:
+                self.__metrics.game_removed(gid)
+            if self.__bus:
+                self.__bus.publish(GameDeleted(gid))
+
+        self.__host_to_gid.pop_if(host, gid)
+        self.__release_capacity()
+        return True
 
-    def __is_game_exists(self, gid: int) -> bool:
+    @property
+    def metrics(self) -> 'EngineMetrics':
+        ''' The engine's metrics, None unless given '''
+        return self.__metrics
+
+    @property
+    def events(self) -> EventBus:
+        ''' Bus that every game in this engine publishes its events to '''
+        return self.__bus
+
+    def __reject(self, gid: int, command: str, reason: str, *args) -> None:
+        logging.warning(reason, *args)
+        if self.__bus:
+            self.__bus.publish(Rejected(gid, command, reason, args))
+
+    def has_game(self, gid: int) -> bool:
+        ''' Returns True if a game with this gid is in the engine '''
+        return gid in self.__games
+
+    def __touch(self, gid: int, game: Ghost) -> None:
+        ''' Records a command that changed a game, which keeps it alive and
+        wakes the threads waiting on it if its state or turn moved. Rejected
+        commands do not count, so they cannot keep an abandoned game alive.
+        Called with the game's lock held. '''
+        if self.__expiry is not None and gid in self.__last_active:
+            self.__last_active[gid] = self.__clock()
+
+        waiters = self.__waiters.get(gid)
+        if waiters is not None:
+            key = _Waiters.key_of(game)
+            if key != waiters.key:
+                waiters.key = key
+                waiters.condition.notify_all()
+
+    def expire_idle_games(self) -> List[int]:
+        ''' Deletes every game that received no command for idle_ttl
+        seconds, and publishes a GameExpired event for each.
+        Call it periodically; each call only visits the timers that are due.
+        Returns the gids of the deleted games. '''
+        if self.__expiry is None:
+            return list()
+
+        now = self.__clock()
+        expired = list()
+        for gid, game in self.__expiry.advance(now):
+            with self.__games.lock_for(gid):
+                if self.__games.get(gid) is not game:
+                    # deleted, and maybe replaced, since it was scheduled
+                    continue
+
+                last_active = self.__last_active[gid]
+                if now - last_active < self.__idle_ttl:
+                    self.__expiry.schedule((gid, game),
+                                           last_active + self.__idle_ttl)
+                    continue
+
+                host = self.__gid_to_host.get(gid)
+                self.delete_game(gid)
+
+            expired.append(gid)
+            logging.info('Deleted game %d after %.0fs idle', gid, now - last_active)
+            if self.__bus:
+                self.__bus.publish(GameExpired(gid, host, now - last_active))
+
+        return expired
+
+    def __release_capacity(self) -> None:
+        if self.__capacity is not None:
+            self.__capacity.release()
+
+    def __is_game_exists(self, gid: int, command: str) -> bool:
         if gid not in self.__games:
-            logging.warning(GhostEngine.ERR_GID_DOES_NOT_EXIST % gid)
+            self.__reject(gid, command, GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
             return False
 
         return True
 
-    def __is_host_exists(self, host: str) -> bool:
-        if host not in self.__host_to_gid:
-            logging.warning(GhostEngine.ERR_USER_NOT_HOST % host)
-            return False
-
-        return True
+    def __release_players(self, gid: int, players: List[str]) -> None:
+        for player in players:
+            self.__username_to_gid.pop_if(player, gid)
 
-    def __is_player_exists(self, username: str) -> None:
-        if player not in self.__username_to_gid:
-            logging.warning(GhostEngine.ERR_PLAYER_DOES_NOT_EXIST)
-            return False
+    def __release_dead_players(self, gid: int, game: Ghost, *players) -> None:
+        ''' Drops killed players from the player index.
+        Once the game is won, every remaining player is free again. '''
+        if game.is_game_over():
+            self.__release_players(gid, game.get_existing_players())
 
-        return True
+        self.__release_players(
+            gid, [p for p in players if p and not game.is_player_alive(p)])
 
-    def __get_game_from_gid(self, gid: int) -> Ghost:
-        if not self.__is_game_exists(gid):
+    def __get_game_from_gid(self, gid: int, command: str) -> Ghost:
+        game = self.__games.get(gid)
+        if game is None:
+            self.__reject(gid, command, GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
             return Ghost() 
 
-        return self.__games[gid]
+        return game
 
     def get_gid_from_host(self, host: str) -> int:
         ''' Returns the gid the host is in-charge of, -1 otherwise  '''
-        if not self.__is_host_exists(host):
+        gid = self.__host_to_gid.get(host)
+        if gid is None:
+            logging.warning(GhostEngine.ERR_USER_NOT_HOST, host)
             return -1
 
-        return self.__host_to_gid[host]
+        return gid
 
-    def __get_host_from_gid(self, gid: int) -> str:
-        if not self.__is_game_exists(gid):
+    def get_gid_from_player(self, player: str) -> int:
+        ''' Returns the gid of the game the player is in, -1 otherwise '''
+        gid = self.__username_to_gid.get(player)
+        if gid is None:
+            logging.warning(GhostEngine.ERR_PLAYER_DOES_NOT_EXIST, player)
+            return -1
+
+        return gid
+
+    def __get_host_from_gid(self, gid: int, command: str) -> str:
+        host = self.__gid_to_host.get(gid)
+        if host is None:
+            self.__reject(gid, command, GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
             return ''
 
-        return self.__host_to_gid.inverse[gid]
+        return host
 
     ''' GET GAME INFORMATION '''
 
     def get_game_state(self, gid: int) -> Ghost.States:
-        game = self.__get_game_from_gid(gid)
-        return game.get_game_state()
-
-    def get_existing_players(self, gid: int) -> List[str]:
-        game = self.__get_game_from_gid(gid)
-        return game.get_existing_players()
-
-    def get_player_order(self, gid: int) -> List[str]:
-        game = self.__get_game_from_gid(gid)
-        return game.get_player_order()
-
-    def get_player_roles(self, gid: int) -> Dict[str, Ghost.Roles]:
-        game = self.__get_game_from_gid(gid)
-        return game.get_player_roles()
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_game_state')
+            return game.get_game_state()
+
+    def get_existing_players(self, gid: int) -> Tuple[str, ...]:
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_existing_players')
+            return game.get_existing_players()
+
+    def get_player_order(self, gid: int) -> Tuple[str, ...]:
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_player_order')
+            return game.get_player_order()
+
+    def get_player_roles(self, gid: int) -> Mapping[str, Ghost.Roles]:
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_player_roles')
+            return game.get_player_roles()
+
+    def get_role_census(self, gid: int) -> Dict[Ghost.Roles, int]:
+        ''' Returns the number of living players in each role.
+        An empty dict() is returned if roles have not been allocated. '''
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_role_census')
+            return game.get_role_census()
+
+    def get_state_census(self) -> Dict[Ghost.States, int]:
+        ''' Returns the number of games in each state. States without
+        games are left out. '''
+        census = defaultdict(int)
+        for _, game in self.__games.items():
+            census[game.get_game_state()] += 1
+        return dict(census)
 
     def get_words(self, gid: int) -> (str, str):
-        game = self.__get_game_from_gid(gid)
-        return game.get_words()
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_words')
+            return game.get_words()
+
+    def get_view(self, gid: int) -> GameView:
+        ''' Returns an immutable view of the game, shared by every caller
+        until the game changes '''
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_view')
+            return game.get_view()
+
+    def get_if_changed(self, gid: int, since_version: int) -> (int, GameView):
+        ''' Returns a tuple of the game's version and its view.
+        The view is None if the version is still since_version, so idle
+        pollers cost one comparison. The version is -1 for unknown games. '''
+        with self.__games.lock_for(gid):
+            game = self.__games.get(gid)
+            if game is None:
+                self.__reject(gid, 'get_if_changed',
+                              GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
+                return -1, None
+
+            version = game.get_version()
+            if version == since_version:
+                return version, None
+
+            return version, game.get_view()
+
+    ''' WAITS '''
+
+    def wait_for_state(self, gid: int, states: Union[Ghost.States, Iterable[Ghost.States]],
+                       timeout: float = None) -> Ghost.States:
+        ''' Blocks until the game is in one of states, and returns that state.
+        Returns None on timeout, or if the game does not exist or is deleted. '''
+        if isinstance(states, Ghost.States):
+            states = (states,)
+        states = frozenset(states)
+
+        with self.__games.lock_for(gid):
+            game = self.__games.get(gid)
+            if game is None:
+                self.__reject(gid, 'wait_for_state',
+                              GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
+                return None
+
+            self.__wait(gid, game, lambda: self.__games.get(gid) is not game or
+                        game.get_game_state() in states, timeout)
+            state = game.get_game_state()
+            if self.__games.get(gid) is not game or state not in states:
+                return None
+
+            return state
+
+    def wait_for_turn(self, gid: int, player: str, timeout: float = None) -> bool:
+        ''' Blocks until it is the player's turn to give a clue.
+        Returns False on timeout, or as soon as the turn can no longer come:
+        the player is not alive in the game, or the game is over or deleted. '''
+        with self.__games.lock_for(gid):
+            game = self.__games.get(gid)
+            if game is None:
+                self.__reject(gid, 'wait_for_turn',
+                              GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
+                return False
+
+            def is_turn() -> bool:
+                return self.__games.get(gid) is game and \
+                    game.get_view().next_player == player
+
+            def is_settled() -> bool:
+                return is_turn() or self.__games.get(gid) is not game or \
+                    not game.is_player_alive(player) or game.is_game_over()
+
+            self.__wait(gid, game, is_settled, timeout)
+            return is_turn()
+
+    def __wait(self, gid: int, game: Ghost, predicate, timeout: float) -> None:
+        ''' Waits on the game's own condition, so commands on other games of
+        its shard never wake the thread. Called with the game's lock held. '''
+        waiters = self.__waiters.get(gid)
+        if waiters is None:
+            waiters = _Waiters(self.__games.lock_for(gid), game)
+            self.__waiters[gid] = waiters
+
+        waiters.count += 1
+        try:
+            waiters.condition.wait_for(predicate, timeout)
+        finally:
+            waiters.count -= 1
+            if not waiters.count:
+                del self.__waiters[gid]
 
     ''' PHASE: REGISTER PLAYERS '''
 
-    def register_player(self, gid: int, player: str) -> int:
-        ''' Returns the number of players registered in the game '''
-        host = self.__get_host_from_gid(gid)
-        game = self.__get_game_from_gid(gid)
-
-        if player == host:
-            logging.warning(GhostEngine.ERR_USER_IS_HOST % player)
-            return len(game.get_existing_players())
-
-        return game.register_player(player)
+    def register_player(self, gid: int, player: str) -> (bool, int):
+        ''' Returns a tuple of a boolean and an integer.
+        The boolean is True if the player is successfully registered.
+        The integer is the number of players registered in the game. '''
+        with self.__games.lock_for(gid):
+            game = self.__games.get(gid)
+            if game is None:
+                # before the username is claimed, so it stays free
+                self.__reject(gid, 'register_player',
+                              GhostEngine.ERR_GID_DOES_NOT_EXIST, gid)
+                return False, 0
+
+            host = self.__get_host_from_gid(gid, 'register_player')
+            if player == host:
+                self.__reject(gid, 'register_player',
+                              GhostEngine.ERR_USER_IS_HOST, player)
+                return False, len(game.get_existing_players())
+
+            is_new, player_gid = self.__username_to_gid.setdefault(player, gid)
+            if player_gid != gid:
+                self.__reject(gid, 'register_player',
+                              GhostEngine.ERR_PLAYER_IN_OTHER_GAME, player)
+                return False, len(game.get_existing_players())
+
+            is_success, num_players = game.register_player(player)
+            if not is_success and is_new:
+                self.__username_to_gid.pop_if(player, gid)
+            elif is_success:
+                self.__touch(gid, game)
+                if self.__journal is not None:
+                    self.__journal.append(gid, 'register_player', gid, player)
+
+            return is_success, num_players
+
+    def unregister_player(self, gid: int, player: str) -> bool:
+        ''' Returns True if the player was successfully unregistered '''
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'unregister_player')
+            is_success = game.unregister_player(player)
+            if is_success:
+                self.__touch(gid, game)
+                self.__release_players(gid, [player])
+                if self.__journal is not None:
+                    self.__journal.append(gid, 'unregister_player', gid, player)
+
+            return is_success
 
     def start_game(self, gid: int) -> bool:
         ''' Returns True if the game was successfully started '''
-        game = self.__get_game_from_gid(gid)
-        return game.start_game()
-        
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'start_game')
+            is_success = game.start_game()
+            if is_success:
+                self.__touch(gid, game)
+            if is_success and self.__journal is not None:
+                # roles and order are random, so log the game they produced
+                self.__journal.append(gid, 'restore_game', game.to_dict())
+
+            return is_success
+
     ''' PHASE: SET PARAM '''
 
     def set_param_town_word(self, host: str, value: str) -> bool:
         ''' Returns True if the town word was successfully set '''
         gid = self.get_gid_from_host(host)
-        game = self.__get_game_from_gid(gid)
-        return game.set_param_town_word(value)
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'set_param_town_word')
+            is_success = game.set_param_town_word(value)
+            if is_success:
+                self.__touch(gid, game)
+            if is_success and self.__journal is not None:
+                self.__journal.append(gid, 'set_param_town_word', host, value)
+
+            return is_success
 
     def set_param_fool_word(self, host: str, value: str) -> bool:
         ''' Returns True if the fool word was successfully set '''
         gid = self.get_gid_from_host(host)
-        game = self.__get_game_from_gid(gid)
-        return game.set_param_fool_word(value)
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'set_param_fool_word')
+            is_success = game.set_param_fool_word(value)
+            if is_success:
+                self.__touch(gid, game)
+            if is_success and self.__journal is not None:
+                self.__journal.append(gid, 'set_param_fool_word', host, value)
+
+            return is_success
+
+    def suggest_fool_words(self, host: str, k: int = 5) -> List[str]:
+        ''' Returns up to k valid fool words with the same length as the
+        town word, most similar first. The town word must be set. '''
+        gid = self.get_gid_from_host(host)
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'suggest_fool_words')
+            return game.suggest_fool_words(k)
 
     ''' PHASE: CLUES '''
 
@@ -144,21 +533,38 @@ class GhostEngine:
         ''' Returns the name of the next person expected to give a clue.
         An empty string is returned if all clues have been given or 
         it's not the clue phase '''
-        game = self.__get_game_from_gid(gid)
-        return game.get_next_in_player_order()
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_next_in_player_order')
+            return game.get_next_in_player_order()
 
     def set_clue(self, gid: int, player: str, clue: str) -> (bool, bool):
         ''' Returns a tuple of two booleans. 
         The first boolean is True if the clue is successfully given.
         The second boolean is True if all players have given a clue. '''
-        game = self.__get_game_from_gid(gid)
-        return game.set_clue(player, clue)
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'set_clue')
+            return self.__set_clue(gid, game, player, clue)
+
+    def __set_clue(self, gid: int, game: Ghost, player: str,
+                   clue: str) -> (bool, bool):
+        is_success, is_complete = game.set_clue(player, clue)
+        if is_success:
+            self.__touch(gid, game)
+        if is_success and self.__journal is not None:
+            self.__journal.append(gid, 'set_clue', gid, player, clue)
+
+        return is_success, is_complete
+
+    def set_clue_by_player(self, player: str, clue: str) -> (bool, bool):
+        ''' Same as set_clue, in the game the player is in '''
+        return self.set_clue(self.get_gid_from_player(player), player, clue)
 
-    def get_all_clues(self, gid: int) -> Dict[str, str]:
+    def get_all_clues(self, gid: int) -> Mapping[str, str]:
         ''' Returns the clues given by the users.
         An empty dict() is returned if not all clues have been given. '''
-        game = self.__get_game_from_gid(gid)
-        return game.get_all_clues()
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'get_all_clues')
+            return game.get_all_clues()
 
     ''' PHASE: VOTE '''
 
@@ -167,15 +573,219 @@ class GhostEngine:
         The first boolean is True if the vote is successfully made.
         The second boolean is True if all the players have voted.
         The third boolean returns the player voted out, 
-        or an empty string if no one is voted out. '''
-        game = self.__get_game_from_gid(gid)
-        return game.set_vote(player, vote)
+        or an empty string if no one is voted out. 
+        With early_lynch, the round may complete before everyone has voted. '''
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'set_vote')
+            return self.__set_vote(gid, game, player, vote)
+
+    def __set_vote(self, gid: int, game: Ghost, player: str,
+                   vote: str) -> (bool, bool, str):
+        is_success, is_complete, lynched = game.set_vote(player, vote)
+        if is_success:
+            self.__touch(gid, game)
+        if is_success and self.__journal is not None:
+            self.__journal.append(gid, 'set_vote', gid, player, vote)
+        if is_complete:
+            self.__release_dead_players(gid, game, lynched)
+
+        return is_success, is_complete, lynched
+
+    def set_vote_by_player(self, player: str, vote: str) -> (bool, bool, str):
+        ''' Same as set_vote, in the game the player is in '''
+        return self.set_vote(self.get_gid_from_player(player), player, vote)
 
     ''' PHASE: GUESS '''
 
-    def make_guess(self, gid: int, player: str, guess: str) -> bool:
+    def make_guess(self, gid: int, player: str, guess: str) -> (bool, bool):
         ''' Returns a tuple of two booleans.
         The first boolean is True if the guess is successfully made.
         The second boolean is True if the guess is correct. '''
-        game = self.__get_game_from_gid(gid)
-        return game.make_guess(player, guess)
+        with self.__games.lock_for(gid):
+            game = self.__get_game_from_gid(gid, 'make_guess')
+            return self.__make_guess(gid, game, player, guess)
+
+    def __make_guess(self, gid: int, game: Ghost, player: str,
+                     guess: str) -> (bool, bool):
+        is_success, is_correct = game.make_guess(player, guess)
+        if is_success:
+            self.__touch(gid, game)
+            self.__release_dead_players(gid, game, player)
+            if self.__journal is not None:
+                self.__journal.append(gid, 'make_guess', gid, player, guess)
+
+        return is_success, is_correct
+
+    def make_guess_by_player(self, player: str, guess: str) -> (bool, bool):
+        ''' Same as make_guess, in the game the player is in '''
+        return self.make_guess(self.get_gid_from_player(player), player, guess)
+
+    ''' BATCHES '''
+
+    BATCH_COMMANDS = ('set_clue', 'set_vote', 'make_guess')
+
+    def apply_batch(self, commands: Sequence[Tuple[int, str, str, str]]) -> List[tuple]:
+        ''' Applies many (gid, command, player, arg) tuples in one call.
+        command is one of BATCH_COMMANDS, and arg is the clue, vote or guess.
+        Commands are grouped by game, so each game is looked up and locked
+        once, and commands for the same game apply in their original order.
+        Returns the result tuple of each command, in the order given. '''
+        handlers = {
+            'set_clue': self.__set_clue,
+            'set_vote': self.__set_vote,
+            'make_guess': self.__make_guess
+        }
+
+        by_gid = defaultdict(list)      # gid to indices of its commands
+        for i, (gid, command, _, _) in enumerate(commands):
+            if command not in handlers:
+                raise ValueError(GhostEngine.ERR_UNKNOWN_COMMAND % command)
+            by_gid[gid].append(i)
+
+        results = [None] * len(commands)
+        for gid, indices in by_gid.items():
+            with self.__games.lock_for(gid):
+                game = self.__get_game_from_gid(gid, 'apply_batch')
+                for i in indices:
+                    _, command, player, arg = commands[i]
+                    results[i] = handlers[command](gid, game, player, arg)
+
+        return results
+
+    ''' PERSISTENCE '''
+
+    @classmethod
+    def recover(cls, journal: Journal, **kwargs) -> 'GhostEngine':
+        ''' Returns an engine built from kwargs that holds every game in
+        the journal, from its last snapshot and the log after it.
+        Every later command is logged to the journal. '''
+        engine = cls(**kwargs)
+        snapshot_seq, games, records = journal.recovered()
+
+        game_seqs = dict()      # gid to seq of the game's snapshot
+        for gid, host, seq, data in games:
+            if engine.add_game(gid, host):
+                engine.__restore_game(
+                    gid, engine.__game_from(Ghost.from_dict, data, gid))
+                game_seqs[gid] = seq
+
+        for seq, gid, command, *args in records:
+            if seq <= game_seqs.get(gid, snapshot_seq):
+                continue
+            elif command == 'restore_game':
+                if not engine.has_game(gid):
+                    # logged while a snapshot was taken, by a game deleted
+                    # before the snapshot reached it
+                    continue
+                engine.__restore_game(
+                    gid, engine.__game_from(Ghost.from_dict, args[0], gid))
+            else:
+                getattr(engine, command)(*args)
+
+        engine.__journal = journal
+        journal.start(engine.snapshot)
+        return engine
+
+    def __game_from(self, decode, data, gid: int) -> Ghost:
+        ''' Decodes a game with Ghost.from_dict or from_bytes for this engine '''
+        return decode(data, self.__validator, self.__early_lynch, self.__bus, gid,
+                      self.__max_players, self.__game_seed(gid))
+
+    def __game_seed(self, gid: int) -> str:
+        if self.__seed is None:
+            return None
+        return '%s/%d' % (self.__seed, gid)
+
+    def __restore_game(self, gid: int, game: Ghost) -> None:
+        with self.__games.lock_for(gid):
+            self.__games[gid] = game
+            if self.__expiry is not None:
+                self.__expiry.schedule((gid, game),
+                                       self.__last_active[gid] + self.__idle_ttl)
+            if not game.is_game_over():
+                for player in game.get_existing_players():
+                    self.__username_to_gid[player] = gid
+            if self.__journal is not None:
+                self.__journal.append(gid, 'restore_game', game.to_dict())
+            if self.__metrics is not None:
+                self.__metrics.game_added(gid, game.get_game_state())
+
+    def snapshot(self) -> int:
+        ''' Writes every game to the journal's snapshot and drops the log
+        it replaces. Games are locked one at a time, so commands keep
+        flowing meanwhile. Returns the number of games written. '''
+        if self.__journal is None:
+            raise ValueError(GhostEngine.ERR_NO_JOURNAL)
+
+        seq = self.__journal.begin_snapshot()
+        games = list()
+        try:
+            for gid in list(self.__games.keys()):
+                with self.__games.lock_for(gid):
+                    game = self.__games.get(gid)
+                    if game is not None:
+                        games.append((gid, self.__gid_to_host.get(gid),
+                                      self.__journal.seq, game.to_dict()))
+        except Exception:
+            self.__journal.abort_snapshot()
+            raise
+
+        self.__journal.end_snapshot(seq, games)
+        return len(games)
+
+    def close(self) -> None:
+        ''' Writes out and closes the journal, if any '''
+        if self.__journal is not None:
+            self.__journal.close()
+
+    def dump_games(self, gids: Sequence[int] = None) -> bytes:
+        ''' Returns the games with the given gids, or every game, with their
+        hosts in one binary blob for load_games. Unknown gids are skipped. '''
+        if gids is None:
+            gids = list(self.__games.keys())
+
+        parts = [b'']
+        num_games = 0
+        for gid in gids:
+            with self.__games.lock_for(gid):
+                game = self.__games.get(gid)
+                if game is None:
+                    continue
+                host = self.__gid_to_host.get(gid).encode()
+                data = game.to_bytes()
+
+            parts.append(_DUMP_ENTRY.pack(gid, len(host), len(data)))
+            parts.append(host)
+            parts.append(data)
+            num_games += 1
+
+        parts[0] = _DUMP_HEADER.pack(GhostEngine.DUMP_MAGIC, num_games)
+        return b''.join(parts)
+
+    def load_games(self, dump: bytes) -> int:
+        ''' Adds every game of a dump_games blob to this engine.
+        Games whose gid or host is taken here are skipped, with a warning.
+        Returns the number of games added. '''
+        dump = memoryview(dump)
+        if len(dump) < _DUMP_HEADER.size:
+            raise ValueError(GhostEngine.ERR_BAD_DUMP)
+        magic, num_games = _DUMP_HEADER.unpack_from(dump)
+        if magic != GhostEngine.DUMP_MAGIC:
+            raise ValueError(GhostEngine.ERR_BAD_DUMP)
+
+        offset = _DUMP_HEADER.size
+        num_added = 0
+        for _ in range(num_games):
+            gid, host_length, data_length = _DUMP_ENTRY.unpack_from(dump, offset)
+            offset += _DUMP_ENTRY.size
+            host = str(dump[offset:offset + host_length], 'utf-8')
+            offset += host_length
+            game = self.__game_from(Ghost.from_bytes,
+                                    dump[offset:offset + data_length], gid)
+            offset += data_length
+
+            if self.add_game(gid, host):
+                self.__restore_game(gid, game)
+                num_added += 1
+
+        return num_added
@@ -0,0 +1,174 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import logging
+import queue
+import threading
+
+''' EVENTS
+
+Every event carries the gid of its game, or None for a game that was
+created outside an engine. Events are immutable. '''
+
+class PlayerRegistered(NamedTuple):
+    gid: int
+    username: str
+
+class PlayerUnregistered(NamedTuple):
+    gid: int
+    username: str
+
+class RolesAllocated(NamedTuple):
+    gid: int
+    roles: Dict[str, Any]       # username to Ghost.Roles
+    order: Tuple[str, ...]      # clue order
+
+class StateChanged(NamedTuple):
+    ''' old and new are equal when a round of the same phase restarts '''
+    gid: int
+    old: Any                    # Ghost.States
+    new: Any
+
+class ClueSet(NamedTuple):
+    gid: int
+    username: str
+    clue: str
+
+class VoteCast(NamedTuple):
+    ''' vote is the empty string for an abstention '''
+    gid: int
+    username: str
+    vote: str
+
+class Lynched(NamedTuple):
+    gid: int
+    username: str
+    role: Any                   # Ghost.Roles
+
+class PlayerKilled(NamedTuple):
+    gid: int
+    username: str
+    role: Any
+
+class GuessMade(NamedTuple):
+    gid: int
+    username: str
+    guess: str
+    is_correct: bool
+
+class Winner(NamedTuple):
+    gid: int
+    state: Any                  # Ghost.States.WINNER_*
+
+class GameDeleted(NamedTuple):
+    ''' The engine removed a game, whatever state it was in '''
+    gid: int
+
+class GameExpired(NamedTuple):
+    ''' The engine deleted a game after idle seconds without commands '''
+    gid: int
+    host: str
+    idle: float
+
+class Rejected(NamedTuple):
+    ''' A command that was refused. reason is the ERR_ template it was
+    refused with, and args fill in its placeholders. '''
+    gid: int
+    command: str
+    reason: str
+    args: Tuple = ()
+
+    @property
+    def code(self) -> str:
+        ''' Name of the ERR_ constant, like ERR_PLAYER_NOT_IN_ORDER '''
+        return reason_code(self.reason)
+
+    @property
+    def message(self) -> str:
+        return self.reason % self.args if self.args else self.reason
+
+_reason_codes = dict()     # ERR_ template to its constant name
+
+def reason_code(reason: str) -> str:
+    ''' Returns the name of the Ghost, GhostEngine or AdmissionGate ERR_ constant
+    holding reason, or reason itself if there is none '''
+    if not _reason_codes:
+        from ghost.admission import AdmissionGate
+        from ghost.engine import GhostEngine
+        from ghost.ghost import Ghost
+        for cls in (Ghost, GhostEngine, AdmissionGate):
+            for name, value in vars(cls).items():
+                if name.startswith('ERR_'):
+                    _reason_codes[value] = name
+
+    return _reason_codes.get(reason, reason)
+
+''' SUBSCRIBERS '''
+
+class EventBus:
+    ''' Delivers events to subscribers synchronously, in publish order.
+    An empty bus is falsy, so publishers skip building events with
+    `if bus: bus.publish(...)` and pay almost nothing without subscribers. '''
+
+    def __init__(self):
+        # replaced rather than mutated, so publish never needs the lock
+        self.__subscribers = tuple()
+        self.__lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.__subscribers)
+
+    def subscribe(self, callback: Callable[[Any], None]) -> Callable[[Any], None]:
+        ''' Calls callback(event) for every event. Returns the callback. '''
+        with self.__lock:
+            self.__subscribers = self.__subscribers + (callback,)
+
+        return callback
+
+    def subscribe_queue(self, maxsize: int = 1024) -> 'EventQueue':
+        ''' Returns a bounded queue that receives every event '''
+        return self.subscribe(EventQueue(maxsize))
+
+    def unsubscribe(self, callback: Callable[[Any], None]) -> None:
+        with self.__lock:
+            # bound methods are rebuilt on every access, so compare by value
+            self.__subscribers = tuple(s for s in self.__subscribers
+                                       if s != callback)
+
+    def publish(self, event: Any) -> None:
+        for callback in self.__subscribers:
+            try:
+                callback(event)
+            except Exception:
+                # a faulty subscriber must not break the game mid-transition
+                logging.exception('Event subscriber failed on %r', event)
+
+class EventQueue:
+    ''' Bounded event queue for consumers on other threads.
+    Events published while the queue is full are dropped and counted. '''
+
+    def __init__(self, maxsize: int = 1024):
+        self.__queue = queue.Queue(maxsize)
+        self.__dropped = 0
+
+    def __call__(self, event: Any) -> None:
+        try:
+            self.__queue.put_nowait(event)
+        except queue.Full:
+            self.__dropped += 1
+
+    @property
+    def dropped(self) -> int:
+        return self.__dropped
+
+    def get(self, timeout: float = None) -> Any:
+        ''' Blocks for the next event. Raises queue.Empty on timeout. '''
+        return self.__queue.get(timeout=timeout)
+
+    def drain(self) -> List[Any]:
+        ''' Returns every queued event without blocking '''
+        result = list()
+        while True:
+            try:
+                result.append(self.__queue.get_nowait())
+            except queue.Empty:
+                return result
@@ -1,32 +1,142 @@
+from array import array
 from enum import Enum
-from collections import defaultdict
 import random
-import enchant
+import struct
+import sys
 
-from typing import List
+from ghost import events
+from ghost.dictionary import WordValidator, EnchantValidator
+from ghost.suggest import FoolWordIndex
+
+from collections.abc import Mapping as MappingABC
+from typing import Dict, List, Mapping, NamedTuple, Tuple, Union
 
 import logging
 
+# binary game layout, see Ghost.to_bytes
+# version, state, players, order length, order index, pending, last lynched,
+# game version. Order index and last lynched are 32-bit, as ids of large
+# games do not fit 16 signed bits; version 2 headers had them 16-bit, and
+# version 1 headers also had no game version.
+_GAME_HEADER = struct.Struct('<BBHHiHiQ')
+_GAME_HEADER_V2 = struct.Struct('<BBHHhHhQ')
+_GAME_HEADER_V1 = struct.Struct('<BBHHhHh')
+_GAME_HEADERS = {1: _GAME_HEADER_V1, 2: _GAME_HEADER_V2, 3: _GAME_HEADER}
+_NO_TEXT = 0xFFFFFFFF      # text length of a missing word or clue
+
 class Player:
+    ''' Snapshot of one living player, see Ghost.get_player '''
 
-    def __init__(self):
-        self.role = Ghost.Roles.TOWN
-        self.clue = None
-        self.vote = None
+    __slots__ = ('role', 'clue', 'vote')
 
-class Ghost:
+    def __init__(self, role: 'Ghost.Roles' = None, clue: str = None,
+                 vote: str = None):
+        self.role = role
+        self.clue = clue
+        self.vote = vote
+
+class FrozenDict(dict):
+    ''' A dict that refuses changes, so one copy can be shared by every caller '''
+
+    __slots__ = ()
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError('FrozenDict is read-only')
+
+    __setitem__ = __delitem__ = __ior__ = __readonly
+    clear = pop = popitem = setdefault = update = __readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+class _ClueMap(MappingABC):
+    ''' Living players to their clue, None if not given, as of one view.
+    Shares the clue arrays of the round with the game, as given clues never
+    change within a round, and hides the clues given after the view. '''
+
+    __slots__ = ('__ids', '__clues', '__ranks', '__num_given')
+
+    def __init__(self, ids: Mapping[str, int], clues: List[str],
+                 ranks: array, num_given: int):
+        self.__ids = ids
+        self.__clues = clues
+        self.__ranks = ranks
+        self.__num_given = num_given
+
+    def __getitem__(self, username: str) -> str:
+        pid = self.__ids[username]
+        if self.__num_given and self.__ranks[pid] < self.__num_given:
+            return self.__clues[pid]
+        return None
+
+    def __contains__(self, username: str) -> bool:
+        return username in self.__ids
+
+    def __iter__(self):
+        return iter(self.__ids)
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
 
-    DICTIONARY = enchant.Dict("en-US")
+class GameView(NamedTuple):
+    ''' What a game looked like at one version, see Ghost.get_view '''
+    version: int
+    state: 'Ghost.States'
+    players: Tuple[str, ...]            # living players, in registration order
+    order: Tuple[str, ...]              # clue order
+    roles: Mapping[str, 'Ghost.Roles']  # empty until roles are allocated
+    clues: Mapping[str, str]            # living player to clue, None if not given
+    next_player: str                    # expected clue giver, '' if none
+    last_lynched: str
+
+class Ghost:
+    ''' One game of ghost.
+    Players are small integer ids, numbered in registration order. Their
+    interned usernames, roles, clues and votes are kept in parallel arrays
+    indexed by id, and ids stay valid after a player is killed. '''
+
+    __slots__ = ('__validator', '__early_lynch', '__max_players', '__bus', '__gid',
+                 '__game_state',
+                 '__town_word', '__fool_word', '__ids', '__names', '__roles',
+                 '__clues', '__votes', '__num_pending', '__vote_counts',
+                 '__count_freq', '__first_count', '__runner_count',
+                 '__role_counts', '__player_order', '__player_order_index',
+                 '__last_lynched', '__version', '__view', '__all_clues',
+                 '__clue_ranks', '__num_clues', '__roster', '__seed', '__shared')
+
+    # default word validator, enchant is only loaded on the first check
+    VALIDATOR = EnchantValidator("en-US")
 
     # parameters for validation
     MIN_NUM_PLAYERS = 3
     MAX_NUM_PLAYERS = 10
 
+    # highest max_players of large games, as ids and counts take 16 bits
+    PLAYER_LIMIT = 0xFFFF
+
     MIN_WORD_LENGTH = 3
     MAX_WORD_LENGTH = 15
 
+    # upper bound on get_memory_footprint() for a game of MAX_NUM_PLAYERS
+    # players with 15-character usernames and clues and a cached view,
+    # checked by the tests
+    BYTE_BUDGET_PER_GAME = 4096
+
     __EMPTY_VOTE = ''
 
+    # clue rank of players without a clue this round
+    __NOT_GIVEN = 0xFFFF
+
+    # vote array entries that are not player ids
+    __NO_VOTE_ID = -1
+    __EMPTY_VOTE_ID = -2
+
     class Roles(Enum):
         GHOST = 'Ghost'
         TOWN = 'Town'
@@ -34,6 +144,7 @@ class Ghost:
 
     # defines number of each role given number of players
     # TOWN, GHOST, FOOL
+    # larger games get the ghost and fool shares of the largest set
     __ROLE_SETS = {
         3: (2, 1, 0),
         4: (2, 1, 1),
@@ -45,6 +156,20 @@ class Ghost:
         10: (4, 3, 3)
     }
 
+    # mangled names of every field, copied by fork
+    __FIELDS = tuple('_Ghost' + name for name in __slots__)
+
+    # containers a fork shares until either game writes to them, see fork
+    __SHARED_LIVING = 1         # ids, role_counts, player_order
+    __SHARED_CLUES = 2          # clues, clue_ranks
+    __SHARED_VOTES = 4          # votes, vote_counts, count_freq
+    __SHARED_NAMES = 8          # names, roles, only written while registering
+    __SHARED_ALL = 15
+
+    # role codes stored in the roles array
+    __ROLE_CODES = (Roles.TOWN, Roles.GHOST, Roles.FOOL)
+    __TOWN, __GHOST, __FOOL = range(3)
+
     # fsm
     class States(Enum):
         REGISTER_PLAYERS = 'Register Players'
@@ -56,10 +181,15 @@ class Ghost:
         WINNER_TOWN = 'Town won'
         INVALID = 'Invalid game'
 
+    __STATE_CODES = tuple(States)
+
+    # version written by to_bytes
+    BINARY_VERSION = 3
+
     # Error messages
     ERR_INVALID_GAME_STATE = 'Invalid game state! Expected %s but got %s'
     ERR_PLAYER_ALREADY_REGISTERED = 'Player %s is already registered' 
-    ERR_PLAYER_CAP_EXCEEDED = 'Player capacity of %d exceeded' % MAX_NUM_PLAYERS
+    ERR_PLAYER_CAP_EXCEEDED = 'Player capacity of %d exceeded'
     ERR_INSUFF_PLAYERS = 'Not enough players joined (min %d)' % MIN_NUM_PLAYERS
     ERR_WORD_NOT_ENGLISH = 'The word must be a valid English word'
     ERR_WORD_TOO_SHORT = 'The word cannot be too short (%d char min)' % MIN_WORD_LENGTH
@@ -67,307 +197,846 @@ class Ghost:
     ERR_TOWN_WORD_NOT_SET = 'Set the town word first'
     ERR_FOOL_WORD_DIFFERENT_LENGTH = 'The fool word and town word must have the same length'
     ERR_FOOL_WORD_DUPLICATE = 'The fool word cannot be exactly the same as the town word'
+    ERR_NO_WORD_LIST = 'The word validator cannot suggest words'
     ERR_ROLES_NOT_ALLOCATED = 'Still registering players. Roles have not been allocated'
     ERR_USER_NOT_IN_GAME = 'User @%s is currently not alive or not playing'
     ERR_PLAYER_NOT_IN_ORDER = 'It is currently user @%s\'s turn!'
     ERR_ALL_CLUES_ALREADY_GIVEN = 'All the clues are in! Proceed to vote'
     ERR_CLUE_ALREADY_GIVEN = 'User @%s has already given a clue this round'
     ERR_PLAYER_CANNOT_GUESS = 'It is not up to player @%s to guess'
-
-    def __init__(self):
+    ERR_BAD_GAME_BYTES = 'Not a serialized game of version %d' % BINARY_VERSION
+    ERR_BAD_MAX_PLAYERS = 'max_players must be between %d and %d' % \
+        (MIN_NUM_PLAYERS, PLAYER_LIMIT)
+
+    def __init__(self, validator: WordValidator = None, early_lynch: bool = False,
+                 bus: events.EventBus = None, gid: int = None,
+                 max_players: int = MAX_NUM_PLAYERS, seed: Union[int, str] = None):
+        ''' With early_lynch, a vote round resolves as soon as its outcome
+        can no longer change, instead of waiting for every living player.
+        Events from ghost.events are published to bus, tagged with gid.
+        Large games raise max_players up to PLAYER_LIMIT, see get_role_set.
+        With seed, the player order and roles are shuffled by a generator
+        seeded with it, so they can be replayed. Otherwise the random
+        module's global generator shuffles them. '''
+        if not Ghost.MIN_NUM_PLAYERS <= max_players <= Ghost.PLAYER_LIMIT:
+            raise ValueError(Ghost.ERR_BAD_MAX_PLAYERS)
+
+        self.__validator = validator if validator is not None else Ghost.VALIDATOR
+        self.__early_lynch = early_lynch
+        self.__max_players = max_players
+        self.__seed = seed
+        self.__bus = bus
+        self.__gid = gid
         self.__game_state = Ghost.States.REGISTER_PLAYERS
         self.__town_word = None
         self.__fool_word = None
 
-        self.__player_info = dict()  # username --> player
-        self.__unvoted_players = set()
-        self.__player_order = list()
+        self.__ids = dict()          # username --> id, living players only
+        self.__names = list()        # id --> interned username
+        self.__roles = bytearray()   # id --> role code
+        self.__clues = list()        # id --> clue, None if not given
+        self.__clue_ranks = array('H')  # id --> order the clue was given in
+        self.__num_clues = 0         # clues given this round
+        self.__votes = array('i')    # id --> vote target id
+        self.__num_pending = 0       # players yet to give a clue or vote
+        self.__vote_counts = dict()  # vote target id --> number of votes
+        self.__count_freq = dict()   # number of votes --> targets with as many
+        self.__first_count = 0       # most votes of any target
+        self.__runner_count = 0      # most votes below first, see __count_vote
+        self.__role_counts = [0, 0, 0]  # role code --> living players
+        self.__player_order = array('H')  # ids of living players
         self.__player_order_index = -1
 
         self.__last_lynched = Ghost.__EMPTY_VOTE
 
+        self.__version = 0          # bumped by every successful command
+        self.__view = None          # GameView of the latest version built
+        self.__all_clues = None     # version and FrozenDict of its clues
+        self.__roster = None        # view parts kept until players change
+        self.__shared = 0           # __SHARED_ bits of containers shared by a fork
+
     def __is_game_state(self, expected_state: States) -> bool:
         return self.__game_state == expected_state
 
+    def __set_game_state(self, new_state: States) -> None:
+        old_state = self.__game_state
+        self.__game_state = new_state
+        if self.__bus:
+            self.__bus.publish(events.StateChanged(self.__gid, old_state, new_state))
+            if self.is_game_over():
+                self.__bus.publish(events.Winner(self.__gid, new_state))
+
+    def __reject(self, command: str, reason: str, *args) -> None:
+        logging.warning(reason, *args)
+        if self.__bus:
+            self.__bus.publish(events.Rejected(self.__gid, command, reason, args))
+
     ''' PHASE: REGISTER PLAYERS '''
 
     def register_player(self, username: str) -> (bool, int):
         res = False
         if not self.__is_game_state(Ghost.States.REGISTER_PLAYERS):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE % 
-                            (Ghost.States.REGISTER_PLAYERS, self.__game_state))
+            self.__reject('register_player', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.REGISTER_PLAYERS, self.__game_state)
         elif self.__is_user_alive(username):
-            logging.warning(Ghost.ERR_PLAYER_ALREADY_REGISTERED % username)
-        elif len(self.__player_info) >= Ghost.MAX_NUM_PLAYERS:
-            logging.warning(Ghost.ERR_PLAYER_CAP_EXCEEDED)
+            self.__reject('register_player', Ghost.ERR_PLAYER_ALREADY_REGISTERED, username)
+        elif len(self.__ids) >= self.__max_players:
+            self.__reject('register_player', Ghost.ERR_PLAYER_CAP_EXCEEDED,
+                          self.__max_players)
         else:
             res = True
-            self.__player_info[username] = Player()
-            logging.info('Success: Registered player @%s' % username)
-
-        return res, len(self.__player_info)
+            if self.__shared:
+                self.__unshare(Ghost.__SHARED_ALL)
+            username = sys.intern(username)
+            self.__ids[username] = len(self.__names)
+            self.__names.append(username)
+            self.__roles.append(Ghost.__TOWN)
+            self.__clues.append(None)
+            self.__clue_ranks.append(Ghost.__NOT_GIVEN)
+            self.__votes.append(Ghost.__NO_VOTE_ID)
+            self.__version += 1
+            self.__roster = None
+            logging.info('Success: Registered player @%s', username)
+            if self.__bus:
+                self.__bus.publish(events.PlayerRegistered(self.__gid, username))
+
+        return res, len(self.__ids)
 
     def unregister_player(self, username: str) -> bool:
         if not self.__is_game_state(Ghost.States.REGISTER_PLAYERS):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE % 
-                            (Ghost.States.REGISTER_PLAYERS, self.__game_state))
+            self.__reject('unregister_player', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.REGISTER_PLAYERS, self.__game_state)
             return False
         elif not self.__is_user_alive(username):
-            logging.warning(Ghost.ERR_USER_NOT_IN_GAME % username)
+            self.__reject('unregister_player', Ghost.ERR_USER_NOT_IN_GAME, username)
             return False
         else:
-            del self.__player_info[username]
+            # ids are only renumbered while registering
+            if self.__shared:
+                self.__unshare(Ghost.__SHARED_ALL)
+            pid = self.__ids.pop(username)
+            del self.__names[pid]
+            del self.__roles[pid]
+            del self.__clues[pid]
+            del self.__clue_ranks[pid]
+            del self.__votes[pid]
+            for name in self.__names[pid:]:
+                self.__ids[name] -= 1
+            self.__version += 1
+            self.__roster = None
+            if self.__bus:
+                self.__bus.publish(events.PlayerUnregistered(self.__gid, username))
             return True
 
     def start_game(self) -> bool:
         if not self.__is_game_state(Ghost.States.REGISTER_PLAYERS):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE % 
-                            (Ghost.States.REGISTER_PLAYERS, self.__game_state))
+            self.__reject('start_game', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.REGISTER_PLAYERS, self.__game_state)
             return False
 
-        if len(self.__player_info) < Ghost.MIN_NUM_PLAYERS:
-            logging.warning(Ghost.ERR_INSUFF_PLAYERS)
+        if len(self.__ids) < Ghost.MIN_NUM_PLAYERS:
+            self.__reject('start_game', Ghost.ERR_INSUFF_PLAYERS)
             return False
 
         # set player order
-        self.__player_order = list(self.__player_info)
-        random.shuffle(self.__player_order)
-
-        self.__allocate_roles()
-        self.__game_state = Ghost.States.SET_PARAMS
+        rng = random if self.__seed is None else random.Random(self.__seed)
+        self.__player_order = array('H', range(len(self.__names)))
+        rng.shuffle(self.__player_order)
+
+        self.__allocate_roles(rng)
+        if self.__bus:
+            self.__bus.publish(events.RolesAllocated(
+                self.__gid, self.__get_roles(), self.get_player_order()))
+
+        self.__set_game_state(Ghost.States.SET_PARAMS)
+        self.__version += 1
+        self.__roster = None
         logging.info('Success: Started game')
         return True
 
-    def __allocate_roles(self) -> None:
+    def __allocate_roles(self, rng: random.Random) -> None:
         # get the roles in this game
-        n_town, n_ghost, n_fool = Ghost.__ROLE_SETS[len(self.__player_info)]
-        roles = [Ghost.Roles.TOWN] * n_town + \
-            [Ghost.Roles.GHOST] * n_ghost + \
-            [Ghost.Roles.FOOL] * n_fool
-
-        random.shuffle(roles)
-        role_index = 0
+        n_town, n_ghost, n_fool = Ghost.__role_set(len(self.__names))
+        roles = bytearray([Ghost.__TOWN] * n_town +
+                          [Ghost.__GHOST] * n_ghost +
+                          [Ghost.__FOOL] * n_fool)
+        self.__role_counts = [n_town, n_ghost, n_fool]
 
         # assign roles to players
-        for username in self.__player_info:
-            self.__player_info[username].role = roles[role_index]
-            role_index += 1
+        rng.shuffle(roles)
+        self.__roles = roles
 
     ''' PHASE: SET PARAMS '''
 
     def set_param_town_word(self, value: str) -> bool:
         if not self.__is_game_state(Ghost.States.SET_PARAMS):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE % 
-                            (Ghost.States.SET_PARAMS, self.__game_state))
+            self.__reject('set_param_town_word', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.SET_PARAMS, self.__game_state)
             return False
         elif len(value) < Ghost.MIN_WORD_LENGTH:
-            logging.warning(Ghost.ERR_WORD_TOO_SHORT)
+            self.__reject('set_param_town_word', Ghost.ERR_WORD_TOO_SHORT)
             return False
         elif len(value) > Ghost.MAX_WORD_LENGTH:
-            logging.warning(Ghost.ERR_WORD_TOO_LONG)
+            self.__reject('set_param_town_word', Ghost.ERR_WORD_TOO_LONG)
             return False
-        elif not Ghost.DICTIONARY.check(value):
-            logging.warning(Ghost.ERR_WORD_NOT_ENGLISH)
+        elif not self.__validator.check(value):
+            self.__reject('set_param_town_word', Ghost.ERR_WORD_NOT_ENGLISH)
             return False
 
         self.__town_word = value.lower()
-        logging.info('Success: Set the town word: %s' % self.__town_word)
+        self.__version += 1
+        logging.info('Success: Set the town word: %s', self.__town_word)
         return True
 
     def set_param_fool_word(self, value: str) -> bool:
         if not self.__is_game_state(Ghost.States.SET_PARAMS):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE % 
-                            (Ghost.States.SET_PARAMS, self.__game_state))
+            self.__reject('set_param_fool_word', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.SET_PARAMS, self.__game_state)
             return False
         elif self.__town_word is None:
-            logging.warning(Ghost.ERR_TOWN_WORD_NOT_SET)
+            self.__reject('set_param_fool_word', Ghost.ERR_TOWN_WORD_NOT_SET)
             return False
         elif len(value) != len(self.__town_word):
-            logging.warning(Ghost.ERR_FOOL_WORD_DIFFERENT_LENGTH)
+            self.__reject('set_param_fool_word',
+                          Ghost.ERR_FOOL_WORD_DIFFERENT_LENGTH)
             return False
         elif value == self.__town_word:
-            logging.warning(Ghost.ERR_FOOL_WORD_DUPLICATE)
+            self.__reject('set_param_fool_word', Ghost.ERR_FOOL_WORD_DUPLICATE)
             return False
-        elif not Ghost.DICTIONARY.check(value):
-            logging.warning(Ghost.ERR_WORD_NOT_ENGLISH)
+        elif not self.__validator.check(value):
+            self.__reject('set_param_fool_word', Ghost.ERR_WORD_NOT_ENGLISH)
             return False
 
         self.__fool_word = value.lower()
-        logging.info('Success: Set the fool word: %s' % self.__fool_word)
+        self.__version += 1
+        logging.info('Success: Set the fool word: %s', self.__fool_word)
 
         self.__start_clue_phase()
         return True
 
+    def suggest_fool_words(self, k: int) -> List[str]:
+        if not self.__is_game_state(Ghost.States.SET_PARAMS):
+            logging.warning(Ghost.ERR_INVALID_GAME_STATE,
+                            Ghost.States.SET_PARAMS, self.__game_state)
+            return list()
+        elif self.__town_word is None:
+            logging.warning(Ghost.ERR_TOWN_WORD_NOT_SET)
+            return list()
+
+        elif not self.__validator.can_list_words:
+            logging.warning(Ghost.ERR_NO_WORD_LIST)
+            return list()
+
+        index = FoolWordIndex.for_validator(self.__validator)
+        return index.suggest(self.__town_word, k)
+
     ''' HELPER METHODS '''
 
     def get_game_state(self) -> States:
         return self.__game_state
 
-    def get_existing_players(self) -> List[str]:
-        return list(self.__player_info)
-
-    def get_player_order(self) -> List[str]:
-        return self.__player_order
-
-    def get_player_roles(self) -> dict:
+    @staticmethod
+    def get_role_set(num_players: int) -> Dict[Roles, int]:
+        ''' Returns how many players get each role in a game of num_players.
+        Games beyond the role set table keep the ghost and fool shares of
+        its largest game, rounded down, and the rest are town. '''
+        return dict(zip(Ghost.__ROLE_CODES, Ghost.__role_set(num_players)))
+
+    @staticmethod
+    def __role_set(num_players: int) -> Tuple[int, int, int]:
+        role_set = Ghost.__ROLE_SETS.get(num_players)
+        if role_set is not None:
+            return role_set
+
+        _, n_ghost, n_fool = Ghost.__ROLE_SETS[Ghost.MAX_NUM_PLAYERS]
+        n_ghost = num_players * n_ghost // Ghost.MAX_NUM_PLAYERS
+        n_fool = num_players * n_fool // Ghost.MAX_NUM_PLAYERS
+        return num_players - n_ghost - n_fool, n_ghost, n_fool
+
+    def get_version(self) -> int:
+        ''' Returns a number that grows with every successful command '''
+        return self.__version
+
+    def get_view(self) -> GameView:
+        ''' Returns an immutable view of the game. It is built once per
+        version and shared by every caller until the game changes. '''
+        view = self.__view
+        if view is None or view.version != self.__version:
+            view = self.__view = self.__build_view()
+
+        return view
+
+    def __build_view(self) -> GameView:
+        ''' Costs O(1) unless players joined, left or died since the last
+        view, so polling large games stays cheap '''
+        next_player = ''
+        if self.__is_game_state(Ghost.States.CLUE_ROUND) and self.__num_pending:
+            next_player = self.__names[self.__player_order[self.__player_order_index]]
+
+        roster = self.__roster
+        if roster is None:
+            roster = self.__roster = self.__build_roster()
+        players, order, roles, ids = roster
+
+        return GameView(
+            self.__version, self.__game_state, players, order, roles,
+            _ClueMap(ids, self.__clues, self.__clue_ranks, self.__num_clues),
+            next_player, self.__last_lynched)
+
+    def __build_roster(self) -> tuple:
+        is_allocated = self.__game_state != Ghost.States.REGISTER_PLAYERS
+        return (tuple(self.__ids),
+                tuple(self.__names[pid] for pid in self.__player_order),
+                FrozenDict(self.__get_roles() if is_allocated else ()),
+                FrozenDict(self.__ids))
+
+    def get_existing_players(self) -> Tuple[str, ...]:
+        return self.get_view().players
+
+    def get_player_order(self) -> Tuple[str, ...]:
+        return self.get_view().order
+
+    def get_player(self, username: str) -> Player:
+        ''' Returns a snapshot of a living player, None otherwise '''
+        pid = self.__ids.get(username)
+        if pid is None:
+            return None
+
+        return Player(Ghost.__ROLE_CODES[self.__roles[pid]],
+                      self.__clues[pid], self.__vote_name(self.__votes[pid]))
+
+    def get_player_roles(self) -> Mapping[str, Roles]:
         if self.__game_state == Ghost.States.REGISTER_PLAYERS:
             logging.warning(Ghost.ERR_ROLES_NOT_ALLOCATED)
-            return dict()
 
+        return self.get_view().roles
+
+    def __get_roles(self) -> dict:
         result = dict()
 
-        for username, player in self.__player_info.items():
-            result[username] = player.role
+        for username, pid in self.__ids.items():
+            result[username] = Ghost.__ROLE_CODES[self.__roles[pid]]
 
         return result
 
+    def get_role_census(self) -> Dict[Roles, int]:
+        if self.__game_state == Ghost.States.REGISTER_PLAYERS:
+            logging.warning(Ghost.ERR_ROLES_NOT_ALLOCATED)
+            return dict()
+
+        return dict(zip(Ghost.__ROLE_CODES, self.__role_counts))
+
     def get_words(self) -> (str, str):
         return self.__town_word, self.__fool_word
 
+    def get_memory_footprint(self) -> int:
+        ''' Returns the approximate number of bytes held by this game alone.
+        Objects shared between games, such as the validator, are excluded. '''
+        size = sys.getsizeof(self)
+        for container in (self.__ids, self.__names, self.__roles, self.__clues,
+                          self.__clue_ranks, self.__votes, self.__vote_counts,
+                          self.__role_counts, self.__player_order):
+            size += sys.getsizeof(container)
+        if self.__view is not None:
+            # the cached view shares its strings with the game
+            size += sum(map(sys.getsizeof, self.__view)) - \
+                sys.getsizeof(self.__view.state)
+        if self.__roster is not None:
+            size += sys.getsizeof(self.__roster) + sys.getsizeof(self.__roster[3])
+        if self.__all_clues is not None:
+            size += sys.getsizeof(self.__all_clues)
+        for text in self.__names + self.__clues + \
+                [self.__town_word, self.__fool_word]:
+            if text is not None:
+                size += sys.getsizeof(text)
+
+        return size
+
+    def __vote_name(self, vote_id: int) -> str:
+        if vote_id == Ghost.__NO_VOTE_ID:
+            return None
+        elif vote_id == Ghost.__EMPTY_VOTE_ID:
+            return Ghost.__EMPTY_VOTE
+
+        return self.__names[vote_id]
+
     def __is_ghost(self, username: str) -> bool:
-        return self.__player_info[username].role == Ghost.Roles.GHOST
+        return self.__roles[self.__ids[username]] == Ghost.__GHOST
 
     def __is_user_alive(self, username: str) -> bool:
-        return username in self.__player_info
+        return username in self.__ids
+
+    def is_player_alive(self, username: str) -> bool:
+        return self.__is_user_alive(username)
+
+    def is_game_over(self) -> bool:
+        return self.__game_state in (Ghost.States.WINNER_GHOST,
+                                     Ghost.States.WINNER_TOWN)
+
+    ''' FORKS '''
+
+    def fork(self) -> 'Ghost':
+        ''' Returns a copy of the game for bots to try commands on, such as
+        every vote they could cast. It takes O(1): both games share their
+        player table, and each copies the parts it writes to first.
+        A fork publishes no events, and the game is left as it was. '''
+        game = Ghost.__new__(Ghost)
+        for field in Ghost.__FIELDS:
+            setattr(game, field, getattr(self, field))
+        game.__bus = None
+        self.__shared = game.__shared = Ghost.__SHARED_ALL
+        return game
+
+    def __unshare(self, parts: int) -> None:
+        ''' Copies the shared containers in parts before they are written '''
+        parts &= self.__shared
+        if parts & Ghost.__SHARED_LIVING:
+            self.__ids = self.__ids.copy()
+            self.__role_counts = self.__role_counts.copy()
+            self.__player_order = self.__player_order[:]
+        if parts & Ghost.__SHARED_CLUES:
+            self.__clues = self.__clues.copy()
+            self.__clue_ranks = self.__clue_ranks[:]
+        if parts & Ghost.__SHARED_VOTES:
+            self.__votes = self.__votes[:]
+            self.__vote_counts = self.__vote_counts.copy()
+            self.__count_freq = self.__count_freq.copy()
+        if parts & Ghost.__SHARED_NAMES:
+            self.__names = self.__names.copy()
+            self.__roles = self.__roles[:]
+        self.__shared &= ~parts
+
+    ''' SNAPSHOTS '''
+
+    def to_dict(self) -> dict:
+        ''' Returns the state of the game as a dict of JSON types '''
+        return {
+            'state': self.__game_state.name,
+            'town_word': self.__town_word,
+            'fool_word': self.__fool_word,
+            'names': list(self.__names),
+            'alive': sorted(self.__ids.values()),
+            'roles': list(self.__roles),
+            'clues': list(self.__clues),
+            'votes': list(self.__votes),
+            'num_pending': self.__num_pending,
+            'order': list(self.__player_order),
+            'order_index': self.__player_order_index,
+            'last_lynched': self.__last_lynched,
+            'version': self.__version
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, validator: WordValidator = None,
+                  early_lynch: bool = False, bus: events.EventBus = None,
+                  gid: int = None, max_players: int = MAX_NUM_PLAYERS,
+                  seed: Union[int, str] = None) -> 'Ghost':
+        ''' Rebuilds a game from to_dict(). No events are published. '''
+        game = cls(validator, early_lynch, bus, gid, max_players, seed)
+        game.__game_state = Ghost.States[data['state']]
+        game.__town_word = data['town_word']
+        game.__fool_word = data['fool_word']
+
+        game.__names = [sys.intern(name) for name in data['names']]
+        game.__ids = {game.__names[pid]: pid for pid in data['alive']}
+        game.__roles = bytearray(data['roles'])
+        game.__clues = list(data['clues'])
+        game.__rank_clues()
+        game.__votes = array('i', data['votes'])
+        game.__num_pending = data['num_pending']
+        game.__player_order = array('H', data['order'])
+        game.__player_order_index = data['order_index']
+        game.__last_lynched = data['last_lynched']
+        game.__version = data.get('version', 0)
+        game.__rebuild_counts()
+        return game
+
+    def to_bytes(self) -> bytes:
+        ''' Returns the state of the game in a compact versioned encoding.
+        Integers are little-endian and texts are UTF-8. '''
+        n = len(self.__names)
+        alive = bytearray(n)
+        for pid in self.__ids.values():
+            alive[pid] = 1
+        last_lynched = self.__names.index(self.__last_lynched) \
+            if self.__last_lynched else -1
+
+        texts = [self.__town_word, self.__fool_word] + self.__names + self.__clues
+        encoded = [None if t is None else t.encode() for t in texts]
+        lengths = array('I', [_NO_TEXT if e is None else len(e) for e in encoded])
+        votes = array('i', self.__votes)
+        order = array('H', self.__player_order)
+        if sys.byteorder == 'big':
+            for values in (lengths, votes, order):
+                values.byteswap()
+
+        header = _GAME_HEADER.pack(
+            Ghost.BINARY_VERSION, Ghost.__STATE_CODES.index(self.__game_state),
+            n, len(order), self.__player_order_index, self.__num_pending,
+            last_lynched, self.__version)
+        return b''.join((header, alive, self.__roles, votes.tobytes(),
+                         order.tobytes(), lengths.tobytes(),
+                         *[e for e in encoded if e is not None]))
+
+    @classmethod
+    def from_bytes(cls, data: bytes, validator: WordValidator = None,
+                   early_lynch: bool = False, bus: events.EventBus = None,
+                   gid: int = None, max_players: int = MAX_NUM_PLAYERS,
+                   seed: Union[int, str] = None) -> 'Ghost':
+        ''' Rebuilds a game from to_bytes(). No events are published.
+        Every earlier version is still read, games of version 1 with a
+        game version of 0. Raises ValueError for anything else. '''
+        data = memoryview(data)
+        header = _GAME_HEADERS.get(data[0]) if len(data) else None
+        if header is None or len(data) < header.size:
+            raise ValueError(Ghost.ERR_BAD_GAME_BYTES)
+
+        _, state, n, num_order, order_index, num_pending, last_lynched, \
+            *game_version = header.unpack_from(data)
+        game_version = game_version[0] if game_version else 0
+        if state >= len(Ghost.__STATE_CODES) or not -1 <= last_lynched < n:
+            raise ValueError(Ghost.ERR_BAD_GAME_BYTES)
+        roles_at = header.size + n
+        votes_at = roles_at + n
+        order_at = votes_at + 4 * n
+        lengths_at = order_at + 2 * num_order
+        texts_at = lengths_at + 4 * (2 + 2 * n)
+        if len(data) < texts_at:
+            raise ValueError(Ghost.ERR_BAD_GAME_BYTES)
+
+        alive = data[header.size:roles_at]
+        roles = bytearray(data[roles_at:votes_at])
+        votes = array('i')
+        votes.frombytes(data[votes_at:order_at])
+        order = array('H')
+        order.frombytes(data[order_at:lengths_at])
+        lengths = array('I')
+        lengths.frombytes(data[lengths_at:texts_at])
+        if sys.byteorder == 'big':
+            for values in (lengths, votes, order):
+                values.byteswap()
+        # ids index the player arrays, so corrupt ones must not get through
+        if any(pid >= n for pid in order) or \
+                any(not Ghost.__EMPTY_VOTE_ID <= target < n for target in votes) or \
+                any(role >= len(Ghost.__ROLE_CODES) for role in roles) or \
+                not 0 <= order_index < max(num_order, 1):
+            raise ValueError(Ghost.ERR_BAD_GAME_BYTES)
+
+        blob = bytes(data[texts_at:])
+        if sum(length for length in lengths if length != _NO_TEXT) != len(blob):
+            raise ValueError(Ghost.ERR_BAD_GAME_BYTES)
+        text = blob.decode()
+        if len(text) != len(blob):
+            # byte offsets only match character offsets for ASCII
+            text = blob
+
+        texts = list()
+        offset = 0
+        for length in lengths:
+            if length == _NO_TEXT:
+                texts.append(None)
+            else:
+                texts.append(text[offset:offset + length])
+                offset += length
+        if text is blob:
+            texts = [t if t is None else t.decode() for t in texts]
+
+        game = cls(validator, early_lynch, bus, gid, max_players, seed)
+        game.__game_state = Ghost.__STATE_CODES[state]
+        game.__town_word, game.__fool_word = texts[0], texts[1]
+        game.__names = [sys.intern(name) for name in texts[2:2 + n]]
+        game.__ids = {game.__names[pid]: pid for pid in range(n) if alive[pid]}
+        game.__roles = roles
+        game.__clues = texts[2 + n:]
+        game.__rank_clues()
+        game.__votes = votes
+        game.__num_pending = num_pending
+        game.__player_order = order
+        game.__player_order_index = order_index
+        game.__last_lynched = game.__names[last_lynched] \
+            if last_lynched >= 0 else Ghost.__EMPTY_VOTE
+        game.__version = game_version
+        game.__rebuild_counts()
+        return game
+
+    def __rank_clues(self) -> None:
+        ''' Ranks restored clues in id order, which views cannot tell apart
+        from the order they were given in '''
+        self.__clue_ranks = array('H', [Ghost.__NOT_GIVEN]) * len(self.__clues)
+        self.__num_clues = 0
+        for pid, clue in enumerate(self.__clues):
+            if clue is not None:
+                self.__clue_ranks[pid] = self.__num_clues
+                self.__num_clues += 1
+
+    def __rebuild_counts(self) -> None:
+        ''' Recomputes the counters kept alongside the player arrays '''
+        self.__vote_counts = dict()
+        self.__role_counts = [0, 0, 0]
+        if self.__game_state == Ghost.States.REGISTER_PLAYERS:
+            # roles are only meaningful once allocated
+            return
 
+        for pid in self.__ids.values():
+            self.__role_counts[self.__roles[pid]] += 1
+            target = self.__votes[pid]
+            if target != Ghost.__NO_VOTE_ID:
+                self.__vote_counts[target] = self.__vote_counts.get(target, 0) + 1
+
+        counts = [c for c in self.__vote_counts.values() if c]
+        self.__count_freq = dict()
+        for count in counts:
+            self.__count_freq[count] = self.__count_freq.get(count, 0) + 1
+        self.__first_count = max(counts, default=0)
+        self.__runner_count = max((c for c in counts if c < self.__first_count),
+                                  default=0)
 
     ''' PHASE: CLUES '''
 
     def __start_clue_phase(self) -> None:
-        self.__game_state = Ghost.States.CLUE_ROUND
-        for p in self.__player_info.values():
-            p.clue = None
-        self.__unvoted_players = set(self.__player_info)
+        self.__set_game_state(Ghost.States.CLUE_ROUND)
+        # new arrays, as views of the last round share the old ones
+        self.__clues = [None] * len(self.__names)
+        self.__clue_ranks = array('H', [Ghost.__NOT_GIVEN]) * len(self.__names)
+        self.__shared &= ~Ghost.__SHARED_CLUES
+        self.__num_clues = 0
+        self.__num_pending = len(self.__ids)
         self.__player_order_index = 0
 
     def get_next_in_player_order(self) -> str:
-        if len(self.__unvoted_players) == 0:
+        if not self.__is_game_state(Ghost.States.CLUE_ROUND) or \
+                self.__num_pending == 0:
             logging.warning(Ghost.ERR_ALL_CLUES_ALREADY_GIVEN)
             return ''
 
-        return self.__player_order[self.__player_order_index]
+        return self.__names[self.__player_order[self.__player_order_index]]
 
     def __increase_player_order_index(self) -> None:
         self.__player_order_index += 1
-        self.__player_order_index %= len(self.__player_info)
+        self.__player_order_index %= len(self.__player_order)
 
     def set_clue(self, username: str, clue: str) -> (bool, bool):
         default_return = False, False
         if not self.__is_game_state(Ghost.States.CLUE_ROUND):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE % 
-                            (Ghost.States.CLUE_ROUND, self.__game_state))
+            self.__reject('set_clue', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.CLUE_ROUND, self.__game_state)
             return default_return
         elif not self.__is_user_alive(username):
-            logging.warning(Ghost.ERR_USER_NOT_IN_GAME % username)
+            self.__reject('set_clue', Ghost.ERR_USER_NOT_IN_GAME, username)
             return default_return 
-        elif self.__player_info[username].clue is not None:
-            logging.warning(Ghost.ERR_CLUE_ALREADY_GIVEN % username)
+        elif self.__clues[self.__ids[username]] is not None:
+            self.__reject('set_clue', Ghost.ERR_CLUE_ALREADY_GIVEN, username)
             return default_return 
 
         expected_user = self.get_next_in_player_order()
         if username != expected_user:
-            logging.warning(Ghost.ERR_PLAYER_NOT_IN_ORDER % expected_user)
+            self.__reject('set_clue', Ghost.ERR_PLAYER_NOT_IN_ORDER, expected_user)
             return default_return
 
-        self.__player_info[username].clue = clue
-        self.__unvoted_players.remove(username)
+        if self.__shared & Ghost.__SHARED_CLUES:
+            self.__unshare(Ghost.__SHARED_CLUES)
+        pid = self.__ids[username]
+        self.__clues[pid] = clue
+        self.__clue_ranks[pid] = self.__num_clues
+        self.__num_clues += 1
+        self.__num_pending -= 1
+        self.__version += 1
         self.__increase_player_order_index()
+        if self.__bus:
+            self.__bus.publish(events.ClueSet(self.__gid, username, clue))
 
         # check if all players have given clues
-        is_complete = len(self.__unvoted_players) == 0
+        is_complete = self.__num_pending == 0
         if is_complete:
             self.__start_vote_phase()
 
         return True, is_complete
 
-    def get_all_clues(self) -> dict:
-        result = dict()
-
-        for username, player in self.__player_info.items():
-            result[username] = player.clue
+    def get_all_clues(self) -> Mapping[str, str]:
+        ''' Returns the clues of the view as a FrozenDict, so callers can
+        serialize them like any dict. Built once per version. '''
+        view = self.get_view()
+        clues = self.__all_clues
+        if clues is None or clues[0] != view.version:
+            clues = self.__all_clues = (view.version, FrozenDict(view.clues))
 
-        return result
+        return clues[1]
 
     ''' PHASE: VOTE '''
 
     def __start_vote_phase(self) -> None:
-        self.__game_state = Ghost.States.VOTE_ROUND
-        for p in self.__player_info.values():
-            p.vote = None
-        self.__unvoted_players = set(self.__player_info)
+        self.__set_game_state(Ghost.States.VOTE_ROUND)
+        self.__votes = array('i', [Ghost.__NO_VOTE_ID]) * len(self.__names)
+        self.__vote_counts = dict()
+        self.__count_freq = dict()
+        self.__shared &= ~Ghost.__SHARED_VOTES
+        self.__first_count = self.__runner_count = 0
+        self.__num_pending = len(self.__ids)
 
     def set_vote(self, username: str, vote: str) -> (bool, bool, str):
         default_return = False, False, ''
         if not self.__is_game_state(Ghost.States.VOTE_ROUND):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE % i
-                            (Ghost.States.VOTE_ROUND, self.__game_state))
+            self.__reject('set_vote', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.VOTE_ROUND, self.__game_state)
             return default_return 
         elif not self.__is_user_alive(username):
-            logging.warning(Ghost.ERR_USER_NOT_IN_GAME % username)
+            self.__reject('set_vote', Ghost.ERR_USER_NOT_IN_GAME, username)
             return default_return 
         elif vote != Ghost.__EMPTY_VOTE and not self.__is_user_alive(vote):
-            logging.warning(Ghost.ERR_USER_NOT_IN_GAME % vote)
+            self.__reject('set_vote', Ghost.ERR_USER_NOT_IN_GAME, vote)
             return default_return 
 
-        self.__player_info[username].vote = vote
-        self.__unvoted_players.discard(username)
+        if self.__shared & Ghost.__SHARED_VOTES:
+            self.__unshare(Ghost.__SHARED_VOTES)
+        pid = self.__ids[username]
+        target = Ghost.__EMPTY_VOTE_ID if vote == Ghost.__EMPTY_VOTE \
+            else self.__ids[vote]
+        previous = self.__votes[pid]
+        if previous == Ghost.__NO_VOTE_ID:
+            self.__num_pending -= 1
+        else:
+            # changing a vote takes it away from the previous target
+            self.__uncount_vote(previous)
+
+        self.__votes[pid] = target
+        self.__count_vote(target)
+        self.__version += 1
+        if self.__bus:
+            self.__bus.publish(events.VoteCast(self.__gid, username, vote))
+
+        is_complete = self.__num_pending == 0 or \
+            (self.__early_lynch and self.__is_vote_decided())
+        if not is_complete:
+            return True, False, ''
+
+        self.__process_vote()
+        return True, True, self.__last_lynched
+
+    def __count_vote(self, target: int) -> None:
+        ''' Adds a vote for target in O(1).
+        Vote counts only move by one, which keeps the top count and the
+        runner-up below it known without scanning: __runner_count is the
+        highest count below __first_count whenever a single target has
+        __first_count votes, and is unused otherwise. '''
+        count = self.__vote_counts.get(target, 0)
+        self.__vote_counts[target] = count + 1
+        freq = self.__count_freq
+        if count:
+            freq[count] -= 1
+        freq[count + 1] = freq.get(count + 1, 0) + 1
+
+        if count >= self.__first_count:
+            self.__first_count = count + 1
+            if freq.get(count):
+                # the other leaders fall to runner-up
+                self.__runner_count = count
+        elif self.__runner_count < count + 1 < self.__first_count:
+            self.__runner_count = count + 1
+
+    def __uncount_vote(self, target: int) -> None:
+        ''' Takes back a vote for target in O(1), see __count_vote '''
+        count = self.__vote_counts[target]
+        self.__vote_counts[target] = count - 1
+        freq = self.__count_freq
+        freq[count] -= 1
+        if count > 1:
+            freq[count - 1] = freq.get(count - 1, 0) + 1
+
+        if count == self.__first_count:
+            if freq[count]:
+                self.__runner_count = count - 1
+            else:
+                self.__first_count = count - 1
+        elif count == self.__runner_count and not freq[count]:
+            self.__runner_count = count - 1
+
+    def __is_vote_decided(self) -> bool:
+        ''' Returns True if the remaining votes cannot change the outcome,
+        counting every vote already cast as final '''
+        no_lynch_votes = len(self.__ids) // 2
+        empty = self.__vote_counts.get(Ghost.__EMPTY_VOTE_ID, 0)
+        if empty >= no_lynch_votes:
+            return True
 
-        is_complete = len(self.__unvoted_players) == 0
-        if is_complete:
-            self.__process_vote()
+        first = self.__first_count
+        is_tied = self.__count_freq.get(first, 0) > 1
+        second = first if is_tied else self.__runner_count
 
-        return True, is_complete, self.__last_lynched
+        # no one can be lynched if the best placed player would still not
+        # lead alone with every remaining vote. When the abstentions lead
+        # alone, that player is the runner-up.
+        if empty == first and not is_tied:
+            best, rival = second, first
+        else:
+            best, rival = first, second
+        if best + self.__num_pending <= rival:
+            return True
+        elif empty + self.__num_pending >= no_lynch_votes:
+            # the remaining players could still call off the lynch
+            return False
 
-    def __tally_votes(self, players) -> set:
-        votes = defaultdict(lambda: 0)
-        for username in players:
-            v = self.__player_info[username].vote
-            votes[v] += 1
+        # the leader must stay ahead even if everyone left votes for the
+        # runner-up, who may be a player with no votes yet
+        return first > second + self.__num_pending
 
-        if votes[Ghost.__EMPTY_VOTE] >= len(players) // 2:
+    def __tally_votes(self) -> set:
+        if self.__vote_counts.get(Ghost.__EMPTY_VOTE_ID, 0) >= \
+                len(self.__ids) // 2:
             return set()
 
         max_votees = set()
         max_vote = 0
-        for username, count in votes.items():
+        for target, count in self.__vote_counts.items():
             if count > max_vote:
                 max_votees = set()
-                max_votees.add(username)
+                max_votees.add(target)
                 max_vote = count
             elif count == max_vote:
-                max_votees.add(username)
+                max_votees.add(target)
 
         return max_votees
 
     def __process_vote(self) -> None:
-        tally = self.__tally_votes(self.__player_info)
-        if len(tally) != 1:
+        tally = self.__tally_votes()
+        if len(tally) != 1 or Ghost.__EMPTY_VOTE_ID in tally:
             # voted for no one
+            self.__last_lynched = Ghost.__EMPTY_VOTE
             self.__start_clue_phase()
             return
 
-        to_lynch = tally.pop()
-        logging.info('Lynching player @%s' % to_lynch)
+        to_lynch = self.__names[tally.pop()]
+        logging.info('Lynching player @%s', to_lynch)
         self.__last_lynched = to_lynch
+        if self.__bus:
+            self.__bus.publish(events.Lynched(
+                self.__gid, to_lynch, self.get_player(to_lynch).role))
 
         if self.__is_ghost(to_lynch):
-            self.__game_state = Ghost.States.GUESS_ROUND
+            self.__set_game_state(Ghost.States.GUESS_ROUND)
         else:
             self.__kill_player(to_lynch)
-            if self.__game_state != Ghost.States.WINNER_GHOST: 
+            if not self.is_game_over():
                 self.__start_vote_phase()
 
     def __kill_player(self, username: str) -> None:
-        del self.__player_info[username]
-
-        num_ghost_alive = len(list(filter(self.__is_ghost, self.__player_info)))
+        if self.__shared:
+            self.__unshare(Ghost.__SHARED_LIVING)
+        pid = self.__ids.pop(username)
+        self.__roster = None
+        self.__role_counts[self.__roles[pid]] -= 1
+        self.__player_order.remove(pid)
+        if self.__bus:
+            self.__bus.publish(events.PlayerKilled(
+                self.__gid, username, Ghost.__ROLE_CODES[self.__roles[pid]]))
+
+        num_ghost_alive = self.__role_counts[Ghost.__GHOST]
         if num_ghost_alive == 0:
             # killed all ghosts
-            self.__game_state = Ghost.States.WINNER_TOWN
+            self.__set_game_state(Ghost.States.WINNER_TOWN)
             logging.info('Congratulations to the Town!')
-        elif num_ghost_alive >= len(self.__player_info) // 2:
+        elif num_ghost_alive >= len(self.__ids) // 2:
             # ghosts got majority
-            self.__game_state = Ghost.States.WINNER_GHOST
+            self.__set_game_state(Ghost.States.WINNER_GHOST)
             logging.info('Congratulations to the Ghosts!')
 
     ''' PHASE: GUESS '''
@@ -375,22 +1044,28 @@ class Ghost:
     def make_guess(self, username: str, guess: str) -> (bool, bool):
         default_return = False, False
         if not self.__is_game_state(Ghost.States.GUESS_ROUND):
-            logging.warning(Ghost.ERR_INVALID_GAME_STATE %
-                            (Ghost.States.GUESS_ROUND, self.__game_state))
+            self.__reject('make_guess', Ghost.ERR_INVALID_GAME_STATE,
+                          Ghost.States.GUESS_ROUND, self.__game_state)
             return default_return
         elif username != self.__last_lynched:
-            logging.warning(Ghost.ERR_PLAYER_CANNOT_GUESS % username)
+            self.__reject('make_guess', Ghost.ERR_PLAYER_CANNOT_GUESS, username)
             # ignore irrelevant messages
             return default_return
 
-        logging.info('Player @%s has guessed: %s' % (username, guess.lower()))
-        if guess.lower() == self.__town_word:
-            self.__game_state = Ghost.States.WINNER_GHOST
+        logging.info('Player @%s has guessed: %s', username, guess.lower())
+        is_correct = guess.lower() == self.__town_word
+        self.__version += 1
+        if self.__bus:
+            self.__bus.publish(events.GuessMade(self.__gid, username, guess,
+                                                is_correct))
+
+        if is_correct:
+            self.__set_game_state(Ghost.States.WINNER_GHOST)
             logging.info('Congratulations to the Ghosts!')
             return True, True
         
         self.__kill_player(username)
-        if self.__game_state != Ghost.States.WINNER_TOWN:
+        if not self.is_game_over():
             self.__start_vote_phase()
         
         return True, False
@@ -0,0 +1,210 @@
+from typing import Any, Callable, List, Tuple
+
+import json
+import logging
+import os
+import threading
+
+class Journal:
+    ''' Append-only log of the commands applied to a GhostEngine, with
+    periodic snapshots of every game, kept in one directory.
+
+    Appending only queues the record in memory. A background thread writes
+    and fsyncs the queue every flush_interval seconds, so a crash loses at
+    most the commands of the last interval, and commands never wait on
+    the disk. Call sync() to make everything appended so far durable.
+
+    The log is split into segments. A snapshot starts a new segment, and
+    the segments it covers are deleted once the snapshot is on disk.
+    With snapshot_every, the flush thread takes a snapshot by itself once
+    that many records were appended since the last one. '''
+
+    ERR_BAD_RECORD = 'Skipping unreadable journal record in %s'
+
+    SNAPSHOT_FILE = 'snapshot.json'
+    SEGMENT_PREFIX = 'log.'
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, directory: str, flush_interval: float = 0.05,
+                 snapshot_every: int = None):
+        self.__directory = directory
+        self.__flush_interval = flush_interval
+        self.__snapshot_every = snapshot_every
+
+        self.__lock = threading.Lock()          # guards seq and pending
+        self.__flush_lock = threading.Lock()    # guards the segment file
+        self.__snapshot_lock = threading.Lock()
+        self.__pending = list()
+        self.__snapshotter = None
+        self.__thread = None
+        self.__closed = threading.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        self.__snapshot, self.__records = self.__read()
+        self.__seq = max([self.__snapshot[0]] +
+                         [record[0] for record in self.__records])
+        self.__snapshot_seq = self.__seq
+
+        segments = self.__segments()
+        self.__segment = segments[-1] + 1 if segments else 0
+        self.__file = self.__open_segment(self.__segment)
+
+    @property
+    def seq(self) -> int:
+        ''' Sequence number of the last record appended '''
+        return self.__seq
+
+    ''' READING '''
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.__directory, name)
+
+    def __segments(self) -> List[int]:
+        prefix = Journal.SEGMENT_PREFIX
+        return sorted(int(name[len(prefix):])
+                      for name in os.listdir(self.__directory)
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def __segment_name(self, segment: int) -> str:
+        return self.__path('%s%08d' % (Journal.SEGMENT_PREFIX, segment))
+
+    def __read(self) -> (tuple, list):
+        snapshot = (0, list())
+        try:
+            with open(self.__path(Journal.SNAPSHOT_FILE)) as f:
+                data = json.load(f)
+            snapshot = (data['seq'], data['games'])
+        except FileNotFoundError:
+            pass
+
+        records = list()
+        for segment in self.__segments():
+            name = self.__segment_name(segment)
+            with open(name) as f:
+                for line in f:
+                    try:
+                        records.extend(json.loads(line))
+                    except ValueError:
+                        # a crash can leave the last line half written
+                        logging.warning(Journal.ERR_BAD_RECORD, name)
+
+        return snapshot, records
+
+    def recovered(self) -> (int, list, list):
+        ''' Returns what the journal held when it was opened: the sequence
+        number the snapshot covers, its (gid, host, seq, game) entries and
+        the [seq, gid, command, *args] records logged after it.
+        The data is handed over once, later calls return nothing. '''
+        (seq, games), records = self.__snapshot, self.__records
+        self.__snapshot, self.__records = (seq, list()), list()
+        return seq, games, records
+
+    ''' WRITING '''
+
+    def __open_segment(self, segment: int):
+        return open(self.__segment_name(segment), 'a')
+
+    def start(self, snapshotter: Callable[[], Any] = None) -> None:
+        ''' Starts the flush thread. snapshotter takes the snapshots
+        requested by snapshot_every, usually GhostEngine.snapshot. '''
+        self.__snapshotter = snapshotter
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, daemon=True,
+                                             name='ghost-journal')
+            self.__thread.start()
+
+    def append(self, gid: int, command: str, *args) -> int:
+        ''' Queues a record and returns its sequence number.
+        Records of one game must be appended under that game's lock. '''
+        with self.__lock:
+            self.__seq += 1
+            self.__pending.append((self.__seq, gid, command) + args)
+            return self.__seq
+
+    def __run(self) -> None:
+        while not self.__closed.wait(self.__flush_interval):
+            self.sync()
+            if self.__snapshotter is not None and \
+                    self.__snapshot_every is not None and \
+                    self.__seq - self.__snapshot_seq >= self.__snapshot_every:
+                try:
+                    self.__snapshotter()
+                except Exception:
+                    logging.exception('Journal snapshot failed')
+
+    def sync(self) -> None:
+        ''' Writes and fsyncs every record appended so far '''
+        with self.__flush_lock:
+            self.__write_pending()
+
+    def __write_pending(self) -> None:
+        with self.__lock:
+            pending, self.__pending = self.__pending, list()
+
+        if pending:
+            # one line per flush, so a torn write loses only an unsynced batch
+            self.__file.write(json.dumps(pending, separators=(',', ':')) + '\n')
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    ''' SNAPSHOTS '''
+
+    def begin_snapshot(self) -> int:
+        ''' Moves the log to a new segment and returns the sequence number
+        of the last record before it. The caller then snapshots every game
+        and passes the entries to end_snapshot. '''
+        self.__snapshot_lock.acquire()
+        with self.__flush_lock:
+            self.__write_pending()
+            self.__file.close()
+            with self.__lock:
+                seq = self.__seq
+                self.__segment += 1
+            self.__file = self.__open_segment(self.__segment)
+
+        return seq
+
+    def end_snapshot(self, seq: int, games: List[Tuple[int, str, int, dict]]) -> None:
+        ''' Writes the snapshot of every game, each entry being
+        (gid, host, seq of the game's last record, game.to_dict()),
+        then deletes the log segments it covers '''
+        try:
+            name = self.__path(Journal.SNAPSHOT_FILE)
+            with open(name + '.tmp', 'w') as f:
+                json.dump({'version': Journal.SNAPSHOT_VERSION, 'seq': seq,
+                           'games': games}, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(name + '.tmp', name)
+            self.__fsync_directory()
+
+            for segment in self.__segments():
+                if segment < self.__segment:
+                    os.remove(self.__segment_name(segment))
+            self.__snapshot_seq = seq
+        finally:
+            self.__snapshot_lock.release()
+
+    def abort_snapshot(self) -> None:
+        ''' Gives up a snapshot started with begin_snapshot.
+        The log segments are kept, so nothing is lost. '''
+        self.__snapshot_lock.release()
+
+    def __fsync_directory(self) -> None:
+        fd = os.open(self.__directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        ''' Stops the flush thread and writes what is left '''
+        self.__closed.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+        with self.__flush_lock:
+            if not self.__file.closed:
+                self.__write_pending()
+                self.__file.close()
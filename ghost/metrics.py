@@ -0,0 +1,313 @@
+from ghost.events import Rejected, StateChanged
+from ghost.ghost import Ghost
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import functools
+import threading
+import time
+
+''' METRICS
+
+Counters, gauges and histograms with labels, in the shape Prometheus
+expects. Each metric keeps its samples keyed by the tuple of their label
+values, behind a lock of its own. '''
+
+class Metric:
+
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = dict()       # label values to sample
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        ''' Returns (label values, value) for every labelled sample '''
+        with self._lock:
+            return [(labels, self._copy(value))
+                    for labels, value in sorted(self._values.items())]
+
+    def _copy(self, value: Any) -> Any:
+        return value
+
+class Counter(Metric):
+
+    TYPE = 'counter'
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+class Gauge(Metric):
+    ''' Either set directly, or read from a function on every collection '''
+
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: Sequence[str] = (),
+                 function: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        ''' function returns label values to value, and replaces set '''
+        super().__init__(name, documentation, label_names)
+        self.__function = function
+
+    def set(self, *labels, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        if self.__function is not None:
+            return sorted(self.__function().items())
+        return super().samples()
+
+class Histogram(Metric):
+    ''' Counts observations in buckets of fixed upper bounds.
+    Samples are (bucket counts, sum, count), where the bucket counts are
+    cumulative and match the bounds, then +Inf. '''
+
+    TYPE = 'histogram'
+
+    # seconds, for commands that take microseconds
+    LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4,
+                       2.5e-4, 5e-4, 1e-3, 1e-2, 0.1, 1.0)
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(labels)
+            if sample is None:
+                sample = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[labels] = sample
+            sample[0][i] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def _copy(self, value: Any) -> Any:
+        counts, total, count = value
+        cumulative = list()
+        running = 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+class Registry:
+    ''' A set of metrics, exported together '''
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self.__metrics = list()
+
+    def register(self, metric: Metric) -> Metric:
+        self.__metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, List[Tuple[Dict[str, str], Any]]]:
+        ''' Returns every metric name to [(labels, value)], where labels maps
+        label names to values and histogram values are dicts of bucket
+        upper bounds to cumulative counts, with sum and count. '''
+        result = dict()
+        for metric in self.__metrics:
+            samples = list()
+            for labels, value in metric.samples():
+                if isinstance(metric, Histogram):
+                    cumulative, total, count = value
+                    value = {'buckets': dict(zip(metric.buckets + (float('inf'),),
+                                                 cumulative)),
+                             'sum': total, 'count': count}
+                samples.append((dict(zip(metric.label_names, labels)), value))
+            result[metric.name] = samples
+
+        return result
+
+    def to_prometheus(self) -> str:
+        ''' Returns every metric in the Prometheus text exposition format '''
+        lines = list()
+        for metric in self.__metrics:
+            lines.append('# HELP %s %s' % (metric.name, _escape(metric.documentation)))
+            lines.append('# TYPE %s %s' % (metric.name, metric.TYPE))
+            for labels, value in metric.samples():
+                pairs = list(zip(metric.label_names, labels))
+                if not isinstance(metric, Histogram):
+                    lines.append(_sample(metric.name, pairs, value))
+                    continue
+
+                cumulative, total, count = value
+                for bound, c in zip(metric.buckets + (float('inf'),), cumulative):
+                    lines.append(_sample(metric.name + '_bucket',
+                                         pairs + [('le', _number(bound))], c))
+                lines.append(_sample(metric.name + '_sum', pairs, total))
+                lines.append(_sample(metric.name + '_count', pairs, count))
+
+        return '\n'.join(lines) + '\n'
+
+    def make_handler(self) -> type:
+        ''' Returns an http.server request handler that serves
+        to_prometheus() on GET /metrics '''
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', Registry.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # scrapes are too frequent to log
+                pass
+
+        return MetricsHandler
+
+    def start_http_server(self, port: int, address: str = '127.0.0.1') -> HTTPServer:
+        ''' Serves /metrics from a background thread.
+        Returns the server; call shutdown() on it to stop. '''
+        server = _ThreadingHTTPServer((address, port), self.make_handler())
+        threading.Thread(target=server.serve_forever, daemon=True,
+                         name='ghost-metrics').start()
+        return server
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _sample(name: str, pairs: List[Tuple[str, str]], value: float) -> str:
+    if not pairs:
+        return '%s %s' % (name, _number(value))
+    labels = ','.join('%s="%s"' % (k, _escape(str(v)).replace('"', '\\"'))
+                      for k, v in pairs)
+    return '%s{%s} %s' % (name, labels, _number(value))
+
+''' ENGINE METRICS '''
+
+class EngineMetrics(Registry):
+    ''' Metrics of one GhostEngine, see GhostEngine(metrics=...).
+
+    ghost_commands_total        commands by name and outcome
+    ghost_command_seconds       command latency by name
+    ghost_rejections_total      refused commands by name and ERR_ reason
+    ghost_games                 games by state, counted on collection
+    ghost_phase_seconds         time games spent in each state
+
+    A command's outcome is ok or rejected, from its success flag, or error
+    if it raised. apply_batch counts as one command, and so does a command
+    that calls another, like set_clue_by_player calling set_clue. '''
+
+    COMMANDS = (
+        'add_game', 'delete_game', 'register_player', 'unregister_player',
+        'start_game', 'set_param_town_word', 'set_param_fool_word',
+        'set_clue', 'set_clue_by_player', 'set_vote', 'set_vote_by_player',
+        'make_guess', 'make_guess_by_player', 'apply_batch'
+    )
+
+    # seconds, for phases that take from moments to a day
+    PHASE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 86400)
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        ''' clock times phases, and must match the engine's clock '''
+        super().__init__()
+        self.__clock = clock
+        self.__phases = dict()      # gid to (state, clock() when it began)
+        self.__census = None        # returns the engine's games by state
+        self.__local = threading.local()    # is_inside, for nested commands
+
+        self.commands = self.register(Counter(
+            'ghost_commands_total', 'Commands by name and outcome',
+            ('command', 'outcome')))
+        self.command_seconds = self.register(Histogram(
+            'ghost_command_seconds', 'Command latency in seconds', ('command',)))
+        self.rejections = self.register(Counter(
+            'ghost_rejections_total', 'Refused commands by name and reason',
+            ('command', 'reason')))
+        self.games = self.register(Gauge(
+            'ghost_games', 'Games by state', ('state',), self.__count_games))
+        self.phase_seconds = self.register(Histogram(
+            'ghost_phase_seconds', 'Seconds games spent in each state',
+            ('state',), EngineMetrics.PHASE_BUCKETS))
+
+    def attach(self, engine: Any) -> None:
+        ''' Instruments the commands of a GhostEngine and listens to its
+        events. Called by GhostEngine. '''
+        self.__census = engine.get_state_census
+        for command in EngineMetrics.COMMANDS:
+            setattr(engine, command, self.__timed(command, getattr(engine, command)))
+        engine.events.subscribe(self.__on_event)
+
+    def __timed(self, command: str, method: Callable) -> Callable:
+        clock = time.perf_counter
+        local = self.__local
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            if getattr(local, 'is_inside', False):
+                return method(*args, **kwargs)
+
+            start = clock()
+            outcome = 'error'
+            local.is_inside = True
+            try:
+                result = method(*args, **kwargs)
+                is_success = result[0] if type(result) is tuple else result
+                outcome = 'rejected' if is_success is False else 'ok'
+                return result
+            finally:
+                local.is_inside = False
+                self.command_seconds.observe(command, value=clock() - start)
+                self.commands.inc(command, outcome)
+
+        return timed
+
+    def __on_event(self, event: Any) -> None:
+        if type(event) is StateChanged:
+            now = self.__clock()
+            phase = self.__phases.get(event.gid)
+            if phase is not None:
+                self.phase_seconds.observe(phase[0].name, value=now - phase[1])
+            self.__phases[event.gid] = (event.new, now)
+        elif type(event) is Rejected:
+            self.rejections.inc(event.command, event.code)
+
+    def __count_games(self) -> Dict[Tuple[str, ...], float]:
+        if self.__census is None:
+            return dict()
+        return {(state.name,): n for state, n in self.__census().items()}
+
+    ''' ENGINE HOOKS '''
+
+    def game_added(self, gid: int, state: Ghost.States) -> None:
+        ''' A game in state was created or restored '''
+        self.__phases[gid] = (state, self.__clock())
+
+    def game_removed(self, gid: int) -> None:
+        ''' Its unfinished phase is not observed '''
+        self.__phases.pop(gid, None)
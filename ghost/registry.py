@@ -0,0 +1,100 @@
+import threading
+
+from typing import Any, Hashable, Iterator, List, Tuple
+
+class ShardedRegistry:
+    ''' A dictionary split into lock-striped shards.
+    Each key hashes to one shard, and only that shard's lock is taken,
+    so operations on keys in different shards never contend. '''
+
+    DEFAULT_NUM_SHARDS = 64
+
+    def __init__(self, num_shards: int = DEFAULT_NUM_SHARDS):
+        if num_shards < 1:
+            raise ValueError('A registry needs at least one shard')
+
+        self.__num_shards = num_shards
+        self.__shards = [dict() for _ in range(num_shards)]
+        self.__locks = [threading.RLock() for _ in range(num_shards)]
+
+    def __index(self, key: Hashable) -> int:
+        return hash(key) % self.__num_shards
+
+    def lock_for(self, key: Hashable) -> threading.RLock:
+        ''' Returns the lock guarding the shard that key belongs to.
+        Hold it to run several operations on one key atomically. '''
+        return self.__locks[self.__index(key)]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        i = self.__index(key)
+        with self.__locks[i]:
+            return self.__shards[i].get(key, default)
+
+    def __contains__(self, key: Hashable) -> bool:
+        i = self.__index(key)
+        with self.__locks[i]:
+            return key in self.__shards[i]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        i = self.__index(key)
+        with self.__locks[i]:
+            return self.__shards[i][key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        i = self.__index(key)
+        with self.__locks[i]:
+            self.__shards[i][key] = value
+
+    def setdefault(self, key: Hashable, value: Any) -> Tuple[bool, Any]:
+        ''' Inserts value if key is absent.
+        Returns a tuple of (inserted, value stored under key). '''
+        i = self.__index(key)
+        with self.__locks[i]:
+            shard = self.__shards[i]
+            if key in shard:
+                return False, shard[key]
+
+            shard[key] = value
+            return True, value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        i = self.__index(key)
+        with self.__locks[i]:
+            return self.__shards[i].pop(key, default)
+
+    def pop_if(self, key: Hashable, expected: Any) -> bool:
+        ''' Removes key only if it currently maps to expected.
+        Returns True if the key was removed '''
+        i = self.__index(key)
+        with self.__locks[i]:
+            shard = self.__shards[i]
+            if key in shard and shard[key] == expected:
+                del shard[key]
+                return True
+
+            return False
+
+    def __len__(self) -> int:
+        # each shard is read under its own lock, so the total is only
+        # a point-in-time estimate while other threads are writing
+        total = 0
+        for i in range(self.__num_shards):
+            with self.__locks[i]:
+                total += len(self.__shards[i])
+
+        return total
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        ''' Returns a shard-by-shard copy of the entries '''
+        result = list()
+        for i in range(self.__num_shards):
+            with self.__locks[i]:
+                result.extend(self.__shards[i].items())
+
+        return result
+
+    def keys(self) -> List[Hashable]:
+        return [k for k, _ in self.items()]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.keys())
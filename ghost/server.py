@@ -0,0 +1,323 @@
+from ghost.engine import GhostEngine
+
+from collections import defaultdict
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, List, Sequence, Tuple
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+
+''' COMMANDS
+
+Every GhostEngine method a client may call, by how the router finds the
+game it belongs to. '''
+
+GID_COMMANDS = (
+    'add_game', 'delete_game', 'has_game', 'get_game_state',
+    'get_existing_players', 'get_player_order', 'get_player_roles',
+    'get_role_census', 'get_words', 'get_view', 'get_if_changed',
+    'register_player', 'unregister_player',
+    'start_game', 'get_next_in_player_order', 'set_clue', 'get_all_clues',
+    'set_vote', 'make_guess'
+)
+HOST_COMMANDS = (
+    'get_gid_from_host', 'set_param_town_word', 'set_param_fool_word',
+    'suggest_fool_words'
+)
+PLAYER_COMMANDS = (
+    'get_gid_from_player', 'set_clue_by_player', 'set_vote_by_player',
+    'make_guess_by_player'
+)
+COMMANDS = GID_COMMANDS + HOST_COMMANDS + PLAYER_COMMANDS + \
+    ('apply_batch', 'expire_idle_games')
+
+def _serve_engine(conn: Connection, engine_factory: Callable[[], GhostEngine]) -> None:
+    ''' Worker process: applies (method, args) requests to its own engine
+    and replies (True, result), or (False, exception) '''
+    engine = engine_factory()
+    while True:
+        request = conn.recv()
+        if request is None:
+            conn.close()
+            return
+
+        method, args = request
+        try:
+            conn.send((True, getattr(engine, method)(*args)))
+        except Exception as e:
+            conn.send((False, e))
+
+class _Worker:
+    ''' The router's end of one worker process '''
+
+    def __init__(self, engine_factory: Callable[[], GhostEngine]):
+        self.__conn, child_conn = multiprocessing.Pipe()
+        self.__lock = threading.Lock()
+        self.__process = multiprocessing.Process(
+            target=_serve_engine, args=(child_conn, engine_factory), daemon=True)
+        self.__process.start()
+        child_conn.close()
+
+    def call(self, method: str, *args) -> Any:
+        with self.__lock:
+            self.__conn.send((method, args))
+            is_success, result = self.__conn.recv()
+
+        if not is_success:
+            raise result
+        return result
+
+    def stop(self) -> None:
+        with self.__lock:
+            self.__conn.send(None)
+        self.__process.join()
+
+class GhostServer:
+    ''' Runs games in num_workers processes, each with its own GhostEngine,
+    so games use every core instead of sharing one interpreter.
+    Game gid lives on worker gid % num_workers.
+
+    Clients connect to a Unix domain socket at path, see GhostClient.
+    The router in this process forwards every command to the worker owning
+    its game. It remembers the game of every host and player it has seen
+    registered, so commands addressed by host or player still find their
+    worker, and it keeps hosts and players to one game across workers. '''
+
+    def __init__(self, path: str, num_workers: int = None,
+                 engine_factory: Callable[[], GhostEngine] = GhostEngine):
+        ''' engine_factory builds the engine of each worker. It must be
+        picklable unless workers are started by forking. '''
+        self.__path = path
+        self.__workers = [_Worker(engine_factory)
+                          for _ in range(num_workers or os.cpu_count() or 1)]
+
+        # hints only, the owning worker has the final word
+        self.__host_to_gid = dict()
+        self.__gid_to_host = dict()
+        self.__player_to_gid = dict()
+        self.__index_lock = threading.Lock()
+
+        # commands that also update the hints
+        self.__routes = {
+            'add_game': self.__add_game,
+            'delete_game': self.__delete_game,
+            'register_player': self.__register_player,
+            'unregister_player': self.__unregister_player,
+            'apply_batch': self.__apply_batch,
+            'expire_idle_games': self.__expire_idle_games
+        }
+
+        self.__listener = Listener(path, family='AF_UNIX')
+        self.__thread = None
+        self.__closed = False
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    def start(self) -> None:
+        ''' Accepts clients on a background thread '''
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True,
+                                         name='ghost-server')
+        self.__thread.start()
+
+    def serve_forever(self) -> None:
+        while not self.__closed:
+            try:
+                conn = self.__listener.accept()
+            except OSError:
+                # the listener was closed
+                return
+
+            threading.Thread(target=self.__serve_client, args=(conn,),
+                             daemon=True).start()
+
+    def close(self) -> None:
+        ''' Stops accepting clients and shuts down every worker '''
+        self.__closed = True
+        self.__listener.close()
+        for worker in self.__workers:
+            worker.stop()
+
+    def __serve_client(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    method, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    conn.send((True, self.dispatch(method, *args)))
+                except Exception as e:
+                    conn.send((False, e))
+
+    ''' ROUTING '''
+
+    def __worker_for(self, gid: int) -> _Worker:
+        return self.__workers[gid % len(self.__workers)]
+
+    def dispatch(self, method: str, *args) -> Any:
+        ''' Applies one command on the worker that owns its game '''
+        route = self.__routes.get(method)
+        if route is not None:
+            return route(*args)
+        elif method in GID_COMMANDS:
+            return self.__worker_for(args[0]).call(method, *args)
+        elif method in HOST_COMMANDS:
+            return self.__call_by_name(self.__host_to_gid, method, args)
+        elif method in PLAYER_COMMANDS:
+            return self.__call_by_name(self.__player_to_gid, method, args)
+
+        raise ValueError(GhostEngine.ERR_UNKNOWN_COMMAND % method)
+
+    def __call_by_name(self, index: dict, method: str, args: tuple) -> Any:
+        ''' Forwards a command addressed by host or player to the worker of
+        their game, which resolves the name again by itself.
+        Names without a game get the default reply of any worker. '''
+        gid = index.get(args[0], 0)
+        return self.__worker_for(gid).call(method, *args)
+
+    def __is_taken(self, index: dict, lookup: str, name: str, gid: int) -> bool:
+        ''' Returns True if a host or player belongs to a game other than gid '''
+        other = index.get(name)
+        return other is not None and other != gid and \
+            self.__worker_for(other).call(lookup, name) == other
+
+    def __add_game(self, gid: int, host: str) -> bool:
+        with self.__index_lock:
+            if self.__is_taken(self.__host_to_gid, 'get_gid_from_host', host, gid):
+                logging.warning(GhostEngine.ERR_HOST_ALREADY_HOSTING, host)
+                return False
+
+            is_success = self.__worker_for(gid).call('add_game', gid, host)
+            if is_success:
+                self.__host_to_gid[host] = gid
+                self.__gid_to_host[gid] = host
+
+            return is_success
+
+    def __delete_game(self, gid: int) -> bool:
+        worker = self.__worker_for(gid)
+        players = worker.call('get_existing_players', gid)
+        is_success = worker.call('delete_game', gid)
+        if is_success:
+            with self.__index_lock:
+                host = self.__gid_to_host.pop(gid, None)
+                if self.__host_to_gid.get(host) == gid:
+                    del self.__host_to_gid[host]
+                for player in players:
+                    if self.__player_to_gid.get(player) == gid:
+                        del self.__player_to_gid[player]
+
+        return is_success
+
+    def __register_player(self, gid: int, player: str) -> (bool, int):
+        worker = self.__worker_for(gid)
+        with self.__index_lock:
+            if self.__is_taken(self.__player_to_gid, 'get_gid_from_player',
+                               player, gid):
+                logging.warning(GhostEngine.ERR_PLAYER_IN_OTHER_GAME, player)
+                return False, len(worker.call('get_existing_players', gid))
+
+            is_success, num_players = worker.call('register_player', gid, player)
+            if is_success:
+                self.__player_to_gid[player] = gid
+
+            return is_success, num_players
+
+    def __unregister_player(self, gid: int, player: str) -> bool:
+        is_success = self.__worker_for(gid).call('unregister_player', gid, player)
+        if is_success:
+            with self.__index_lock:
+                if self.__player_to_gid.get(player) == gid:
+                    del self.__player_to_gid[player]
+
+        return is_success
+
+    def __apply_batch(self, commands: Sequence[Tuple[int, str, str, str]]) -> List[tuple]:
+        ''' Sends each worker its share of the batch in one request '''
+        by_worker = defaultdict(list)       # worker to indices of its commands
+        for i, command in enumerate(commands):
+            by_worker[self.__worker_for(command[0])].append(i)
+
+        results = [None] * len(commands)
+        for worker, indices in by_worker.items():
+            group_result = worker.call('apply_batch', [commands[i] for i in indices])
+            for i, result in zip(indices, group_result):
+                results[i] = result
+
+        return results
+
+    def __expire_idle_games(self) -> List[int]:
+        ''' Every worker expires its own games '''
+        expired = list()
+        for worker in self.__workers:
+            expired.extend(worker.call('expire_idle_games'))
+
+        with self.__index_lock:
+            for gid in expired:
+                host = self.__gid_to_host.pop(gid, None)
+                if self.__host_to_gid.get(host) == gid:
+                    del self.__host_to_gid[host]
+
+        return expired
+
+class GhostClient:
+    ''' Connects to a GhostServer and offers the same methods as GhostEngine,
+    for the commands in COMMANDS. Safe to share between threads. '''
+
+    def __init__(self, path: str):
+        self.__conn = Client(path, family='AF_UNIX')
+        self.__lock = threading.Lock()
+
+    def __call(self, method: str, *args) -> Any:
+        with self.__lock:
+            self.__conn.send((method, args))
+            is_success, result = self.__conn.recv()
+
+        if not is_success:
+            raise result
+        return result
+
+    def __getattr__(self, method: str) -> Callable:
+        if method not in COMMANDS:
+            raise AttributeError(method)
+
+        def call(*args):
+            return self.__call(method, *args)
+        call.__name__ = method
+        return call
+
+    def close(self) -> None:
+        self.__conn.close()
+
+    def __enter__(self) -> 'GhostClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Serve ghost games from several worker processes '
+                    'over a Unix domain socket')
+    parser.add_argument('socket')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    server = GhostServer(args.socket, args.workers)
+    print('Serving ghost games on %s' % args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
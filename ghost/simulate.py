@@ -0,0 +1,256 @@
+from ghost.dictionary import WordSetValidator
+from ghost.ghost import GameView, Ghost
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Sequence, Tuple
+
+import argparse
+import json
+import math
+import random
+import time
+
+''' POLICIES '''
+
+class Policy:
+    ''' Decides what a simulated player does. Every call gets the current
+    view of the game, the player, their role and a random.Random.
+    Policies are sent to worker processes, so they must be picklable. '''
+
+    def clue(self, view: GameView, player: str, role: Ghost.Roles,
+             rng: random.Random) -> str:
+        return 'clue'
+
+    def vote(self, view: GameView, player: str, role: Ghost.Roles,
+             rng: random.Random) -> str:
+        ''' Returns a living player, or '' to vote for no one '''
+        raise NotImplementedError
+
+    def guess(self, view: GameView, player: str, town_word: str,
+              fool_word: str, rng: random.Random) -> str:
+        ''' Guess of a lynched ghost. town_word is given so policies can
+        model how often ghosts work it out. '''
+        raise NotImplementedError
+
+class RandomPolicy(Policy):
+    ''' Votes for another living player uniformly at random, whatever its
+    role, and guesses the town word with probability guess_accuracy.
+    Its outcomes can also be sampled in bulk, see sample_random_outcomes. '''
+
+    def __init__(self, guess_accuracy: float = 0.25):
+        self.guess_accuracy = guess_accuracy
+
+    def vote(self, view: GameView, player: str, role: Ghost.Roles,
+             rng: random.Random) -> str:
+        others = [p for p in view.players if p != player]
+        return rng.choice(others)
+
+    def guess(self, view: GameView, player: str, town_word: str,
+              fool_word: str, rng: random.Random) -> str:
+        return town_word if rng.random() < self.guess_accuracy else fool_word
+
+''' PLAYING '''
+
+TOWN_WORD = 'egg'
+FOOL_WORD = 'fry'
+_VALIDATOR = WordSetValidator([TOWN_WORD, FOOL_WORD])
+
+# games still running after this many commands are given up as unfinished
+MAX_COMMANDS_PER_GAME = 10000
+
+def play_game(num_players: int, policy: Policy, rng: random.Random,
+              early_lynch: bool = False) -> Ghost.States:
+    ''' Plays one game end to end through the real state machine.
+    Returns the final state, WINNER_* unless the game never finished. '''
+    game = Ghost(_VALIDATOR, early_lynch,
+                 max_players=max(num_players, Ghost.MAX_NUM_PLAYERS),
+                 seed=rng.getrandbits(64))
+    for i in range(num_players):
+        game.register_player('p%d' % i)
+    game.start_game()
+    game.set_param_town_word(TOWN_WORD)
+    game.set_param_fool_word(FOOL_WORD)
+    roles = game.get_player_roles()
+
+    for _ in range(MAX_COMMANDS_PER_GAME):
+        view = game.get_view()
+        if view.state == Ghost.States.CLUE_ROUND:
+            player = view.next_player
+            game.set_clue(player, policy.clue(view, player, roles[player], rng))
+        elif view.state == Ghost.States.VOTE_ROUND:
+            player = next(p for p in view.players
+                          if game.get_player(p).vote is None)
+            game.set_vote(player, policy.vote(view, player, roles[player], rng))
+        elif view.state == Ghost.States.GUESS_ROUND:
+            player = view.last_lynched
+            game.make_guess(player, policy.guess(view, player, TOWN_WORD,
+                                                 FOOL_WORD, rng))
+        else:
+            break
+
+    return game.get_game_state()
+
+def _play_chunk(num_players: int, num_games: int, policy: Policy, seed: int,
+                early_lynch: bool) -> Counter:
+    rng = random.Random(seed)
+    return Counter(play_game(num_players, policy, rng, early_lynch)
+                   for _ in range(num_games))
+
+def sample_random_outcomes(num_players: int, num_games: int,
+                           guess_accuracy: float, seed: int = None) -> (int, int):
+    ''' Samples the winners of num_games games of RandomPolicy players with
+    NumPy, all games at once. Returns the town and ghost win counts.
+
+    Random votes ignore roles, so by symmetry every lynch hits a uniformly
+    random living player, and rounds without a lynch change nothing.
+    Each game is then a walk over the number of living ghosts and others. '''
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    role_set = Ghost.get_role_set(num_players)
+    ghosts = np.full(num_games, role_set[Ghost.Roles.GHOST])
+    others = np.full(num_games, num_players - role_set[Ghost.Roles.GHOST])
+    town_wins = ghost_wins = 0
+
+    while len(ghosts):
+        is_ghost = rng.random(len(ghosts)) * (ghosts + others) < ghosts
+        is_guessed = is_ghost & (rng.random(len(ghosts)) < guess_accuracy)
+        ghosts = ghosts - (is_ghost & ~is_guessed)
+        others = others - ~is_ghost
+
+        is_town_win = ~is_guessed & (ghosts == 0)
+        is_ghost_win = is_guessed | \
+            (~is_town_win & (ghosts >= (ghosts + others) // 2))
+        town_wins += int(is_town_win.sum())
+        ghost_wins += int(is_ghost_win.sum())
+
+        running = ~(is_town_win | is_ghost_win)
+        ghosts, others = ghosts[running], others[running]
+
+    return town_wins, ghost_wins
+
+''' RESULTS '''
+
+class SimulationResult(NamedTuple):
+    num_players: int
+    role_set: Tuple[int, int, int]      # town, ghost, fool
+    games: int
+    town_wins: int
+    ghost_wins: int
+    seconds: float
+
+    @property
+    def unfinished(self) -> int:
+        return self.games - self.town_wins - self.ghost_wins
+
+    @property
+    def ghost_win_rate(self) -> float:
+        return self.ghost_wins / self.games if self.games else 0.0
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else float('inf')
+
+    def confidence_interval(self, z: float = 1.96) -> (float, float):
+        ''' Wilson score interval of the ghost win rate, 95% by default '''
+        if not self.games:
+            return 0.0, 1.0
+
+        n, p = self.games, self.ghost_win_rate
+        centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+        margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return max(0.0, centre - margin), min(1.0, centre + margin)
+
+    def to_dict(self) -> dict:
+        low, high = self.confidence_interval()
+        return {
+            'num_players': self.num_players,
+            'role_set': dict(zip(('town', 'ghost', 'fool'), self.role_set)),
+            'games': self.games,
+            'town_wins': self.town_wins,
+            'ghost_wins': self.ghost_wins,
+            'unfinished': self.unfinished,
+            'ghost_win_rate': self.ghost_win_rate,
+            'ghost_win_rate_95': [low, high],
+            'games_per_second': self.games_per_second
+        }
+
+def simulate(num_players: int, num_games: int, policy: Policy = None,
+             workers: int = None, seed: int = 0, early_lynch: bool = False,
+             vectorized: bool = False, chunk_size: int = 1000) -> SimulationResult:
+    ''' Plays num_games games of num_players players, RandomPolicy by default.
+    Games are split into chunks of chunk_size and played on a pool of
+    workers processes, or in this process with workers=1.
+    vectorized samples the outcomes with NumPy instead, RandomPolicy only. '''
+    policy = policy if policy is not None else RandomPolicy()
+    role_set = Ghost.get_role_set(num_players)
+    start = time.perf_counter()
+
+    if vectorized:
+        if type(policy) is not RandomPolicy:
+            raise ValueError('Only RandomPolicy outcomes can be vectorized')
+        town_wins, ghost_wins = sample_random_outcomes(
+            num_players, num_games, policy.guess_accuracy, seed)
+    else:
+        sizes = [chunk_size] * (num_games // chunk_size)
+        if num_games % chunk_size:
+            sizes.append(num_games % chunk_size)
+        args = [(num_players, size, policy, seed * 1000003 + i, early_lynch)
+                for i, size in enumerate(sizes)]
+
+        outcomes = Counter()
+        if workers == 1:
+            for chunk in args:
+                outcomes.update(_play_chunk(*chunk))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                for chunk_outcomes in pool.map(_play_chunk, *zip(*args)):
+                    outcomes.update(chunk_outcomes)
+
+        town_wins = outcomes[Ghost.States.WINNER_TOWN]
+        ghost_wins = outcomes[Ghost.States.WINNER_GHOST]
+
+    return SimulationResult(
+        num_players, tuple(role_set[r] for r in (Ghost.Roles.TOWN, Ghost.Roles.GHOST,
+                                                 Ghost.Roles.FOOL)),
+        num_games, town_wins, ghost_wins, time.perf_counter() - start)
+
+def format_report(results: Sequence[SimulationResult]) -> str:
+    lines = ['players  town/ghost/fool     games  ghost wins  95% interval     games/s']
+    for r in results:
+        low, high = r.confidence_interval()
+        lines.append('%7d  %15s  %8d  %9.1f%%  %5.1f%% - %5.1f%%  %9.0f' % (
+            r.num_players, '%d/%d/%d' % r.role_set, r.games,
+            100 * r.ghost_win_rate, 100 * low, 100 * high, r.games_per_second))
+
+    return '\n'.join(lines)
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Play simulated games to measure win rates per player count')
+    parser.add_argument('--players', default='3-10',
+                        help='player count or range, like 5 or 3-10')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--guess-accuracy', type=float, default=0.25)
+    parser.add_argument('--early-lynch', action='store_true')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='sample outcomes with NumPy instead of playing')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    low, _, high = args.players.partition('-')
+    results = [simulate(n, args.games, RandomPolicy(args.guess_accuracy),
+                        args.workers, args.seed, args.early_lynch, args.vectorized)
+               for n in range(int(low), int(high or low) + 1)]
+
+    if args.json:
+        print(json.dumps([r.to_dict() for r in results], indent=2))
+    else:
+        print(format_report(results))
+
+if __name__ == '__main__':
+    main()
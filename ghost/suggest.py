@@ -0,0 +1,176 @@
+from ghost.dictionary import WordValidator
+
+from collections import Counter
+from typing import Callable, List, Tuple
+
+import heapq
+import threading
+import weakref
+
+def edit_distance(a: str, b: str) -> int:
+    ''' Levenshtein distance between two words '''
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        previous = current
+
+    return previous[-1]
+
+def hamming_distance(a: str, b: str) -> int:
+    ''' Number of positions at which two words of equal length differ '''
+    return sum(ca != cb for ca, cb in zip(a, b))
+
+def shared_letters(a: str, b: str) -> int:
+    ''' Number of letters the two words have in common, counting repeats '''
+    return sum((Counter(a) & Counter(b)).values())
+
+class BKTree:
+    ''' Burkhard-Keller tree over a metric, for nearest-word queries.
+    A search within radius r only descends into children whose edge
+    distance lies within r of the query's distance to the node. '''
+
+    def __init__(self, distance: Callable[[str, str], int] = edit_distance):
+        self.__distance = distance
+        self.__root = None      # (word, {edge distance: child node})
+
+    def add(self, word: str) -> None:
+        if self.__root is None:
+            self.__root = (word, dict())
+            return
+
+        node = self.__root
+        while True:
+            d = self.__distance(word, node[0])
+            if d == 0:
+                return
+
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (word, dict())
+                return
+
+            node = child
+
+    def search(self, word: str, radius: int) -> List[Tuple[int, str]]:
+        ''' Returns (distance, word) for every word within radius '''
+        result = list()
+        if self.__root is None:
+            return result
+
+        stack = [self.__root]
+        while stack:
+            node_word, children = stack.pop()
+            d = self.__distance(word, node_word)
+            if d <= radius:
+                result.append((d, node_word))
+
+            for edge, child in children.items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+
+        return result
+
+    def nearest(self, word: str, k: int) -> List[Tuple[int, str]]:
+        ''' Returns (distance, word) for the k words closest to word, and
+        for every other word as close as the k-th, so callers can break
+        ties themselves. The search radius shrinks to the k-th best
+        distance found so far. '''
+        best = list()       # max-heap of (-distance, word)
+        if self.__root is None or k <= 0:
+            return best
+
+        # each entry carries a lower bound on the distance to any word below it
+        stack = [(0, self.__root)]
+        while stack:
+            bound, (node_word, children) = stack.pop()
+            if len(best) >= k and bound > -best[0][0]:
+                continue
+
+            d = self.__distance(word, node_word)
+            if len(best) < k or d <= -best[0][0]:
+                heapq.heappush(best, (-d, node_word))
+                self.__drop_farthest(best, k)
+
+            # push the most promising child last so it is explored first
+            # and tightens the radius for its siblings
+            radius = -best[0][0] if len(best) >= k else None
+            for edge in sorted(children, key=lambda e: -abs(e - d)):
+                if radius is None or abs(edge - d) <= radius:
+                    stack.append((abs(edge - d), children[edge]))
+
+        return sorted((-d, w) for d, w in best)
+
+    @staticmethod
+    def __drop_farthest(best: list, k: int) -> None:
+        ''' Drops the words at the largest distance while k closer ones remain '''
+        while len(best) > k:
+            farthest = best[0][0]
+            ties = list()
+            while best and best[0][0] == farthest:
+                ties.append(heapq.heappop(best))
+            if len(best) < k:
+                for entry in ties:
+                    heapq.heappush(best, entry)
+                return
+
+class FoolWordIndex:
+    ''' Suggests fool words for a town word.
+    Words are split into buckets by length, and each bucket's BK-tree is
+    only built the first time a word of that length is queried. Within a
+    bucket every word has the same length and words are compared by
+    Hamming distance, which can exceed the edit distance (abcd and bcda
+    are 4 apart, not 2). Candidates are ranked by it, then by shared
+    letters, over every word tied at the k-th distance. '''
+
+    __shared = weakref.WeakKeyDictionary()    # validator to its index
+    __shared_lock = threading.Lock()
+
+    def __init__(self, validator: WordValidator):
+        self.__validator = validator
+        self.__trees = dict()       # word length to BKTree
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def for_validator(cls, validator: WordValidator) -> 'FoolWordIndex':
+        ''' Returns the index shared by every game using this validator '''
+        with cls.__shared_lock:
+            index = cls.__shared.get(validator)
+            if index is None:
+                index = cls(validator)
+                cls.__shared[validator] = index
+
+            return index
+
+    def __get_tree(self, length: int) -> BKTree:
+        with self.__lock:
+            tree = self.__trees.get(length)
+            if tree is None:
+                tree = BKTree(hamming_distance)
+                for w in self.__validator.words_of_length(length):
+                    tree.add(w)
+                self.__trees[length] = tree
+
+            return tree
+
+    def warm(self, lengths: List[int]) -> None:
+        ''' Builds the buckets for these word lengths ahead of time '''
+        for length in lengths:
+            self.__get_tree(length)
+
+    def suggest(self, town_word: str, k: int) -> List[str]:
+        ''' Returns up to k words of the same length as town_word '''
+        town_word = town_word.lower()
+        tree = self.__get_tree(len(town_word))
+
+        # ask for one extra in case the town word itself is in the tree
+        candidates = sorted((d, -shared_letters(town_word, w), w)
+                            for d, w in tree.nearest(town_word, k + 1)
+                            if w != town_word)
+        return [w for _, _, w in candidates[:k]]
@@ -0,0 +1,61 @@
+from typing import Hashable, List
+
+import math
+import threading
+
+class TimerWheel:
+    ''' Hashed timer wheel.
+    Time is cut into ticks of tick seconds, and a timer lands in slot
+    (deadline tick) % num_slots. Advancing the wheel only visits the slots
+    of the ticks that passed, so scheduling is O(1) and expiry is O(1)
+    amortized per timer when deadlines are within num_slots ticks.
+    Timers fire at most one tick late. '''
+
+    DEFAULT_NUM_SLOTS = 256
+
+    def __init__(self, tick: float, num_slots: int = DEFAULT_NUM_SLOTS,
+                 now: float = 0.0):
+        if tick <= 0 or num_slots < 1:
+            raise ValueError('A timer wheel needs a positive tick and slots')
+
+        self.__tick = tick
+        self.__slots = [list() for _ in range(num_slots)]   # (tick, key)
+        self.__current = int(now // tick)   # last tick advanced past
+        self.__lock = threading.Lock()
+        self.__size = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        ''' Fires key once the wheel advances to deadline '''
+        with self.__lock:
+            tick = max(int(math.ceil(deadline / self.__tick)), self.__current + 1)
+            self.__slots[tick % len(self.__slots)].append((tick, key))
+            self.__size += 1
+
+    def advance(self, now: float) -> List[Hashable]:
+        ''' Moves the wheel to now and returns the keys that fired '''
+        target = int(now // self.__tick)
+        expired = list()
+        with self.__lock:
+            num_slots = len(self.__slots)
+            # past one full turn, every slot is visited once
+            steps = min(target - self.__current, num_slots)
+            for tick in range(self.__current + 1, self.__current + 1 + steps):
+                slot = self.__slots[tick % num_slots]
+                if not slot:
+                    continue
+
+                kept = list()
+                for entry in slot:
+                    if entry[0] <= target:
+                        expired.append(entry[1])
+                    else:
+                        kept.append(entry)
+                self.__slots[tick % num_slots] = kept
+
+            self.__current = max(self.__current, target)
+            self.__size -= len(expired)
+
+        return expired
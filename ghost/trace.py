@@ -0,0 +1,221 @@
+from ghost.dictionary import MmapValidator, WordValidator
+from ghost.engine import GhostEngine
+from ghost.server import COMMANDS
+
+from collections.abc import Mapping as MappingABC
+from enum import Enum
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+import argparse
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+
+''' TRACES
+
+A trace is every call made to an engine's client methods, with its
+arguments, its result and when it was made. Results are kept as JSON
+values: enums by name, tuples as lists and mappings as dicts. '''
+
+# the methods a GhostClient may call, less the timer-driven expiry, whose
+# deletions are traced as the delete_game calls it makes
+TRACED_METHODS = tuple(m for m in COMMANDS if m != 'expire_idle_games')
+
+TRACE_VERSION = 1
+ERR_BAD_TRACE = 'Not a trace of version %d: %%s' % TRACE_VERSION
+
+class TraceCall(NamedTuple):
+    time: float             # seconds since recording started
+    method: str
+    args: list
+    kwargs: dict
+    result: Any             # as encoded by encode_result
+
+class Trace(NamedTuple):
+    settings: dict          # GhostEngine keyword arguments to replay with
+    calls: List[TraceCall]
+
+    def save(self, path: str) -> None:
+        ''' Writes the trace as JSON lines, the settings first '''
+        with open(path, 'w') as f:
+            f.write(json.dumps({'version': TRACE_VERSION,
+                                'settings': self.settings}) + '\n')
+            for call in self.calls:
+                f.write(json.dumps(call, separators=(',', ':')) + '\n')
+
+    @classmethod
+    def load(cls, path: str) -> 'Trace':
+        with open(path) as f:
+            header = json.loads(f.readline())
+            if header.get('version') != TRACE_VERSION:
+                raise ValueError(ERR_BAD_TRACE % path)
+            calls = [TraceCall(*json.loads(line)) for line in f]
+
+        return cls(header['settings'], calls)
+
+def encode_result(value: Any) -> Any:
+    ''' Returns value as JSON values, so results compare equal to their
+    recorded copies after a save and load '''
+    if isinstance(value, Enum):
+        return value.name
+    elif isinstance(value, MappingABC):
+        return {str(encode_result(k)): encode_result(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [encode_result(v) for v in value]
+    return value
+
+''' RECORDING '''
+
+class TraceRecorder:
+    ''' Records every call to the TRACED_METHODS of a GhostEngine, from any
+    thread, until stopped. Calls the engine makes to its own methods, such
+    as set_clue_by_player to set_clue, are part of the outer call. Calls
+    that raise are not recorded, as they change nothing.
+
+    Calls are recorded in the order they return. Calls from several
+    threads on one game may return out of the order the game took them
+    in, so record one thread per game to replay with matching results.
+
+    settings are the GhostEngine keyword arguments, such as seed and
+    early_lynch, that the engine was built with. Without a seed, roles
+    and clue orders are random, and their results will not replay. '''
+
+    def __init__(self, engine: GhostEngine, settings: Dict[str, Any] = None,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.__engine = engine
+        self.__settings = dict(settings or ())
+        self.__clock = clock
+        self.__start = clock()
+        self.__calls = list()
+        self.__lock = threading.Lock()
+        self.__local = threading.local()    # is_inside, for nested calls
+
+        self.__methods = {m: getattr(engine, m) for m in TRACED_METHODS}
+        for method, function in self.__methods.items():
+            setattr(engine, method, self.__traced(method, function))
+
+    def __traced(self, method: str, function: Callable) -> Callable:
+        local = self.__local
+
+        @functools.wraps(function)
+        def traced(*args, **kwargs):
+            if getattr(local, 'is_inside', False):
+                return function(*args, **kwargs)
+
+            start = self.__clock() - self.__start
+            local.is_inside = True
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                local.is_inside = False
+
+            call = TraceCall(start, method, encode_result(args),
+                             encode_result(kwargs), encode_result(result))
+            with self.__lock:
+                self.__calls.append(call)
+            return result
+
+        return traced
+
+    def trace(self) -> Trace:
+        ''' Returns the calls recorded so far '''
+        with self.__lock:
+            return Trace(dict(self.__settings), list(self.__calls))
+
+    def stop(self) -> Trace:
+        ''' Restores the engine's methods and returns the trace.
+        Anything wrapping them after the recorder started is dropped. '''
+        for method, function in self.__methods.items():
+            setattr(self.__engine, method, function)
+        return self.trace()
+
+''' REPLAYING '''
+
+class ReplayResult(NamedTuple):
+    calls: int
+    mismatches: List[Tuple[int, Any, Any]]  # call index, recorded, replayed
+    seconds: float
+    max_lag: float          # most seconds a call ran behind its recorded time
+
+    @property
+    def calls_per_second(self) -> float:
+        return self.calls / self.seconds if self.seconds else float('inf')
+
+def replay_trace(trace: Trace, engine: GhostEngine,
+                 speed: float = None) -> ReplayResult:
+    ''' Makes every call of trace on engine, in order, and compares the
+    results with the recorded ones. engine must be new and built with the
+    trace's settings for results to match.
+    With speed, calls keep their recorded spacing divided by speed, so 1
+    is the recorded pace. Otherwise they are made back to back. '''
+    clock = time.perf_counter
+    mismatches = list()
+    max_lag = 0.0
+    start = clock()
+
+    for i, call in enumerate(trace.calls):
+        if speed is not None:
+            lag = clock() - start - call.time / speed
+            if lag < 0:
+                time.sleep(-lag)
+            else:
+                max_lag = max(max_lag, lag)
+
+        result = encode_result(getattr(engine, call.method)(*call.args, **call.kwargs))
+        if result != call.result:
+            mismatches.append((i, call.result, result))
+
+    return ReplayResult(len(trace.calls), mismatches, clock() - start, max_lag)
+
+def replay(traces: Sequence[Trace], speed: float = None,
+           validator: WordValidator = None) -> List[ReplayResult]:
+    ''' Replays every trace at once, each on a new GhostEngine built from
+    its settings and validator, in a thread of its own.
+    Returns the ReplayResult of each trace, in order. '''
+    engines = [GhostEngine(validator=validator, **trace.settings) for trace in traces]
+    results = [None] * len(traces)
+    barrier = threading.Barrier(len(traces))
+
+    def play(i: int) -> None:
+        barrier.wait()
+        results[i] = replay_trace(traces[i], engines[i], speed)
+
+    threads = [threading.Thread(target=play, args=(i,), name='ghost-replay-%d' % i)
+               for i in range(len(traces))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Replay recorded engine traces and check their results')
+    parser.add_argument('traces', nargs='+')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='multiple of the recorded pace (default: full speed)')
+    parser.add_argument('--dict', help='compiled dictionary to check words with, '
+                                       'see ghost-compile-dict')
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    validator = MmapValidator(args.dict) if args.dict else None
+    traces = [Trace.load(path) for path in args.traces]
+    results = replay(traces, args.speed, validator)
+
+    print('%-30s %9s %12s %10s %10s' % ('trace', 'calls', 'calls/s', 'max lag', 'mismatches'))
+    for path, trace, r in zip(args.traces, traces, results):
+        print('%-30s %9d %12.0f %9.3fs %10d' % (path, r.calls, r.calls_per_second,
+                                                r.max_lag, len(r.mismatches)))
+        for i, recorded, replayed in r.mismatches[:5]:
+            print('  call %d %s: recorded %r, replayed %r' % (
+                i, trace.calls[i].method, recorded, replayed))
+
+    return 1 if any(r.mismatches for r in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,10 +14,18 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/pikulet/ghost",
     packages=setuptools.find_packages(),
+    entry_points={
+        'console_scripts': [
+            'ghost-compile-dict=ghost.dictionary:main',
+            'ghost-server=ghost.server:main',
+            'ghost-simulate=ghost.simulate:main',
+            'ghost-replay=ghost.trace:main',
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
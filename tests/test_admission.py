@@ -0,0 +1,136 @@
+import ghost
+from ghost.admission import AdmissionGate
+
+import unittest
+
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestAdmissionGate(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = ghost.EngineMetrics(self.clock)
+        self.ge = ghost.GhostEngine(validator=ghost.WordSetValidator(['egg', 'fry']),
+                                    clock=self.clock, metrics=self.metrics)
+        self.gate = AdmissionGate(self.ge, rate=1, burst=3, clock=self.clock)
+        self.ge.add_game(1, 'host')
+        for p in PLAYERS:
+            self.ge.register_player(1, p)
+
+    def start(self):
+        self.ge.start_game(1)
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+        return self.ge.get_player_order(1)
+
+    def test_follows_the_game(self):
+        self.assertEqual(self.gate.admit(1, 'set_clue', 'joyce'),
+                         AdmissionGate.INVALID_GAME_STATE)
+        self.assertEqual(self.gate.admit(2, 'set_clue', 'joyce'),
+                         AdmissionGate.GID_DOES_NOT_EXIST)
+
+        # refill the buckets spent above, whoever goes first
+        self.clock.now += 10
+        order = self.start()
+        self.assertEqual(self.gate.admit(1, 'set_clue', order[1]),
+                         AdmissionGate.PLAYER_NOT_IN_ORDER)
+        self.assertEqual(self.gate.admit(1, 'set_clue', 'host'),
+                         AdmissionGate.USER_NOT_IN_GAME)
+        self.assertEqual(self.gate.set_clue(1, order[0], 'clue'), (True, False))
+        self.assertEqual(self.gate.admit(1, 'set_clue', order[0]),
+                         AdmissionGate.CLUE_ALREADY_GIVEN)
+        for p in order[1:]:
+            self.clock.now += 1
+            self.assertEqual(self.gate.set_clue(1, p, 'clue'), (True, p == order[-1]))
+
+        self.assertEqual(self.gate.admit(1, 'set_vote', 'joyce', 'nobody'),
+                         AdmissionGate.USER_NOT_IN_GAME)
+        self.assertEqual(self.gate.admit(1, 'make_guess', 'joyce'),
+                         AdmissionGate.INVALID_GAME_STATE)
+
+        roles = self.ge.get_player_roles(1)
+        ghost_player = next(p for p in PLAYERS if roles[p] == ghost.Roles.GHOST)
+        self.clock.now += 10
+        for p in PLAYERS:
+            self.gate.set_vote(1, p, ghost_player)
+        self.assertEqual(self.ge.get_game_state(1), ghost.States.GUESS_ROUND)
+
+        other = next(p for p in PLAYERS if p != ghost_player)
+        self.assertEqual(self.gate.admit(1, 'make_guess', other),
+                         AdmissionGate.PLAYER_CANNOT_GUESS)
+        self.assertEqual(self.gate.make_guess(1, ghost_player, 'egg'), (True, True))
+
+        self.assertEqual(self.metrics.rejections.get(
+            'set_clue', AdmissionGate.PLAYER_NOT_IN_ORDER), 1)
+        self.assertEqual(self.metrics.rejections.get(
+            'make_guess', AdmissionGate.PLAYER_CANNOT_GUESS), 1)
+
+    def test_agrees_with_engine(self):
+        # every refusal matches the code the engine refuses with
+        refused = self.ge.events.subscribe_queue()
+        self.start()
+        for p in PLAYERS + ['host', 'nobody']:
+            code = self.gate.admit(1, 'set_clue', p)
+            self.clock.now += 1
+            is_success, _ = self.ge.set_clue(1, p, 'clue')
+            self.assertEqual(code == '', is_success)
+            if code:
+                self.assertEqual(refused.drain()[-1].code, code)
+
+    def test_new_game_under_old_gid(self):
+        order = self.start()
+        self.assertEqual(self.gate.admit(1, 'set_clue', order[0]), '')
+
+        self.ge.delete_game(1)
+        self.assertEqual(self.gate.admit(1, 'set_clue', order[0]),
+                         AdmissionGate.GID_DOES_NOT_EXIST)
+        self.ge.add_game(1, 'host')
+        self.assertEqual(self.gate.admit(1, 'set_clue', order[0]),
+                         AdmissionGate.INVALID_GAME_STATE)
+
+    def test_deleted_games_are_forgotten(self):
+        epochs = self.gate._AdmissionGate__epochs
+        turns = self.gate._AdmissionGate__turns
+        order = self.start()
+        self.gate.admit(1, 'set_clue', order[0])
+        self.assertIn(1, epochs)
+        self.assertIn(1, turns)
+
+        self.ge.delete_game(1)
+        self.assertNotIn(1, epochs)
+        self.assertNotIn(1, turns)
+
+        expiring = ghost.GhostEngine(idle_ttl=60, clock=self.clock)
+        gate = AdmissionGate(expiring, clock=self.clock)
+        expiring.add_game(2, 'host')
+        expiring.register_player(2, 'joyce')
+        gate.admit(2, 'set_clue', 'joyce')
+        self.clock.now += 120
+        self.assertEqual(expiring.expire_idle_games(), [2])
+        self.assertEqual(gate._AdmissionGate__epochs, {})
+        self.assertEqual(gate._AdmissionGate__turns, {})
+
+    def test_rate_limit(self):
+        order = self.start()
+        flooder = order[1]
+        codes = [self.gate.admit(1, 'set_clue', flooder) for _ in range(5)]
+        self.assertEqual(codes, [AdmissionGate.PLAYER_NOT_IN_ORDER] * 3 +
+                         [AdmissionGate.RATE_LIMITED] * 2)
+        self.assertEqual(self.gate.admit(1, 'set_clue', order[0]), '')
+
+        self.clock.now += 1
+        self.assertEqual(self.gate.admit(1, 'set_clue', flooder),
+                         AdmissionGate.PLAYER_NOT_IN_ORDER)
+        self.assertEqual(self.gate.admit(1, 'set_clue', flooder),
+                         AdmissionGate.RATE_LIMITED)
+
+if __name__ == '__main__':
+    unittest.main()
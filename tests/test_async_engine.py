@@ -0,0 +1,134 @@
+import ghost
+
+import asyncio
+import unittest
+
+PLAYERS = {gid: ['g%dp%d' % (gid, i) for i in range(8)] for gid in (1, 2)}
+
+class TestAsyncGhostEngine(unittest.TestCase):
+
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_commands_apply_in_order(self):
+        async def scenario():
+            age = ghost.AsyncGhostEngine()
+            await asyncio.gather(age.add_game(1, 'h1'), age.add_game(2, 'h2'))
+
+            # fire everything at once; each game must see its own order
+            await asyncio.gather(
+                *[age.register_player(gid, p) for i in range(8)
+                  for gid, p in [(1, PLAYERS[1][i]), (2, PLAYERS[2][i])]])
+            is_started = await asyncio.gather(age.start_game(1), age.start_game(2))
+
+            players = await asyncio.gather(age.get_existing_players(1),
+                                           age.get_existing_players(2))
+            states = await asyncio.gather(age.get_game_state(1),
+                                          age.get_game_state(2))
+            await age.close()
+            return is_started, players, states
+
+        is_started, players, states = self.run_async(scenario())
+        self.assertEqual(is_started, [True, True])
+        self.assertEqual(players, [tuple(PLAYERS[1]), tuple(PLAYERS[2])])
+        self.assertEqual(states, [ghost.States.SET_PARAMS] * 2)
+
+    def test_delete_game(self):
+        async def scenario():
+            age = ghost.AsyncGhostEngine()
+            await age.add_game(1, 'host')
+            is_deleted = await age.delete_game(1)
+            state = await age.get_game_state(1)
+            await age.close()
+            return is_deleted, state
+
+        is_deleted, state = self.run_async(scenario())
+        self.assertTrue(is_deleted)
+        self.assertEqual(state, ghost.States.REGISTER_PLAYERS)
+
+    def test_apply_batch(self):
+        async def scenario():
+            age = ghost.AsyncGhostEngine()
+            await age.add_game(1, 'host')
+            results = await age.apply_batch([(1, 'set_clue', 'a', 'clue'),
+                                             (2, 'set_vote', 'b', ''),
+                                             (1, 'make_guess', 'a', 'egg')])
+            await age.close()
+            return results
+
+        self.assertEqual(self.run_async(scenario()),
+                         [(False, False), (False, False, ''), (False, False)])
+
+    def test_apply_batch_checks_commands_first(self):
+        async def scenario():
+            age = ghost.AsyncGhostEngine()
+            await age.add_game(1, 'host')
+            with self.assertRaises(ValueError):
+                await age.apply_batch([(1, 'unregister_player', 'a', ''),
+                                       (2, 'delete_game', 'b', '')])
+            await age.add_game(2, 'host2')
+            applied = age.engine.events.subscribe_queue()
+            with self.assertRaises(ValueError):
+                await age.apply_batch([(2, 'set_clue', 'a', 'clue'),
+                                       (1, 'delete_game', 'b', '')])
+            await age.close()
+            return applied.drain()
+
+        self.assertEqual(self.run_async(scenario()), [])
+
+    def test_waits(self):
+        async def scenario():
+            age = ghost.AsyncGhostEngine(validator=ghost.WordSetValidator(['egg', 'fry']))
+            await age.add_game(1, 'host')
+            players = PLAYERS[1][:5]
+            for p in players:
+                await age.register_player(1, p)
+
+            vote_round = asyncio.ensure_future(
+                age.wait_for_state(1, ghost.States.VOTE_ROUND))
+            timed_out = await age.wait_for_state(1, ghost.States.GUESS_ROUND, 0.01)
+
+            await age.start_game(1)
+            await age.set_param_town_word('host', 'egg')
+            await age.set_param_fool_word('host', 'fry')
+            last = (await age.get_player_order(1))[-1]
+            last_turn = asyncio.ensure_future(age.wait_for_turn(1, last))
+            for p in (await age.get_player_order(1)):
+                self.assertFalse(last_turn.done())
+                await age.set_clue(1, p, 'clue')
+
+            deleted = asyncio.ensure_future(
+                age.wait_for_state(1, ghost.States.WINNER_TOWN))
+            await age.delete_game(1)
+            results = await asyncio.gather(vote_round, last_turn, deleted)
+            await age.close()
+            return timed_out, results
+
+        timed_out, results = self.run_async(scenario())
+        self.assertIsNone(timed_out)
+        self.assertEqual(results, [ghost.States.VOTE_ROUND, True, None])
+
+    def test_waits_see_commands_from_other_threads(self):
+        async def scenario():
+            age = ghost.AsyncGhostEngine()
+            await age.add_game(1, 'host')
+            for p in PLAYERS[1][:5]:
+                await age.register_player(1, p)
+
+            started = asyncio.ensure_future(
+                age.wait_for_state(1, ghost.States.SET_PARAMS, 5))
+            await asyncio.sleep(0)
+            await asyncio.get_running_loop().run_in_executor(
+                None, age.engine.start_game, 1)
+            state = await started
+            await age.close()
+            return state
+
+        self.assertEqual(self.run_async(scenario()), ghost.States.SET_PARAMS)
+
+if __name__ == '__main__':
+    unittest.main()
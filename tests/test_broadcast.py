@@ -0,0 +1,106 @@
+import ghost
+from ghost.broadcast import Broadcaster
+
+import json
+import threading
+import unittest
+
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+def decode(deltas):
+    return [json.loads(d) for d in deltas]
+
+class TestBroadcaster(unittest.TestCase):
+
+    def setUp(self):
+        self.ge = ghost.GhostEngine(validator=ghost.WordSetValidator(['egg', 'fry']))
+        self.ge.add_game(1, 'host')
+        self.ge.register_player(1, PLAYERS[0])
+        self.broadcaster = Broadcaster(self.ge, capacity=8)
+
+    def start(self):
+        for p in PLAYERS[1:]:
+            self.ge.register_player(1, p)
+        self.ge.start_game(1)
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+
+    def test_board_then_deltas(self):
+        subscription = self.broadcaster.subscribe(1)
+        board, = decode(subscription.drain())
+        self.assertEqual(board['type'], 'board')
+        self.assertEqual(board['players'], PLAYERS[:1])
+        self.assertEqual(board['seq'], 0)
+
+        self.start()
+        first = self.ge.get_next_in_player_order(1)
+        self.ge.set_clue(1, first, 'clue')
+        deltas = decode(subscription.drain())
+        self.assertEqual([d['seq'] for d in deltas], list(range(len(deltas))))
+        self.assertEqual([d['type'] for d in deltas],
+                         ['join'] * 4 + ['order', 'state', 'state', 'clue'])
+        self.assertEqual(deltas[-1], {'type': 'clue', 'player': first, 'clue': 'clue',
+                                      'seq': 7})
+
+    def test_encoded_once(self):
+        subscriptions = [self.broadcaster.subscribe(1) for _ in range(3)]
+        for s in subscriptions:
+            s.get()
+        self.ge.register_player(1, PLAYERS[1])
+        deltas = [s.get(0) for s in subscriptions]
+        self.assertIs(deltas[0], deltas[1])
+        self.assertIs(deltas[0], deltas[2])
+
+    def test_slow_subscriber_resyncs(self):
+        subscription = self.broadcaster.subscribe(1)
+        subscription.get()
+        self.start()
+        for p in self.ge.get_player_order(1):
+            self.ge.set_clue(1, p, 'clue')
+
+        board, = decode([subscription.get(0)])
+        self.assertEqual(board['type'], 'board')
+        self.assertEqual(board['state'], 'VOTE_ROUND')
+        self.assertEqual(len(board['clues']), len(PLAYERS))
+        self.assertGreater(subscription.dropped, 0)
+        self.assertEqual(subscription.get(0), None)
+        self.assertFalse(subscription.closed)
+
+    def test_slow_subscriber_disconnects(self):
+        broadcaster = Broadcaster(self.ge, capacity=2, policy=Broadcaster.DISCONNECT)
+        subscription = broadcaster.subscribe(1)
+        subscription.get()
+        self.start()
+
+        self.assertEqual(subscription.get(0), None)
+        self.assertTrue(subscription.closed)
+        self.assertEqual(broadcaster.get_num_subscribers(1), 0)
+
+        with self.assertRaises(ValueError):
+            Broadcaster(self.ge, policy='block')
+
+    def test_deleted_game_closes_stream(self):
+        subscription = self.broadcaster.subscribe(1)
+        subscription.get()
+        self.ge.delete_game(1)
+        self.assertEqual(json.loads(subscription.get(0))['type'], 'deleted')
+        self.assertEqual(subscription.get(), None)
+        self.assertTrue(subscription.closed)
+
+        # a new game under the gid starts a new stream
+        self.ge.add_game(1, 'host')
+        self.assertEqual(self.broadcaster.get_num_subscribers(1), 0)
+        self.assertEqual(self.broadcaster.subscribe(2), None)
+
+    def test_blocking_get(self):
+        subscription = self.broadcaster.subscribe(1)
+        subscription.get()
+        received = list()
+        reader = threading.Thread(target=lambda: received.append(subscription.get(5)))
+        reader.start()
+        self.ge.register_player(1, PLAYERS[1])
+        reader.join()
+        self.assertEqual(json.loads(received[0])['player'], PLAYERS[1])
+
+if __name__ == '__main__':
+    unittest.main()
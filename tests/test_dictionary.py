@@ -0,0 +1,81 @@
+import ghost
+
+import os
+import tempfile
+import unittest
+
+WORDS = ['egg', 'fry', 'ham', 'cake', 'Bread', 'apple', 'café', 'egg']
+
+class CountingValidator(ghost.WordValidator):
+
+    def __init__(self, cache_size):
+        super().__init__(cache_size)
+        self.lookups = 0
+
+    def _lookup(self, word):
+        self.lookups += 1
+        return word.isalpha()
+
+class TestWordValidator(unittest.TestCase):
+
+    def test_cache_hits_skip_backend(self):
+        v = CountingValidator(cache_size=2)
+        for _ in range(5):
+            self.assertTrue(v.check('egg'))
+        self.assertEqual(v.lookups, 1)
+
+    def test_cache_is_bounded_lru(self):
+        v = CountingValidator(cache_size=2)
+        v.check('egg')
+        v.check('fry')
+        v.check('egg')      # fry is now least recently used
+        v.check('ham')      # evicts fry
+        v.check('egg')
+        self.assertEqual(v.lookups, 3)
+        v.check('fry')
+        self.assertEqual(v.lookups, 4)
+
+    def test_word_set_validator(self):
+        v = ghost.WordSetValidator(['Egg', 'fry '])
+        self.assertTrue(v.check('egg'))
+        self.assertTrue(v.check('EGG'))
+        self.assertTrue(v.check('fry'))
+        self.assertFalse(v.check('zzz'))
+
+    def test_enchant_is_loaded_lazily(self):
+        v = ghost.EnchantValidator()
+        self.assertIsNone(v._EnchantValidator__dictionary)
+
+class TestMmapValidator(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.dict')
+        os.close(fd)
+        self.count = ghost.compile_word_list(WORDS, self.path)
+        self.validator = ghost.MmapValidator(self.path)
+
+    def tearDown(self):
+        self.validator.close()
+        os.remove(self.path)
+
+    def test_compile_dedupes(self):
+        self.assertEqual(self.count, len(set(w.lower() for w in WORDS)))
+
+    def test_lookup(self):
+        for w in WORDS:
+            self.assertTrue(self.validator.check(w))
+        for w in ['eg', 'eggs', 'frz', 'aaa', 'zzzzz', '', 'x' * 40]:
+            self.assertFalse(self.validator.check(w))
+
+    def test_words_of_length(self):
+        self.assertEqual(self.validator.words_of_length(3), ['egg', 'fry', 'ham'])
+        self.assertEqual(self.validator.words_of_length(99), [])
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a dictionary')
+        with self.assertRaises(ValueError):
+            ghost.MmapValidator(self.path).check('egg')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+import ghost
+
+import random
+import threading
+import unittest
+
+WORDS = ['egg', 'fry']
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+NUM_THREADS = 8
+GAMES_PER_THREAD = 250
+
+class TestShardedEngine(unittest.TestCase):
+
+    def test_no_default_game_cap(self):
+        ge = ghost.GhostEngine()
+        for gid in range(100):
+            self.assertTrue(ge.add_game(gid, 'host%d' % gid))
+
+    def test_max_games(self):
+        ge = ghost.GhostEngine(max_games=2)
+        self.assertTrue(ge.add_game(1, 'a'))
+        self.assertTrue(ge.add_game(2, 'b'))
+        self.assertFalse(ge.add_game(3, 'c'))
+
+        self.assertTrue(ge.delete_game(1))
+        self.assertTrue(ge.add_game(3, 'c'))
+
+    def test_delete_game(self):
+        ge = ghost.GhostEngine()
+        self.assertFalse(ge.delete_game(1))
+
+        ge.add_game(1, 'host')
+        self.assertTrue(ge.delete_game(1))
+        self.assertEqual(ge.get_gid_from_host('host'), -1)
+        self.assertTrue(ge.add_game(2, 'host'))
+
+    def test_host_cannot_host_twice(self):
+        ge = ghost.GhostEngine()
+        self.assertTrue(ge.add_game(1, 'host'))
+        self.assertFalse(ge.add_game(2, 'host'))
+        self.assertEqual(ge.get_gid_from_host('host'), 1)
+
+    def test_concurrent_add_and_delete(self):
+        ge = ghost.GhostEngine(num_shards=16)
+
+        def worker(offset):
+            for i in range(GAMES_PER_THREAD):
+                gid = offset * GAMES_PER_THREAD + i
+                host = 'host%d' % gid
+                self.assertTrue(ge.add_game(gid, host))
+                ge.register_player(gid, 'player%d' % gid)
+                self.assertEqual(ge.get_gid_from_host(host), gid)
+                if i % 2 == 0:
+                    self.assertTrue(ge.delete_game(gid))
+
+        threads = [threading.Thread(target=worker, args=(t,))
+                   for t in range(NUM_THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for gid in range(NUM_THREADS * GAMES_PER_THREAD):
+            expected = -1 if gid % GAMES_PER_THREAD % 2 == 0 else gid
+            self.assertEqual(ge.get_gid_from_host('host%d' % gid), expected)
+
+class TestPlayerIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        self.ge.add_game(1, 'host')
+        for p in PLAYERS:
+            self.ge.register_player(1, p)
+
+    def test_routes_by_player(self):
+        self.assertEqual(self.ge.get_gid_from_player('mf'), 1)
+        self.assertEqual(self.ge.get_gid_from_player('nobody'), -1)
+
+        self.ge.start_game(1)
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+        for _ in PLAYERS:
+            p = self.ge.get_next_in_player_order(1)
+            self.assertEqual(self.ge.set_clue_by_player(p, 'clue')[0], True)
+        self.assertEqual(self.ge.get_game_state(1), ghost.States.VOTE_ROUND)
+
+    def test_one_game_per_player(self):
+        self.ge.add_game(2, 'host2')
+        self.assertEqual(self.ge.register_player(2, 'mf'), (False, 0))
+        self.assertTrue(self.ge.unregister_player(1, 'mf'))
+        self.assertEqual(self.ge.register_player(2, 'mf'), (True, 1))
+        self.assertEqual(self.ge.get_gid_from_player('mf'), 2)
+
+    def test_unknown_game_claims_no_player(self):
+        rejected = self.ge.events.subscribe_queue()
+        self.assertEqual(self.ge.register_player(99, 'alice'), (False, 0))
+        self.assertEqual(self.ge.get_gid_from_player('alice'), -1)
+        self.assertFalse(self.ge.has_game(99))
+        self.assertEqual([e.code for e in rejected.drain()], ['ERR_GID_DOES_NOT_EXIST'])
+
+        self.ge.add_game(2, 'host2')
+        self.assertEqual(self.ge.register_player(2, 'alice'), (True, 1))
+
+    def test_killed_players_are_released(self):
+        self.ge.start_game(1)
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+        for _ in PLAYERS:
+            self.ge.set_clue(1, self.ge.get_next_in_player_order(1), 'clue')
+
+        roles = self.ge.get_player_roles(1)
+        target = next(p for p, r in roles.items() if r == ghost.Roles.TOWN)
+        for p in PLAYERS:
+            self.ge.set_vote_by_player(p, target)
+
+        self.assertEqual(self.ge.get_gid_from_player(target), -1)
+        alive = self.ge.get_existing_players(1)
+        self.assertEqual([self.ge.get_gid_from_player(p) for p in alive],
+                         [1] * len(alive))
+
+    def test_delete_game_releases_players(self):
+        self.ge.delete_game(1)
+        for p in PLAYERS:
+            self.assertEqual(self.ge.get_gid_from_player(p), -1)
+
+class TestWaits(unittest.TestCase):
+
+    def setUp(self):
+        self.ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        self.ge.add_game(1, 'host')
+        for p in PLAYERS:
+            self.ge.register_player(1, p)
+
+    def in_thread(self, target, *args):
+        results = list()
+        thread = threading.Thread(target=lambda: results.append(target(*args)))
+        thread.start()
+        return thread, results
+
+    def test_wait_for_state(self):
+        thread, results = self.in_thread(self.ge.wait_for_state, 1,
+                                         [ghost.States.VOTE_ROUND, ghost.States.GUESS_ROUND], 5)
+        self.ge.start_game(1)
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+        for p in self.ge.get_player_order(1):
+            self.ge.set_clue(1, p, 'clue')
+        thread.join()
+        self.assertEqual(results, [ghost.States.VOTE_ROUND])
+
+    def test_wait_times_out_or_ends_with_game(self):
+        self.assertIsNone(self.ge.wait_for_state(1, ghost.States.VOTE_ROUND, 0.01))
+        self.assertIsNone(self.ge.wait_for_state(2, ghost.States.VOTE_ROUND))
+
+        thread, results = self.in_thread(self.ge.wait_for_turn, 1, 'mf', 5)
+        self.ge.delete_game(1)
+        thread.join()
+        self.assertEqual(results, [False])
+
+    def test_wait_for_turn(self):
+        self.ge.start_game(1)
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+        order = self.ge.get_player_order(1)
+
+        thread, results = self.in_thread(self.ge.wait_for_turn, 1, order[2], 5)
+        for p in order[:2]:
+            self.assertEqual(results, [])
+            self.ge.set_clue(1, p, 'clue')
+        thread.join()
+        self.assertEqual(results, [True])
+        self.assertTrue(self.ge.wait_for_turn(1, order[2], 0))
+
+    def test_waits_ignore_other_games(self):
+        # one shard, so both games share a lock
+        self.ge = ghost.GhostEngine(num_shards=1, validator=ghost.WordSetValidator(WORDS))
+        for gid in (1, 2):
+            self.ge.add_game(gid, 'host%d' % gid)
+            for p in PLAYERS:
+                self.ge.register_player(gid, p + str(gid))
+            self.ge.start_game(gid)
+
+        thread, results = self.in_thread(self.ge.wait_for_state, 1,
+                                         ghost.States.CLUE_ROUND, 5)
+        self.ge.set_param_town_word('host2', 'egg')
+        self.ge.set_param_fool_word('host2', 'fry')
+        self.assertEqual(results, [])
+        self.ge.set_param_town_word('host1', 'egg')
+        self.ge.set_param_fool_word('host1', 'fry')
+        thread.join()
+        self.assertEqual(results, [ghost.States.CLUE_ROUND])
+
+class TestApplyBatch(unittest.TestCase):
+
+    def test_batch_matches_single_calls(self):
+        batch_engine = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        single_engine = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+
+        orders = dict()
+        for ge in (batch_engine, single_engine):
+            # both engines must deal the same roles
+            random.seed(0)
+            for gid in (1, 2):
+                host = 'host%d' % gid
+                ge.add_game(gid, host)
+                for p in PLAYERS:
+                    ge.register_player(gid, '%s%d' % (p, gid))
+                ge.start_game(gid)
+                ge.set_param_town_word(host, 'egg')
+                ge.set_param_fool_word(host, 'fry')
+                orders[gid] = ge.get_player_order(gid)
+
+            # interleave both games, including out-of-turn clues
+            commands = list()
+            for i in range(len(PLAYERS)):
+                for gid in (1, 2):
+                    commands.append((gid, 'set_clue', orders[gid][-1], 'early'))
+                    commands.append((gid, 'set_clue', orders[gid][i], 'clue'))
+            for gid in (1, 2):
+                for p in orders[gid]:
+                    commands.append((gid, 'set_vote', p, orders[gid][0]))
+            commands.append((3, 'make_guess', 'nobody', 'egg'))
+
+            if ge is batch_engine:
+                batch_results = ge.apply_batch(commands)
+            else:
+                single_results = [getattr(ge, c)(gid, p, arg)
+                                  for gid, c, p, arg in commands]
+
+        self.assertEqual(len(batch_results), len(commands))
+        self.assertEqual([r[0] for r in batch_results],
+                         [r[0] for r in single_results])
+        self.assertEqual(batch_engine.get_game_state(1),
+                         single_engine.get_game_state(1))
+
+    def test_unknown_command(self):
+        ge = ghost.GhostEngine()
+        with self.assertRaises(ValueError):
+            ge.apply_batch([(1, 'start_game', 'a', '')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import ghost
+from ghost import events
+
+import unittest
+
+WORDS = ['egg', 'fry']
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+def start_game(ge, gid, host):
+    ge.add_game(gid, host)
+    for p in PLAYERS:
+        ge.register_player(gid, p)
+    ge.start_game(gid)
+    ge.set_param_town_word(host, 'egg')
+    ge.set_param_fool_word(host, 'fry')
+
+class TestEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        self.received = list()
+        self.ge.events.subscribe(self.received.append)
+
+    def of_type(self, event_type):
+        return [e for e in self.received if isinstance(e, event_type)]
+
+    def test_game_events(self):
+        start_game(self.ge, 7, 'host')
+        self.assertEqual([e.username for e in self.of_type(events.PlayerRegistered)],
+                         PLAYERS)
+        allocated, = self.of_type(events.RolesAllocated)
+        self.assertEqual(allocated.roles, self.ge.get_player_roles(7))
+        self.assertEqual(allocated.order, self.ge.get_player_order(7))
+
+        for _ in PLAYERS:
+            self.ge.set_clue(7, self.ge.get_next_in_player_order(7), 'clue')
+        self.assertEqual(len(self.of_type(events.ClueSet)), len(PLAYERS))
+
+        target = next(p for p, r in allocated.roles.items() if r == ghost.Roles.GHOST)
+        for p in PLAYERS:
+            self.ge.set_vote(7, p, target)
+        self.assertEqual(len(self.of_type(events.VoteCast)), len(PLAYERS))
+        self.assertEqual(self.of_type(events.Lynched),
+                         [events.Lynched(7, target, ghost.Roles.GHOST)])
+
+        self.ge.make_guess(7, target, 'egg')
+        self.assertEqual(self.of_type(events.GuessMade),
+                         [events.GuessMade(7, target, 'egg', True)])
+        self.assertEqual(self.of_type(events.Winner),
+                         [events.Winner(7, ghost.States.WINNER_GHOST)])
+
+        states = [(e.old, e.new) for e in self.of_type(events.StateChanged)]
+        self.assertEqual(states, [
+            (ghost.States.REGISTER_PLAYERS, ghost.States.SET_PARAMS),
+            (ghost.States.SET_PARAMS, ghost.States.CLUE_ROUND),
+            (ghost.States.CLUE_ROUND, ghost.States.VOTE_ROUND),
+            (ghost.States.VOTE_ROUND, ghost.States.GUESS_ROUND),
+            (ghost.States.GUESS_ROUND, ghost.States.WINNER_GHOST)])
+        self.assertTrue(all(e.gid == 7 for e in self.received))
+
+    def test_rejected_reason_code(self):
+        start_game(self.ge, 7, 'host')
+        expected = self.ge.get_next_in_player_order(7)
+        other = next(p for p in PLAYERS if p != expected)
+        self.ge.set_clue(7, other, 'spam')
+        self.ge.register_player(7, 'host')
+
+        clue, register = self.of_type(events.Rejected)[-2:]
+        self.assertEqual((clue.command, clue.code),
+                         ('set_clue', 'ERR_PLAYER_NOT_IN_ORDER'))
+        self.assertEqual(clue.message, ghost.Ghost.ERR_PLAYER_NOT_IN_ORDER % expected)
+        self.assertEqual(register.code, 'ERR_USER_IS_HOST')
+
+    def test_bounded_queue_drops(self):
+        q = self.ge.events.subscribe_queue(maxsize=2)
+        self.ge.add_game(1, 'host')
+        for p in PLAYERS:
+            self.ge.register_player(1, p)
+
+        self.assertEqual(len(q.drain()), 2)
+        self.assertEqual(q.dropped, len(PLAYERS) - 2)
+
+    def test_unsubscribe(self):
+        self.ge.events.unsubscribe(self.received.append)
+        self.assertFalse(self.ge.events)
+        self.ge.add_game(1, 'host')
+        self.ge.register_player(1, 'joyce')
+        self.assertEqual(self.received, [])
+
+if __name__ == '__main__':
+    unittest.main()
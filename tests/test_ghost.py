@@ -1,5 +1,10 @@
 import ghost
 
+import itertools
+import json
+import pickle
+import random
+import struct
 import sys
 import unittest
 import logging
@@ -7,6 +12,11 @@ import logging
 VALID_PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
 VALID_TW = 'egg'
 VALID_FW = 'fry'
+WORDS = ['egg', 'fry', 'ham', 'jam', 'cake']
+
+_GAME_HEADER_V1 = struct.Struct('<BBHHhHh')
+_GAME_HEADER_V2 = struct.Struct('<BBHHhHhQ')
+_GAME_HEADER_V3 = struct.Struct('<BBHHiHiQ')
 
 logger = logging.getLogger()
 logger.level = logging.DEBUG
@@ -75,5 +85,466 @@ class TestValidGame(unittest.TestCase):
 
         logger.removeHandler(stream_handler)
 
+class TestWordSetGame(unittest.TestCase):
+
+    def test_words_checked_by_validator(self):
+        ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        gid = 1
+        host = 'host'
+
+        ge.add_game(gid, host)
+        for p in VALID_PLAYERS:
+            ge.register_player(gid, p)
+        ge.start_game(gid)
+
+        self.assertFalse(ge.set_param_town_word(host, 'zzz'))
+        self.assertTrue(ge.set_param_town_word(host, VALID_TW))
+        self.assertFalse(ge.set_param_fool_word(host, 'qqq'))
+        self.assertTrue(ge.set_param_fool_word(host, VALID_FW))
+        self.assertEqual(ge.get_game_state(gid), ghost.States.CLUE_ROUND)
+
+def play_to_vote_round_with(game, players, town_word, fool_word, clue):
+    for p in players:
+        game.register_player(p)
+    game.start_game()
+    game.set_param_town_word(town_word)
+    game.set_param_fool_word(fool_word)
+    for _ in players:
+        game.set_clue(game.get_next_in_player_order(), clue)
+
+def play_to_vote_round(game, players):
+    play_to_vote_round_with(game, players, VALID_TW, VALID_FW, 'clue')
+
+def town_players(game):
+    return [p for p, r in game.get_player_roles().items()
+            if r != ghost.Roles.GHOST]
+
+class TestVoting(unittest.TestCase):
+
+    def test_changed_vote_moves_count(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS))
+        play_to_vote_round(game, VALID_PLAYERS)
+        target, other = town_players(game)[:2]
+
+        # everyone votes for target, then two change to other
+        for p in VALID_PLAYERS[:-1]:
+            self.assertEqual(game.set_vote(p, target), (True, False, ''))
+        game.set_vote(VALID_PLAYERS[0], other)
+        game.set_vote(VALID_PLAYERS[1], other)
+
+        is_success, is_complete, lynched = game.set_vote(VALID_PLAYERS[-1], target)
+        self.assertTrue(is_success and is_complete)
+        self.assertEqual(lynched, target)
+
+    def test_tie_is_no_lynch(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS))
+        players = VALID_PLAYERS[:4]
+        play_to_vote_round(game, players)
+        a, b = players[:2]
+        for p, v in zip(players, [a, b, a, b]):
+            result = game.set_vote(p, v)
+        self.assertEqual(result, (True, True, ''))
+        self.assertEqual(game.get_game_state(), ghost.States.CLUE_ROUND)
+
+    def test_waits_for_everyone_by_default(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS))
+        play_to_vote_round(game, VALID_PLAYERS)
+        target = town_players(game)[0]
+        for p in VALID_PLAYERS[:4]:
+            self.assertEqual(game.set_vote(p, target), (True, False, ''))
+
+    def test_early_lynch_on_decided_majority(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS), early_lynch=True)
+        play_to_vote_round(game, VALID_PLAYERS)
+        target = town_players(game)[0]
+
+        # two abstentions out of five would still call off the lynch,
+        # so only the fourth vote decides it
+        for p in VALID_PLAYERS[:3]:
+            self.assertEqual(game.set_vote(p, target), (True, False, ''))
+        self.assertEqual(game.set_vote(VALID_PLAYERS[3], target), (True, True, target))
+        self.assertNotIn(target, game.get_existing_players())
+
+    def test_early_no_lynch(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS), early_lynch=True)
+        play_to_vote_round(game, VALID_PLAYERS)
+        self.assertEqual(game.set_vote(VALID_PLAYERS[0], ''), (True, False, ''))
+        self.assertEqual(game.set_vote(VALID_PLAYERS[1], ''), (True, True, ''))
+        self.assertEqual(game.get_game_state(), ghost.States.CLUE_ROUND)
+
+    def test_early_no_lynch_when_no_one_can_lead(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS), early_lynch=True)
+        players = ['p%d' % i for i in range(9)]
+        play_to_vote_round(game, players)
+
+        # three abstentions, one short of calling off the lynch, and one
+        # vote each for four players. The last two votes can at best tie
+        # a player with the abstentions, or call off the lynch.
+        votes = ['', '', '', players[0], players[1], players[2]]
+        for p, v in zip(players, votes):
+            self.assertEqual(game.set_vote(p, v), (True, False, ''))
+        self.assertEqual(game.set_vote(players[6], players[3]), (True, True, ''))
+        self.assertEqual(game.get_game_state(), ghost.States.CLUE_ROUND)
+
+    def test_early_lynch_matches_brute_force(self):
+        # rounds end early exactly when every way the last votes can go
+        # gives the same outcome
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        rng = random.Random(5)
+        for _ in range(60):
+            players = ['p%d' % i for i in range(rng.randint(3, 9))]
+            seed = rng.random()
+            early = ghost.Ghost(ghost.WordSetValidator(WORDS), early_lynch=True, seed=seed)
+            full = ghost.Ghost(ghost.WordSetValidator(WORDS), seed=seed)
+            play_to_vote_round(early, players)
+            play_to_vote_round(full, players)
+
+            targets = players[:rng.randint(1, len(players))] + [''] * rng.randint(0, 3)
+            pending = list(players)
+            rng.shuffle(pending)
+            while len(pending) > 1:
+                p = pending.pop()
+                v = rng.choice(targets)
+                full.set_vote(p, v)
+                _, is_complete, lynched = early.set_vote(p, v)
+                if len(pending) > 3:
+                    if is_complete:
+                        break
+                    continue
+
+                outcomes = set()
+                for votes in itertools.product(players + [''], repeat=len(pending)):
+                    fork = full.fork()
+                    for q, vote in zip(pending, votes):
+                        result = fork.set_vote(q, vote)
+                    outcomes.add(result[2])
+                self.assertEqual(is_complete, len(outcomes) == 1)
+                if is_complete:
+                    self.assertEqual(outcomes, {lynched})
+                    break
+
+class TestLargeGames(unittest.TestCase):
+
+    def test_cap_defaults_to_max_num_players(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS))
+        for i in range(ghost.Ghost.MAX_NUM_PLAYERS):
+            self.assertTrue(game.register_player('p%d' % i)[0])
+        self.assertFalse(game.register_player('extra')[0])
+
+        with self.assertRaises(ValueError):
+            ghost.Ghost(ghost.WordSetValidator(WORDS), max_players=ghost.Ghost.PLAYER_LIMIT + 1)
+
+    def test_role_sets(self):
+        self.assertEqual(ghost.Ghost.get_role_set(10),
+                         {ghost.Roles.TOWN: 4, ghost.Roles.GHOST: 3, ghost.Roles.FOOL: 3})
+        self.assertEqual(ghost.Ghost.get_role_set(200),
+                         {ghost.Roles.TOWN: 80, ghost.Roles.GHOST: 60, ghost.Roles.FOOL: 60})
+
+    def test_large_game_plays_to_the_end(self):
+        players = ['p%d' % i for i in range(200)]
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS), max_players=200)
+        play_to_vote_round(game, players)
+        self.assertEqual(list(game.get_player_roles().values()).count(ghost.Roles.GHOST), 60)
+
+        old_clues = game.get_all_clues()
+        while game.get_game_state() not in (ghost.States.WINNER_TOWN, ghost.States.WINNER_GHOST):
+            state = game.get_game_state()
+            if state == ghost.States.CLUE_ROUND:
+                game.set_clue(game.get_next_in_player_order(), 'again')
+            elif state == ghost.States.VOTE_ROUND:
+                roles = game.get_player_roles()
+                living = game.get_existing_players()
+                target = next(p for p in living if roles[p] == ghost.Roles.GHOST)
+                for p in living:
+                    game.set_vote(p, target)
+            else:
+                game.make_guess(game.get_view().last_lynched, VALID_FW)
+
+        self.assertEqual(game.get_game_state(), ghost.States.WINNER_TOWN)
+        self.assertTrue(all(clue == 'clue' for clue in old_clues.values()))
+
+    def test_early_lynch_with_changed_votes(self):
+        players = ['p%d' % i for i in range(50)]
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS), early_lynch=True, max_players=50)
+        play_to_vote_round(game, players)
+        a, b = town_players(game)[:2]
+
+        # 24 votes each, then one changes sides: still undecided with two left
+        for p, v in zip(players[:48], [a, b] * 24):
+            self.assertEqual(game.set_vote(p, v), (True, False, ''))
+        self.assertEqual(game.set_vote(players[1], a), (True, False, ''))
+        self.assertEqual(game.set_vote(players[1], b), (True, False, ''))
+        self.assertEqual(game.set_vote(players[48], a), (True, False, ''))
+        self.assertEqual(game.set_vote(players[49], a), (True, True, a))
+
+class TestFork(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = ghost.events.EventBus()
+        self.events = self.bus.subscribe_queue()
+        self.game = ghost.Ghost(ghost.WordSetValidator(WORDS), bus=self.bus)
+        play_to_vote_round(self.game, VALID_PLAYERS)
+        self.events.drain()
+
+    def test_fork_leaves_game_alone(self):
+        before = self.game.to_dict()
+        view = self.game.get_view()
+        target = town_players(self.game)[0]
+
+        fork = self.game.fork()
+        self.assertIs(fork.get_view(), view)
+        for p in VALID_PLAYERS:
+            fork.set_vote(p, target)
+        self.assertNotIn(target, fork.get_existing_players())
+        self.assertEqual(self.game.to_dict(), before)
+        self.assertIs(self.game.get_view(), view)
+        self.assertEqual(self.events.drain(), [])
+
+        # the game plays on without touching the fork
+        voted = fork.to_dict()
+        self.assertEqual(self.game.set_vote(VALID_PLAYERS[0], ''), (True, False, ''))
+        self.assertEqual(fork.to_dict(), voted)
+        self.assertTrue(self.events.drain())
+
+    def test_forks_of_forks(self):
+        fork = self.game.fork()
+        fork.set_vote(VALID_PLAYERS[0], VALID_PLAYERS[1])
+        branches = [fork.fork() for _ in VALID_PLAYERS]
+        for branch, target in zip(branches, VALID_PLAYERS):
+            branch.set_vote(VALID_PLAYERS[2], target)
+
+        self.assertEqual(fork.get_player(VALID_PLAYERS[2]).vote, None)
+        self.assertEqual([b.get_player(VALID_PLAYERS[2]).vote for b in branches],
+                         VALID_PLAYERS)
+        self.assertEqual(self.game.get_player(VALID_PLAYERS[0]).vote, None)
+
+class TestRoleCensus(unittest.TestCase):
+
+    def test_census_tracks_kills(self):
+        ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        gid = 1
+        self.assertEqual(ge.get_role_census(gid), {})
+
+        create_game(ge, gid, 'host', VALID_PLAYERS, VALID_TW, VALID_FW)
+        census = ge.get_role_census(gid)
+        self.assertEqual(census, {ghost.Roles.TOWN: 3, ghost.Roles.GHOST: 1,
+                                  ghost.Roles.FOOL: 1})
+
+        for _ in VALID_PLAYERS:
+            ge.set_clue(gid, ge.get_next_in_player_order(gid), 'clue')
+
+        roles = ge.get_player_roles(gid)
+        target = next(p for p, r in roles.items() if r == ghost.Roles.TOWN)
+        for p in VALID_PLAYERS:
+            ge.set_vote(gid, p, target)
+
+        census[ghost.Roles.TOWN] -= 1
+        self.assertEqual(ge.get_role_census(gid), census)
+
+class TestCompactLayout(unittest.TestCase):
+
+    def test_byte_budget(self):
+        town_word, fool_word = 'a' * 15, 'b' * 15
+        game = ghost.Ghost(ghost.WordSetValidator([town_word, fool_word]))
+        players = ['user%011d' % i for i in range(ghost.Ghost.MAX_NUM_PLAYERS)]
+        play_to_vote_round_with(game, players, town_word, fool_word, 'c' * 15)
+        for p in players:
+            game.set_vote(p, '')
+        game.get_view()
+
+        self.assertLessEqual(game.get_memory_footprint(),
+                             ghost.Ghost.BYTE_BUDGET_PER_GAME)
+
+    def test_player_snapshot(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS))
+        play_to_vote_round(game, VALID_PLAYERS)
+        game.set_vote(VALID_PLAYERS[0], VALID_PLAYERS[1])
+
+        player = game.get_player(VALID_PLAYERS[0])
+        self.assertEqual(player.clue, 'clue')
+        self.assertEqual(player.vote, VALID_PLAYERS[1])
+        self.assertEqual(player.role, game.get_player_roles()[VALID_PLAYERS[0]])
+        self.assertIsNone(game.get_player('nobody'))
+
+    def test_killed_player_leaves_order(self):
+        game = ghost.Ghost(ghost.WordSetValidator(WORDS))
+        play_to_vote_round(game, VALID_PLAYERS)
+        target = town_players(game)[0]
+        for p in VALID_PLAYERS:
+            game.set_vote(p, target)
+        self.assertNotIn(target, game.get_player_order())
+
+        # call off the next lynch, then every survivor gives a clue in turn
+        alive = game.get_existing_players()
+        for p in alive:
+            game.set_vote(p, '')
+        self.assertEqual(game.get_game_state(), ghost.States.CLUE_ROUND)
+        for _ in alive:
+            self.assertTrue(game.set_clue(game.get_next_in_player_order(), 'x')[0])
+        self.assertEqual(game.get_game_state(), ghost.States.VOTE_ROUND)
+
+def game_view(game):
+    return (game.get_game_state(), game.get_words(), game.get_player_order(),
+            game.get_player_roles(), game.get_all_clues(),
+            game.get_role_census(), game.get_next_in_player_order())
+
+class TestSerialization(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = ghost.WordSetValidator(WORDS)
+        self.game = ghost.Ghost(self.validator)
+        play_to_vote_round(self.game, VALID_PLAYERS)
+        self.game.set_vote(VALID_PLAYERS[0], VALID_PLAYERS[1])
+
+    def test_bytes_round_trip(self):
+        copy = ghost.Ghost.from_bytes(self.game.to_bytes(), self.validator)
+        self.assertEqual(game_view(copy), game_view(self.game))
+        self.assertEqual(copy.get_player(VALID_PLAYERS[0]).vote, VALID_PLAYERS[1])
+        self.assertEqual(copy.to_bytes(), self.game.to_bytes())
+
+        # both copies resolve the vote the same way
+        for p in VALID_PLAYERS[1:]:
+            self.assertEqual(copy.set_vote(p, VALID_PLAYERS[1]),
+                             self.game.set_vote(p, VALID_PLAYERS[1]))
+        self.assertEqual(game_view(copy), game_view(self.game))
+
+    def test_unicode_texts(self):
+        game = ghost.Ghost(self.validator)
+        play_to_vote_round_with(game, ['zoë', 'joyce', 'mf'], VALID_TW, VALID_FW, 'café')
+        copy = ghost.Ghost.from_bytes(game.to_bytes(), self.validator)
+        self.assertEqual(game_view(copy), game_view(game))
+
+    def test_dict_round_trip(self):
+        copy = ghost.Ghost.from_dict(self.game.to_dict(), self.validator)
+        self.assertEqual(copy.to_bytes(), self.game.to_bytes())
+
+    def test_bytes_round_trip_at_player_limit(self):
+        # a couple of hundred thousand commands, too many to log
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        limit = ghost.Ghost.PLAYER_LIMIT
+        players = ['p%d' % i for i in range(limit)]
+        game = ghost.Ghost(self.validator, max_players=limit, seed=0)
+        for p in players:
+            game.register_player(p)
+        game.start_game()
+        game.set_param_town_word(VALID_TW)
+        game.set_param_fool_word(VALID_FW)
+
+        def assert_round_trip():
+            copy = ghost.Ghost.from_bytes(game.to_bytes(), self.validator, max_players=limit)
+            self.assertEqual(copy.to_bytes(), game.to_bytes())
+            self.assertEqual(copy.get_view()[1:], game.get_view()[1:])
+
+        # order index past 32767
+        for _ in range(33000):
+            game.set_clue(game.get_next_in_player_order(), 'clue')
+        assert_round_trip()
+
+        # last lynched id past 32767
+        while game.get_next_in_player_order():
+            game.set_clue(game.get_next_in_player_order(), 'clue')
+        for p in players:
+            game.set_vote(p, players[-1])
+        self.assertEqual(game.get_view().last_lynched, players[-1])
+        assert_round_trip()
+
+    def test_reads_version_2_bytes(self):
+        data = self.game.to_bytes()
+        fields = list(_GAME_HEADER_V3.unpack_from(data))
+        fields[0] = 2
+        old = _GAME_HEADER_V2.pack(*fields) + data[_GAME_HEADER_V3.size:]
+        copy = ghost.Ghost.from_bytes(old, self.validator)
+        self.assertEqual(copy.to_bytes(), data)
+
+    def test_reads_version_1_bytes(self):
+        data = self.game.to_bytes()
+        fields = list(_GAME_HEADER_V3.unpack_from(data))
+        fields[0] = 1
+        old = _GAME_HEADER_V1.pack(*fields[:-1]) + data[_GAME_HEADER_V3.size:]
+        copy = ghost.Ghost.from_bytes(old, self.validator)
+        self.assertEqual(copy.get_version(), 0)
+        self.assertEqual(copy.to_dict(), dict(self.game.to_dict(), version=0))
+
+    def test_bad_bytes(self):
+        data = self.game.to_bytes()
+        for bad in (b'', b'\x7f' + data[1:], data[:-1]):
+            with self.assertRaises(ValueError):
+                ghost.Ghost.from_bytes(bad)
+
+    def test_corrupt_bytes_raise_value_error(self):
+        data = self.game.to_bytes()
+        for i in range(len(data)):
+            for value in (0x02, 0x7f, 0xfe, 0xff):
+                bad = bytearray(data)
+                bad[i] = value
+                try:
+                    ghost.Ghost.from_bytes(bytes(bad), self.validator).get_view()
+                except ValueError:
+                    pass
+
+    def test_engine_dump_and_load(self):
+        ge = ghost.GhostEngine(validator=self.validator)
+        for gid in (1, 2):
+            create_game(ge, gid, 'host%d' % gid,
+                        ['%s%d' % (p, gid) for p in VALID_PLAYERS], VALID_TW, VALID_FW)
+
+        other = ghost.GhostEngine(validator=self.validator)
+        self.assertEqual(other.load_games(ge.dump_games([1, 3])), 1)
+        self.assertEqual(other.get_gid_from_host('host1'), 1)
+        self.assertEqual(other.get_gid_from_player(VALID_PLAYERS[0] + '1'), 1)
+        self.assertFalse(other.has_game(2))
+        self.assertEqual(other.load_games(ge.dump_games()), 1)
+        self.assertEqual(other.get_player_order(2), ge.get_player_order(2))
+
+class TestViews(unittest.TestCase):
+
+    def setUp(self):
+        self.game = ghost.Ghost(ghost.WordSetValidator(WORDS))
+        play_to_vote_round(self.game, VALID_PLAYERS)
+
+    def test_view_shared_until_change(self):
+        view = self.game.get_view()
+        self.assertIs(self.game.get_view(), view)
+        clues = self.game.get_all_clues()
+        self.assertIs(self.game.get_all_clues(), clues)
+        self.assertEqual(clues, dict(view.clues))
+        self.assertEqual(json.loads(json.dumps(clues)), clues)
+        self.assertEqual(view.order, self.game.get_player_order())
+
+        # rejected commands keep the version
+        self.game.set_vote('nobody', VALID_PLAYERS[0])
+        self.assertIs(self.game.get_view(), view)
+
+        self.game.set_vote(VALID_PLAYERS[0], VALID_PLAYERS[1])
+        self.assertEqual(self.game.get_version(), view.version + 1)
+        self.assertIsNot(self.game.get_view(), view)
+
+    def test_views_are_read_only(self):
+        view = self.game.get_view()
+        with self.assertRaises(TypeError):
+            view.clues[VALID_PLAYERS[0]] = 'changed'
+        with self.assertRaises(TypeError):
+            view.roles.clear()
+        self.assertEqual(pickle.loads(pickle.dumps(view)), view)
+
+    def test_version_survives_serialization(self):
+        version = self.game.get_version()
+        self.assertEqual(ghost.Ghost.from_bytes(self.game.to_bytes()).get_version(), version)
+        self.assertEqual(ghost.Ghost.from_dict(self.game.to_dict()).get_version(), version)
+
+    def test_get_if_changed(self):
+        ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        ge.add_game(1, 'host')
+        version, view = ge.get_if_changed(1, -1)
+        self.assertEqual(view.state, ghost.States.REGISTER_PLAYERS)
+        self.assertEqual(ge.get_if_changed(1, version), (version, None))
+
+        ge.register_player(1, 'joyce')
+        version, view = ge.get_if_changed(1, version)
+        self.assertEqual(view.players, ('joyce',))
+        self.assertEqual(ge.get_if_changed(2, version), (-1, None))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+import ghost
+
+import os
+import tempfile
+import time
+import unittest
+
+WORDS = ['egg', 'fry']
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+def play_until_vote(ge, gid):
+    host = 'host%d' % gid
+    ge.add_game(gid, host)
+    for p in PLAYERS:
+        ge.register_player(gid, '%s%d' % (p, gid))
+    ge.start_game(gid)
+    ge.set_param_town_word(host, 'egg')
+    ge.set_param_fool_word(host, 'fry')
+    for _ in PLAYERS:
+        ge.set_clue(gid, ge.get_next_in_player_order(gid), 'clue')
+
+def dump(ge, gid):
+    return (ge.get_game_state(gid), ge.get_player_order(gid),
+            ge.get_player_roles(gid), ge.get_all_clues(gid), ge.get_words(gid))
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.validator = ghost.WordSetValidator(WORDS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open_engine(self, **kwargs):
+        journal = ghost.Journal(self.tmp.name, **kwargs)
+        return ghost.GhostEngine.recover(journal, validator=self.validator)
+
+    def test_recover_from_log(self):
+        ge = self.open_engine()
+        for gid in range(3):
+            play_until_vote(ge, gid)
+        order = ge.get_player_order(1)
+        ge.set_vote(1, order[0], order[1])
+        ge.delete_game(2)
+        expected = [dump(ge, gid) for gid in range(2)]
+        ge.close()
+
+        recovered = self.open_engine()
+        self.assertEqual([dump(recovered, gid) for gid in range(2)], expected)
+        self.assertFalse(recovered.has_game(2))
+        self.assertEqual(recovered.get_gid_from_player(order[2]), 1)
+
+        # the vote already cast still counts
+        results = [recovered.set_vote(1, p, order[1]) for p in order[1:]]
+        self.assertEqual(results[-1], (True, True, order[1]))
+        recovered.close()
+
+    def test_recover_from_snapshot_and_tail(self):
+        ge = self.open_engine()
+        play_until_vote(ge, 1)
+        self.assertEqual(ge.snapshot(), 1)
+        play_until_vote(ge, 2)
+        expected = [dump(ge, gid) for gid in (1, 2)]
+        ge.close()
+
+        segments = [n for n in os.listdir(self.tmp.name) if n.startswith('log.')]
+        self.assertEqual(len(segments), 1)
+
+        recovered = self.open_engine()
+        self.assertEqual([dump(recovered, gid) for gid in (1, 2)], expected)
+        recovered.close()
+
+    def test_game_deleted_during_snapshot(self):
+        for settings in ({}, {'idle_ttl': 60}, {'max_games': 2}):
+            with tempfile.TemporaryDirectory() as directory:
+                journal = ghost.Journal(directory)
+                ge = ghost.GhostEngine.recover(journal, validator=self.validator,
+                                               **settings)
+                ge.add_game(1, 'host')
+                for p in PLAYERS:
+                    ge.register_player(1, p)
+                play_until_vote(ge, 2)
+
+                # the game starts and is deleted once the snapshot began,
+                # before the snapshot reaches it
+                begin_snapshot = journal.begin_snapshot
+                def begin():
+                    seq = begin_snapshot()
+                    ge.start_game(1)
+                    ge.delete_game(1)
+                    return seq
+                journal.begin_snapshot = begin
+                ge.snapshot()
+                expected = dump(ge, 2)
+                ge.close()
+
+                recovered = ghost.GhostEngine.recover(
+                    ghost.Journal(directory), validator=self.validator, **settings)
+                self.assertFalse(recovered.has_game(1))
+                self.assertEqual(dump(recovered, 2), expected)
+                self.assertTrue(recovered.add_game(1, 'host'))
+                recovered.close()
+
+    def test_snapshot_every(self):
+        ge = self.open_engine(flush_interval=0.01, snapshot_every=10)
+        play_until_vote(ge, 1)
+        snapshot = os.path.join(self.tmp.name, 'snapshot.json')
+        deadline = time.time() + 5
+        while not os.path.exists(snapshot) and time.time() < deadline:
+            time.sleep(0.01)
+        ge.close()
+        self.assertTrue(os.path.exists(snapshot))
+
+    def test_torn_record_is_skipped(self):
+        ge = self.open_engine()
+        ge.add_game(1, 'host')
+        ge.close()
+
+        segment = [n for n in os.listdir(self.tmp.name) if n.startswith('log.')][0]
+        with open(os.path.join(self.tmp.name, segment), 'a') as f:
+            f.write('[[2,1,"regis')
+
+        recovered = self.open_engine()
+        self.assertTrue(recovered.has_game(1))
+        recovered.close()
+
+    def test_no_journal(self):
+        with self.assertRaises(ValueError):
+            ghost.GhostEngine().snapshot()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import ghost
+from ghost.metrics import Counter, EngineMetrics, Histogram, Registry
+
+import subprocess
+import sys
+import unittest
+import urllib.request
+
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = self.registry.register(
+            Counter('requests_total', 'Requests', ('path',)))
+        self.histogram = self.registry.register(
+            Histogram('latency_seconds', 'Latency', buckets=(0.1, 1)))
+
+    def test_snapshot(self):
+        self.counter.inc('/a')
+        self.counter.inc('/a', amount=2)
+        self.histogram.observe(value=0.05)
+        self.histogram.observe(value=0.5)
+        self.histogram.observe(value=5)
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['requests_total'], [({'path': '/a'}, 3)])
+        self.assertEqual(snapshot['latency_seconds'], [({}, {
+            'buckets': {0.1: 1, 1: 2, float('inf'): 3}, 'sum': 5.55, 'count': 3})])
+
+    def test_prometheus_text(self):
+        self.counter.inc('say "hi"\n')
+        self.histogram.observe(value=0.5)
+        self.assertEqual(self.registry.to_prometheus(), '\n'.join([
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{path="say \\"hi\\"\\n"} 1',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 0',
+            'latency_seconds_bucket{le="1"} 1',
+            'latency_seconds_bucket{le="+Inf"} 1',
+            'latency_seconds_sum 0.5',
+            'latency_seconds_count 1',
+        ]) + '\n')
+
+    def test_http_server(self):
+        self.counter.inc('/a')
+        server = self.registry.start_http_server(0)
+        try:
+            url = 'http://127.0.0.1:%d' % server.server_address[1]
+            with urllib.request.urlopen(url + '/metrics') as response:
+                self.assertEqual(response.headers['Content-Type'], Registry.CONTENT_TYPE)
+                self.assertIn(b'requests_total{path="/a"} 1', response.read())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(url + '/other')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_import_ghost_skips_exporter(self):
+        loaded = subprocess.check_output([sys.executable, '-c', ';'.join([
+            'import sys, ghost',
+            'print(sorted(m for m in ("ghost.metrics", "ghost.server", '
+            '"ghost.async_engine", "http.server") if m in sys.modules))',
+            'ghost.EngineMetrics, ghost.GhostServer',
+            'print("ghost.metrics" in sys.modules)'])])
+        self.assertEqual(loaded.split(), [b'[]', b'True'])
+
+class TestEngineMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = EngineMetrics(self.clock)
+        self.ge = ghost.GhostEngine(validator=ghost.WordSetValidator(['egg', 'fry']),
+                                    clock=self.clock, metrics=self.metrics)
+
+    def test_commands_and_rejections(self):
+        self.ge.add_game(1, 'host')
+        self.ge.register_player(1, 'joyce')
+        self.ge.register_player(1, 'joyce')
+        self.ge.register_player(1, 'host')
+
+        commands = self.metrics.commands
+        self.assertEqual(commands.get('add_game', 'ok'), 1)
+        self.assertEqual(commands.get('register_player', 'ok'), 1)
+        self.assertEqual(commands.get('register_player', 'rejected'), 2)
+        self.assertEqual(self.metrics.rejections.get(
+            'register_player', 'ERR_PLAYER_ALREADY_REGISTERED'), 1)
+        self.assertEqual(self.metrics.rejections.get(
+            'register_player', 'ERR_USER_IS_HOST'), 1)
+
+        latency = dict(self.metrics.command_seconds.samples())
+        self.assertEqual(latency[('register_player',)][2], 3)
+
+    def test_unknown_game_rejections(self):
+        self.assertEqual(self.ge.set_clue(42, 'joyce', 'egg'), (False, False))
+        self.assertFalse(self.ge.delete_game(42))
+        self.assertEqual(self.ge.get_if_changed(42, 0), (-1, None))
+
+        for command in ('set_clue', 'delete_game', 'get_if_changed'):
+            self.assertEqual(self.metrics.rejections.get(
+                command, 'ERR_GID_DOES_NOT_EXIST'), 1)
+
+    def test_nested_commands_count_once(self):
+        self.ge.add_game(1, 'host')
+        for p in PLAYERS:
+            self.ge.register_player(1, p)
+        self.ge.start_game(1)
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+        for p in self.ge.get_player_order(1):
+            self.ge.set_clue_by_player(p, 'clue')
+
+        commands = self.metrics.commands
+        self.assertEqual(commands.get('set_clue_by_player', 'ok'), len(PLAYERS))
+        self.assertEqual(commands.get('set_clue', 'ok'), 0)
+        latency = dict(self.metrics.command_seconds.samples())
+        self.assertNotIn(('set_clue',), latency)
+
+    def test_games_and_phases(self):
+        self.ge.add_game(1, 'host')
+        self.ge.add_game(2, 'host2')
+        for p in PLAYERS:
+            self.ge.register_player(1, p)
+
+        self.clock.now = 40
+        self.ge.start_game(1)
+        self.clock.now = 50
+        self.ge.set_param_town_word('host', 'egg')
+        self.ge.set_param_fool_word('host', 'fry')
+
+        self.assertEqual(self.ge.get_state_census(), {
+            ghost.States.REGISTER_PLAYERS: 1, ghost.States.CLUE_ROUND: 1})
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['ghost_games'], [
+            ({'state': 'CLUE_ROUND'}, 1), ({'state': 'REGISTER_PLAYERS'}, 1)])
+
+        phases = dict((labels['state'], value) for labels, value
+                      in snapshot['ghost_phase_seconds'])
+        self.assertEqual(phases['REGISTER_PLAYERS']['sum'], 40)
+        self.assertEqual(phases['SET_PARAMS']['sum'], 10)
+        self.assertNotIn('CLUE_ROUND', phases)
+
+        self.ge.delete_game(1)
+        self.assertIn('ghost_games{state="REGISTER_PLAYERS"} 1',
+                      self.metrics.to_prometheus())
+
+if __name__ == '__main__':
+    unittest.main()
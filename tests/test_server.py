@@ -0,0 +1,77 @@
+import ghost
+from ghost.server import GhostClient, GhostServer
+
+import functools
+import os
+import tempfile
+import unittest
+
+WORDS = ['egg', 'fry']
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+make_engine = functools.partial(ghost.GhostEngine,
+                                validator=ghost.WordSetValidator(WORDS))
+
+class TestServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.server = GhostServer(os.path.join(cls.tmp.name, 'ghost.sock'),
+                                 num_workers=2, engine_factory=make_engine)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.client = GhostClient(self.server.path)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_game_over_socket(self):
+        ge = self.client
+        gid, host = 11, 'host11'
+        self.assertTrue(ge.add_game(gid, host))
+        for p in PLAYERS:
+            ge.register_player(gid, p + '11')
+        self.assertTrue(ge.start_game(gid))
+        self.assertTrue(ge.set_param_town_word(host, 'egg'))
+        self.assertTrue(ge.set_param_fool_word(host, 'fry'))
+        self.assertEqual(ge.get_game_state(gid), ghost.States.CLUE_ROUND)
+
+        for _ in PLAYERS:
+            p = ge.get_next_in_player_order(gid)
+            self.assertTrue(ge.set_clue_by_player(p, 'clue')[0])
+        self.assertEqual(ge.get_gid_from_player('joyce11'), gid)
+        self.assertEqual(ge.get_game_state(gid), ghost.States.VOTE_ROUND)
+        self.assertTrue(ge.delete_game(gid))
+        self.assertEqual(ge.get_gid_from_host(host), -1)
+
+    def test_one_game_per_player_across_workers(self):
+        ge = self.client
+        ge.add_game(20, 'host20')
+        ge.add_game(21, 'host21')
+        self.assertFalse(ge.add_game(23, 'host20'))
+
+        self.assertEqual(ge.register_player(20, 'zed'), (True, 1))
+        self.assertEqual(ge.register_player(21, 'zed'), (False, 0))
+        self.assertTrue(ge.unregister_player(20, 'zed'))
+        self.assertEqual(ge.register_player(21, 'zed'), (True, 1))
+        self.assertEqual(ge.get_gid_from_player('zed'), 21)
+
+    def test_batch_and_errors(self):
+        ge = self.client
+        self.assertEqual(ge.apply_batch([(30, 'set_clue', 'a', 'x'),
+                                         (31, 'set_vote', 'b', 'c')]),
+                         [(False, False), (False, False, '')])
+        with self.assertRaises(ValueError):
+            ge.apply_batch([(30, 'start_game', 'a', '')])
+        with self.assertRaises(AttributeError):
+            ge.snapshot
+
+if __name__ == '__main__':
+    unittest.main()
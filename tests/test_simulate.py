@@ -0,0 +1,69 @@
+from ghost import simulate
+from ghost.ghost import Ghost
+
+import random
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class TownPolicy(simulate.Policy):
+    ''' Everyone votes for the ghosts, who never guess right '''
+
+    def vote(self, view, player, role, rng):
+        return next(p for p in view.players if view.roles[p] == Ghost.Roles.GHOST)
+
+    def guess(self, view, player, town_word, fool_word, rng):
+        return fool_word
+
+class TestSimulate(unittest.TestCase):
+
+    def test_every_game_finishes(self):
+        for n in range(3, 11):
+            result = simulate.simulate(n, 50, workers=1, seed=n)
+            self.assertEqual(result.games, 50)
+            self.assertEqual(result.unfinished, 0)
+            self.assertEqual(sum(result.role_set), n)
+
+    def test_policy(self):
+        rng = random.Random(0)
+        for n in range(3, 11):
+            state = simulate.play_game(n, TownPolicy(), rng)
+            self.assertEqual(state, Ghost.States.WINNER_TOWN)
+
+    def test_seed(self):
+        a = simulate.simulate(6, 200, workers=1, seed=3, chunk_size=64)
+        b = simulate.simulate(6, 200, workers=1, seed=3, chunk_size=64)
+        self.assertEqual(a.ghost_wins, b.ghost_wins)
+
+    def test_pool(self):
+        one = simulate.simulate(5, 100, workers=1, seed=1, chunk_size=30)
+        pool = simulate.simulate(5, 100, workers=2, seed=1, chunk_size=30)
+        self.assertEqual(one.ghost_wins, pool.ghost_wins)
+        self.assertEqual(pool.games, 100)
+
+    def test_confidence_interval(self):
+        result = simulate.SimulationResult(5, (3, 1, 1), 1000, 300, 700, 1.0)
+        low, high = result.confidence_interval()
+        self.assertLess(low, 0.7)
+        self.assertGreater(high, 0.7)
+        self.assertAlmostEqual(high - low, 0.057, places=3)
+        self.assertEqual(result.to_dict()['role_set'], {'town': 3, 'ghost': 1, 'fool': 1})
+
+    def test_vectorized_needs_random_policy(self):
+        with self.assertRaises(ValueError):
+            simulate.simulate(5, 10, TownPolicy(), vectorized=True)
+
+    @unittest.skipUnless(numpy, 'numpy is not installed')
+    def test_vectorized(self):
+        for n in (3, 5, 8):
+            played = simulate.simulate(n, 4000, workers=1, seed=2)
+            sampled = simulate.simulate(n, 200000, seed=2, vectorized=True)
+            self.assertEqual(sampled.unfinished, 0)
+            low, high = played.confidence_interval(z=4)
+            self.assertTrue(low <= sampled.ghost_win_rate <= high)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import ghost
+from ghost.suggest import (BKTree, FoolWordIndex, edit_distance,
+                           hamming_distance, shared_letters)
+
+import os
+import random
+import tempfile
+import unittest
+
+WORDS = ['egg', 'fry', 'ham', 'jam', 'yam', 'hat', 'cake', 'bake', 'lake']
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+class TestBKTree(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        words = {''.join(rng.choice('abcde') for _ in range(5)) for _ in range(300)}
+        tree = BKTree()
+        for w in words:
+            tree.add(w)
+
+        for query in ['abcde', 'aaaaa', 'edcba']:
+            for radius in range(4):
+                expected = sorted((edit_distance(query, w), w) for w in words
+                                  if edit_distance(query, w) <= radius)
+                self.assertEqual(sorted(tree.search(query, radius)), expected)
+
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(11)
+        words = {''.join(rng.choice('abcdef') for _ in range(6)) for _ in range(500)}
+        tree = BKTree(hamming_distance)
+        for w in words:
+            tree.add(w)
+
+        for query in ['abcdef', 'ffffff', 'acebdf']:
+            ranked = sorted((hamming_distance(query, w), w) for w in words)
+            farthest = ranked[4][0]
+            expected = [(d, w) for d, w in ranked if d <= farthest]
+            self.assertEqual(tree.nearest(query, 5), expected)
+
+class TestFoolWordIndex(unittest.TestCase):
+
+    def test_suggest_same_length_ranked(self):
+        index = FoolWordIndex(ghost.WordSetValidator(WORDS))
+        self.assertEqual(index.suggest('ham', 3), ['hat', 'jam', 'yam'])
+        self.assertEqual(index.suggest('cake', 5), ['bake', 'lake'])
+
+    def test_suggest_breaks_ties_over_every_tied_word(self):
+        words = ['stop', 'stab', 'stem', 'stun', 'stir', 'spot', 'post', 'tops']
+        index = FoolWordIndex(ghost.WordSetValidator(words))
+        self.assertEqual(index.suggest('stop', 1), ['spot'])
+
+        rng = random.Random(5)
+        words = {''.join(rng.choice('abcde') for _ in range(4)) for _ in range(200)}
+        index = FoolWordIndex(ghost.WordSetValidator(words))
+        for query in ['abcd', 'eeee', 'bead']:
+            for k in range(1, 6):
+                expected = sorted((hamming_distance(query, w),
+                                   -shared_letters(query, w), w)
+                                  for w in words if w != query)
+                self.assertEqual(index.suggest(query, k),
+                                 [w for _, _, w in expected[:k]])
+
+    def test_engine_suggest(self):
+        ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS))
+        ge.add_game(1, 'host')
+        for p in PLAYERS:
+            ge.register_player(1, p)
+        ge.start_game(1)
+
+        self.assertEqual(ge.suggest_fool_words('host'), [])
+        ge.set_param_town_word('host', 'cake')
+        suggestions = ge.suggest_fool_words('host', k=2)
+        self.assertEqual(suggestions, ['bake', 'lake'])
+        self.assertTrue(ge.set_param_fool_word('host', suggestions[0]))
+
+    def suggest_with_default_validator(self, validator):
+        default = ghost.Ghost.VALIDATOR
+        ghost.Ghost.VALIDATOR = validator
+        self.addCleanup(setattr, ghost.Ghost, 'VALIDATOR', default)
+
+        ge = ghost.GhostEngine()
+        ge.add_game(1, 'host')
+        for p in PLAYERS:
+            ge.register_player(1, p)
+        ge.start_game(1)
+        ge.set_param_town_word('host', 'cake')
+        return ge.suggest_fool_words('host', k=2)
+
+    def test_default_validator_suggest(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('\n'.join(WORDS + ['Lake', 'o\'er']) + '\n')
+        self.addCleanup(os.remove, f.name)
+
+        validator = ghost.EnchantValidator(word_list=f.name)
+        self.assertTrue(validator.can_list_words)
+        self.assertEqual(validator.words_of_length(4), ['bake', 'cake', 'lake'])
+        self.assertEqual(self.suggest_with_default_validator(validator),
+                         ['bake', 'lake'])
+
+    def test_default_validator_without_word_list(self):
+        validator = ghost.EnchantValidator(word_list=None)
+        self.assertFalse(validator.can_list_words)
+        self.assertEqual(self.suggest_with_default_validator(validator), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import ghost
+from ghost import events
+from ghost.timers import TimerWheel
+
+import unittest
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTimerWheel(unittest.TestCase):
+
+    def test_fires_once_due(self):
+        wheel = TimerWheel(tick=1.0, num_slots=8)
+        wheel.schedule('a', 3.0)
+        wheel.schedule('b', 20.0)   # more than one turn away
+        self.assertEqual(len(wheel), 2)
+
+        self.assertEqual(wheel.advance(2.5), [])
+        self.assertEqual(wheel.advance(3.0), ['a'])
+        self.assertEqual(wheel.advance(19.0), [])
+        self.assertEqual(wheel.advance(100.0), ['b'])
+        self.assertEqual(len(wheel), 0)
+
+    def test_past_deadline_fires_next_tick(self):
+        wheel = TimerWheel(tick=1.0, num_slots=8, now=10.0)
+        wheel.schedule('a', 5.0)
+        self.assertEqual(wheel.advance(11.0), ['a'])
+
+class TestIdleExpiry(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.ge = ghost.GhostEngine(max_games=2, idle_ttl=60, clock=self.clock)
+        self.expired = self.ge.events.subscribe_queue()
+
+    def test_idle_game_expires(self):
+        self.ge.add_game(1, 'host1')
+        self.ge.add_game(2, 'host2')
+        self.ge.register_player(1, 'joyce')
+        self.assertFalse(self.ge.add_game(3, 'host3'))
+
+        self.clock.now = 50
+        self.ge.register_player(2, 'mf')
+        self.clock.now = 61
+        self.assertEqual(self.ge.expire_idle_games(), [1])
+        self.assertEqual(self.ge.get_gid_from_player('joyce'), -1)
+        self.assertTrue(self.ge.add_game(3, 'host3'))
+
+        self.clock.now = 111
+        self.assertEqual(self.ge.expire_idle_games(), [2])
+        expired = [e for e in self.expired.drain() if isinstance(e, events.GameExpired)]
+        self.assertEqual([(e.gid, e.host) for e in expired], [(1, 'host1'), (2, 'host2')])
+
+    def test_reads_do_not_keep_game_alive(self):
+        self.ge.add_game(1, 'host1')
+        self.clock.now = 59
+        self.ge.get_game_state(1)
+        self.clock.now = 61
+        self.assertEqual(self.ge.expire_idle_games(), [1])
+
+    def test_rejected_commands_do_not_keep_game_alive(self):
+        self.ge.add_game(1, 'host1')
+        self.ge.register_player(1, 'joyce')
+        self.clock.now = 59
+        self.assertFalse(self.ge.register_player(1, 'joyce')[0])
+        self.assertFalse(self.ge.start_game(1))
+        self.assertEqual(self.ge.set_clue(1, 'stranger', 'clue'), (False, False))
+        self.clock.now = 61
+        self.assertEqual(self.ge.expire_idle_games(), [1])
+
+    def test_replaced_game_keeps_its_own_timer(self):
+        self.ge.add_game(1, 'host1')
+        self.ge.delete_game(1)
+        self.clock.now = 30
+        self.ge.add_game(1, 'host1')
+        self.clock.now = 61
+        self.assertEqual(self.ge.expire_idle_games(), [])
+        self.clock.now = 91
+        self.assertEqual(self.ge.expire_idle_games(), [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import ghost
+from ghost import trace
+
+import os
+import tempfile
+import unittest
+
+WORDS = ['egg', 'fry', 'ham', 'jam', 'cake']
+PLAYERS = ['joyce', 'mf', 'tb', 'avian', 'jamz']
+
+def play(engine, gid, host, players):
+    ''' Plays a game to the end, reading the roles and order it needs '''
+    engine.add_game(gid, host)
+    for p in players:
+        engine.register_player(gid, p)
+    engine.start_game(gid)
+    engine.set_param_town_word(host, 'egg')
+    engine.set_param_fool_word(host, 'fry')
+    for p in engine.get_player_order(gid):
+        engine.set_clue_by_player(p, 'clue')
+    engine.get_view(gid)
+
+    roles = engine.get_player_roles(gid)
+    target = next(p for p in players if roles[p] == ghost.Roles.GHOST)
+    for p in players:
+        engine.set_vote(gid, p, target)
+    engine.make_guess(gid, target, 'fry')
+
+class TestSeed(unittest.TestCase):
+
+    def test_same_seed_same_games(self):
+        orders = list()
+        for _ in range(2):
+            ge = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS), seed=7)
+            for gid in (1, 2):
+                ge.add_game(gid, 'host%d' % gid)
+                for p in PLAYERS:
+                    ge.register_player(gid, p + str(gid))
+                ge.start_game(gid)
+            orders.append([(ge.get_player_order(gid), ge.get_player_roles(gid))
+                           for gid in (1, 2)])
+
+        self.assertEqual(orders[0], orders[1])
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        settings = {'seed': 3, 'early_lynch': True}
+        self.engine = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS), **settings)
+        self.recorder = trace.TraceRecorder(self.engine, settings)
+
+    def test_records_outer_calls_only(self):
+        play(self.engine, 1, 'host', PLAYERS)
+        recorded = self.recorder.stop()
+
+        methods = [call.method for call in recorded.calls]
+        self.assertEqual(methods.count('set_clue_by_player'), len(PLAYERS))
+        self.assertNotIn('set_clue', methods)
+        self.assertEqual(recorded.calls[0].result, True)
+        view = next(call.result for call in recorded.calls if call.method == 'get_view')
+        self.assertEqual(view[1], 'VOTE_ROUND')
+
+        # stopped recorders leave the engine as it was
+        self.assertTrue(self.engine.has_game(1))
+        self.assertEqual(len(self.recorder.trace().calls), len(recorded.calls))
+
+    def test_replay_matches(self):
+        play(self.engine, 1, 'host1', PLAYERS)
+        self.engine.set_vote(2, 'nobody', 'nobody')
+        recorded = self.recorder.stop()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.jsonl')
+            recorded.save(path)
+            loaded = trace.Trace.load(path)
+        self.assertEqual(loaded, recorded)
+
+        results = trace.replay([loaded, loaded], validator=ghost.WordSetValidator(WORDS))
+        for result in results:
+            self.assertEqual(result.calls, len(recorded.calls))
+            self.assertEqual(result.mismatches, [])
+
+    def test_replay_reports_mismatches(self):
+        play(self.engine, 1, 'host1', PLAYERS)
+        recorded = self.recorder.stop()
+
+        # another seed deals other roles
+        engine = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS), seed=4)
+        result = trace.replay_trace(recorded, engine)
+        self.assertTrue(result.mismatches)
+
+    def test_recorded_pace(self):
+        self.engine.add_game(1, 'host')
+        self.engine.has_game(1)
+        recorded = self.recorder.stop()
+        calls = [call._replace(time=0.05 * i) for i, call in enumerate(recorded.calls)]
+
+        engine = ghost.GhostEngine(validator=ghost.WordSetValidator(WORDS), seed=3)
+        result = trace.replay_trace(recorded._replace(calls=calls), engine, speed=2)
+        self.assertGreaterEqual(result.seconds, 0.025)
+        self.assertEqual(result.mismatches, [])
+
+if __name__ == '__main__':
+    unittest.main()